@@ -1,38 +1,89 @@
 from fastapi import FastAPI, Query, Response, HTTPException, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.routing import APIRoute
 from fastapi.staticfiles import StaticFiles
 from uuid import uuid4
 from pathlib import Path
 import shutil
 import shutil
 from datetime import datetime
+from bisect import bisect_left
+import asyncio
+import json
 import os
+import time
 
 import data_provider as dp
+import media_scanner
+import metrics
+from event_stream import EventBroadcaster
 from scheduler_loop import PlaybackLoop
-from obs_gateway import heartbeat, start_streaming, stop_streaming, apply_audio_monitoring, get_stream_status
+from obs_gateway import (
+    heartbeat,
+    start_streaming_async,
+    stop_streaming_async,
+    apply_audio_monitoring,
+    audio_monitoring_stats,
+    get_stream_status,
+    get_last_timings,
+    start_session,
+    connection_status,
+)
 
 app = FastAPI(title="OBS Scheduler (Python)", version="0.1.0")
 loop = PlaybackLoop()
+events = EventBroadcaster()
+
+
+class _RequestMetrics:
+    # Plain ASGI rather than @app.middleware("http"), which would buffer
+    # every response through an extra task. Static files share one label.
+    def __init__(self, app):
+        self.app = app
+        self._paths = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self._paths is None:
+            self._paths = {route.path for route in app.routes if isinstance(route, APIRoute)}
+        path = scope["path"] if scope["path"] in self._paths else "static"
+        method = scope["method"]
+        started = time.perf_counter()
+
+        async def send_timed(message):
+            if message["type"] == "http.response.start":
+                metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=method, path=path)
+                metrics.HTTP_REQUESTS.inc(method=method, path=path, status=message["status"])
+            await send(message)
+
+        await self.app(scope, receive, send_timed)
+
+
+app.add_middleware(_RequestMetrics)
 
 
 @app.on_event("startup")
 async def _startup():
+    media_scanner.ensure_started()
+    start_session()
     await loop.start()
+    await events.start()
+
+
+def _html_row(cells) -> str:
+    return "\n".join(["<tr>", *(f"<td>{cell}</td>" for cell in cells), "</tr>"])
+
+
+def _html_table_from_rows(headers, rendered_rows):
+    return "\n".join(["<table>", _html_row(headers), *rendered_rows, "</table>"])
 
 
-def _html_table(headers, rows):
-    html = ["<table>", "<tr>"]
-    for h in headers:
-        html.append(f"<td>{h}</td>")
-    html.append("</tr>")
-    for idx, row in enumerate(rows):
-        html.append("<tr>")
-        for cell in row:
-            html.append(f"<td>{cell}</td>")
-        html.append("</tr>")
-    html.append("</table>")
-    return "\n".join(html)
+# Rendered /VideoList rows per list type, keyed by everything that goes into
+# them, so a row is only formatted again when its item or its plays move.
+_VIDEO_LIST_ROWS = {"video": {}, "activity": {}}
+VIDEO_LIST_MAX_PLAYS = 5
 
 
 def _expected_api_key() -> str | None:
@@ -53,15 +104,95 @@ def _require_api_key(request: Request, allow_if_unset: bool = False) -> None:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
 
+# Revisions restart at zero with the process, so tag ETags with the process start.
+_ETAG_EPOCH = format(int(datetime.now().timestamp() * 1000), "x")
+
+
+def _etag(*parts) -> str:
+    return '"' + "-".join(str(p) for p in (_ETAG_EPOCH,) + parts) + '"'
+
+
+def _not_modified(request: Request, etag: str) -> Response | None:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    candidates = [c.strip() for c in header.split(",")]
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return None
+
+
+def _revision_tag(store: str = "schedule") -> str:
+    return _etag(store, dp.get_revisions()[store])
+
+
+def _if_match(request: Request, store: str = "schedule") -> dict | None:
+    # Optional optimistic concurrency: a client that read revision N of the
+    # schedule (X-Schedule-Revision) can send it as If-Match and gets 412
+    # instead of overwriting an edit someone else made in the meantime.
+    header = request.headers.get("if-match")
+    if not header:
+        return None
+    candidates = [c.strip() for c in header.split(",")]
+    if "*" in candidates:
+        return None
+    prefix = _etag(store, "")[:-1]
+    for candidate in candidates:
+        if candidate.startswith(prefix) and candidate.endswith('"'):
+            try:
+                return {store: int(candidate[len(prefix):-1])}
+            except ValueError:
+                pass
+    # Tags from another process lifetime or another store never match.
+    return {store: -1}
+
+
+def _schedule_response() -> JSONResponse:
+    return JSONResponse(dp.as_schedule_payload(), headers={"X-Schedule-Revision": _revision_tag()})
+
+
+@app.exception_handler(dp.RevisionConflict)
+async def _revision_conflict(request: Request, exc: dp.RevisionConflict):
+    return JSONResponse(
+        {"detail": f"{exc.store} has changed since revision {exc.expected}"},
+        status_code=412,
+        headers={"X-Schedule-Revision": _revision_tag()},
+    )
+
+
 def _validate_safe_name(value: str, field: str) -> None:
     if any(token in value for token in ("..", "/", "\\", ":")):
         raise HTTPException(status_code=400, detail=f"{field} contains invalid characters")
 
 
+@app.get("/events")
+async def event_stream(request: Request):
+    _require_api_key(request)
+    return StreamingResponse(
+        events.stream(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/Revisions")
+def revisions(request: Request):
+    _require_api_key(request)
+    return JSONResponse(dict(dp.get_revisions(), epoch=_ETAG_EPOCH))
+
+
 @app.get("/ScheduleGet")
 def schedule_get(request: Request):
     _require_api_key(request)
-    return JSONResponse(dp.as_schedule_payload())
+    rev = dp.get_revisions()
+    etag = _etag("s", rev["schedule"], rev["videos"], rev["activities"], rev["contest"])
+    unchanged = _not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    return JSONResponse(
+        dp.as_schedule_payload(),
+        headers={"ETag": etag, "Cache-Control": "no-cache", "X-Schedule-Revision": _revision_tag()},
+    )
 
 
 @app.get("/ScheduleList")
@@ -88,77 +219,78 @@ def save_schedule(request: Request, file: str = Query(..., alias="file")):
 @app.get("/LoadSchedule")
 def load_schedule(request: Request, file: str = Query(..., alias="file")):
     _require_api_key(request)
-    _validate_safe_name(file, "Schedule name")
-    try:
-        dp.load_schedule(file)
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="schedule not found")
-    return Response(status_code=204)
+    with dp.writing(_if_match(request)):
+        _validate_safe_name(file, "Schedule name")
+        try:
+            dp.load_schedule(file)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="schedule not found")
+        return Response(status_code=204)
 
 
 @app.get("/AddScheduleEntry")
 def add_schedule_entry(request: Request, uuid: str = Query(...)):
     _require_api_key(request)
-    items_by_uuid = dp.get_all_items_by_name()
-    all_items_uuid = {}
-    videos_uuid = dp.get_videos()[1]
-    activities_uuid = dp.get_activities()[1]
-    all_items_uuid.update(videos_uuid)
-    all_items_uuid.update(activities_uuid)
+    with dp.writing(_if_match(request)):
+        items_by_uuid = dp.get_all_items_by_name()
+        all_items_uuid = {}
+        videos_uuid = dp.get_videos()[1]
+        activities_uuid = dp.get_activities()[1]
+        all_items_uuid.update(videos_uuid)
+        all_items_uuid.update(activities_uuid)
+
+        item = all_items_uuid.get(uuid)
+        if not item:
+            raise HTTPException(status_code=404, detail="Item not found")
 
-    item = all_items_uuid.get(uuid)
-    if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
+        now = dp.current_time_ms()
+        interval_ms = 5 * 60 * 1000
+        start_time = now + interval_ms
+        start_time = ((start_time + interval_ms - 1) // interval_ms) * interval_ms
 
-    now = dp.current_time_ms()
-    interval_ms = 5 * 60 * 1000
-    start_time = now + interval_ms
-    start_time = ((start_time + interval_ms - 1) // interval_ms) * interval_ms
-
-    schedule = dp.get_schedule()
-    schedule.append(
-        {
-            "uuid": str(uuid4()),
-            "start_timestamp": start_time,
-            "name": item["name"],
-        }
-    )
-    dp.write_schedule(schedule)
-    return JSONResponse(dp.as_schedule_payload())
+        dp.add_schedule_entry(
+            {
+                "uuid": str(uuid4()),
+                "start_timestamp": start_time,
+                "name": item["name"],
+            }
+        )
+        return _schedule_response()
 
 
 @app.get("/RemoveScheduleEntry")
 def remove_schedule_entry(request: Request, uuid: str = Query(...)):
     _require_api_key(request)
-    schedule = dp.get_schedule()
-    schedule = [e for e in schedule if e["uuid"] != uuid]
-    dp.write_schedule(schedule)
-    return JSONResponse(dp.as_schedule_payload())
+    with dp.writing(_if_match(request)):
+        dp.remove_schedule_entry(uuid)
+        return _schedule_response()
 
 
 @app.get("/DeleteVideo")
 def delete_video(request: Request, uuid: str = Query(...)):
     _require_api_key(request)
-    videos_by_name, videos_by_uuid = dp.get_videos()
-    item = videos_by_uuid.get(uuid)
-    if not item:
-        raise HTTPException(status_code=404, detail="Video not found")
-    name = item["name"]
-    remaining = [v for v in videos_by_name.values() if v["uuid"] != uuid]
-    dp.write_videos(remaining)
-    schedule = [e for e in dp.get_schedule() if e["name"] != name]
-    dp.write_schedule(schedule)
-    return JSONResponse(dp.as_schedule_payload())
+    with dp.writing(_if_match(request)):
+        videos_by_name, videos_by_uuid = dp.get_videos()
+        item = videos_by_uuid.get(uuid)
+        if not item:
+            raise HTTPException(status_code=404, detail="Video not found")
+        name = item["name"]
+        remaining = [v for v in videos_by_name.values() if v["uuid"] != uuid]
+        dp.write_videos(remaining)
+        schedule = [e for e in dp.get_schedule() if e["name"] != name]
+        dp.write_schedule(schedule)
+        return _schedule_response()
 
 
 @app.get("/ArchiveVideo")
 def archive_video(request: Request, uuid: str = Query(...)):
     _require_api_key(request)
-    videos_by_name, videos_by_uuid = dp.get_videos()
-    item = videos_by_uuid.get(uuid)
-    if not item:
-        raise HTTPException(status_code=404, detail="Video not found")
-    config = dp.get_config()
+    with dp.writing(_if_match(request)):
+        _, videos_by_uuid = dp.get_videos()
+        item = videos_by_uuid.get(uuid)
+        if not item:
+            raise HTTPException(status_code=404, detail="Video not found")
+        config = dp.get_config()
     video_dir = config.get("server-video-dir") or config.get("obs-video-dir")
     archive_dir = config.get("archive-dir")
     if not video_dir or not archive_dir:
@@ -169,6 +301,7 @@ def archive_video(request: Request, uuid: str = Query(...)):
     target = archive_path / source_path.name
     if target.exists():
         raise HTTPException(status_code=409, detail="Archive target already exists")
+    # Outside the writer lock: a move across volumes copies the whole file.
     if source_path.exists():
         try:
             shutil.move(str(source_path), str(target))
@@ -177,249 +310,210 @@ def archive_video(request: Request, uuid: str = Query(...)):
                 status_code=409,
                 detail="Video is in use and cannot be archived right now",
             ) from exc
-    remaining = [v for v in videos_by_name.values() if v["uuid"] != uuid]
-    dp.write_videos(remaining)
-    schedule = [e for e in dp.get_schedule() if e["name"] != item["name"]]
-    dp.write_schedule(schedule)
-    return JSONResponse(dp.as_schedule_payload())
+    with dp.writing():
+        videos_by_name, _ = dp.get_videos()
+        remaining = [v for v in videos_by_name.values() if v["uuid"] != uuid]
+        if len(remaining) != len(videos_by_name):
+            dp.write_videos(remaining)
+        schedule = [e for e in dp.get_schedule() if e["name"] != item["name"]]
+        dp.write_schedule(schedule)
+        return _schedule_response()
 
 
 @app.get("/RenameVideo")
 def rename_video(request: Request, uuid: str = Query(...), name: str = Query(...)):
     _require_api_key(request)
-    requested_name = name.strip()
-    if not requested_name:
-        raise HTTPException(status_code=400, detail="New name is required")
-    videos_by_name, videos_by_uuid = dp.get_videos()
-    item = videos_by_uuid.get(uuid)
-    if not item:
-        raise HTTPException(status_code=404, detail="Video not found")
-    source_name = item["name"]
-    source_suffix = Path(source_name).suffix
-    base_name = requested_name
-    if source_suffix and base_name.lower().endswith(source_suffix.lower()):
-        base_name = base_name[: -len(source_suffix)]
-    base_name = base_name.strip()
-    if not base_name:
-        raise HTTPException(status_code=400, detail="New name is required")
-    _validate_safe_name(base_name, "Video name")
-    new_name = f"{base_name}{source_suffix}"
-    if new_name in videos_by_name and videos_by_name[new_name]["uuid"] != uuid:
-        raise HTTPException(status_code=400, detail="A video with that name already exists")
-    config = dp.get_config()
-    video_dir = config.get("server-video-dir") or config.get("obs-video-dir")
-    if not video_dir:
-        raise HTTPException(status_code=400, detail="Video directory not set")
-    source_path = Path(video_dir) / source_name
-    target_path = Path(video_dir) / new_name
-    if target_path.exists():
-        raise HTTPException(status_code=400, detail="Target file already exists")
-    if source_path.exists():
-        shutil.move(str(source_path), str(target_path))
-    updated = []
-    for v in videos_by_name.values():
-        if v["uuid"] == uuid:
-            v = dict(v)
-            v["name"] = new_name
-        updated.append(v)
-    dp.write_videos(updated)
-    schedule = []
-    for e in dp.get_schedule():
-        if e["name"] == item["name"]:
-            e = dict(e)
-            e["name"] = new_name
-        schedule.append(e)
-    dp.write_schedule(schedule)
-    return JSONResponse(dp.as_schedule_payload())
+    with dp.writing(_if_match(request)):
+        requested_name = name.strip()
+        if not requested_name:
+            raise HTTPException(status_code=400, detail="New name is required")
+        videos_by_name, videos_by_uuid = dp.get_videos()
+        item = videos_by_uuid.get(uuid)
+        if not item:
+            raise HTTPException(status_code=404, detail="Video not found")
+        source_name = item["name"]
+        source_suffix = Path(source_name).suffix
+        base_name = requested_name
+        if source_suffix and base_name.lower().endswith(source_suffix.lower()):
+            base_name = base_name[: -len(source_suffix)]
+        base_name = base_name.strip()
+        if not base_name:
+            raise HTTPException(status_code=400, detail="New name is required")
+        _validate_safe_name(base_name, "Video name")
+        new_name = f"{base_name}{source_suffix}"
+        if new_name in videos_by_name and videos_by_name[new_name]["uuid"] != uuid:
+            raise HTTPException(status_code=400, detail="A video with that name already exists")
+        config = dp.get_config()
+        video_dir = config.get("server-video-dir") or config.get("obs-video-dir")
+        if not video_dir:
+            raise HTTPException(status_code=400, detail="Video directory not set")
+        source_path = Path(video_dir) / source_name
+        target_path = Path(video_dir) / new_name
+        if target_path.exists():
+            raise HTTPException(status_code=400, detail="Target file already exists")
+        if source_path.exists():
+            shutil.move(str(source_path), str(target_path))
+        updated = []
+        for v in videos_by_name.values():
+            if v["uuid"] == uuid:
+                v = dict(v)
+                v["name"] = new_name
+            updated.append(v)
+        dp.write_videos(updated)
+        dp.rename_schedule_item(item["name"], new_name)
+        return _schedule_response()
 
 
 @app.get("/RescheduleScheduleEntry")
 def reschedule_schedule_entry(request: Request, uuid: str = Query(...), start: int = Query(...)):
     _require_api_key(request)
-    schedule = dp.get_schedule()
-    changed = False
-    for entry in schedule:
-        if entry["uuid"] == uuid:
-            if entry["start_timestamp"] == start:
-                return Response("no-op")
-            entry["start_timestamp"] = start
-            changed = True
-    if changed:
-        dp.write_schedule(schedule)
-    return JSONResponse(dp.as_schedule_payload())
+    with dp.writing(_if_match(request)):
+        entry = dp.get_sorted_schedule().get(uuid)
+        if entry is not None and entry["start_timestamp"] == start:
+            return Response("no-op")
+        dp.reschedule_schedule_entry(uuid, start)
+        return _schedule_response()
 
 
 @app.get("/StartContest")
 def start_contest(request: Request, time: str | None = Query(None)):
     _require_api_key(request)
-    if time:
-        h, m = time.split("-")
-        now = datetime.now()
-        new_start = now.replace(hour=int(h), minute=int(m), second=0, microsecond=0)
-        dp.start_contest(int(new_start.timestamp() * 1000))
-    else:
-        dp.start_contest()
-    return Response(status_code=204)
+    with dp.writing(_if_match(request)):
+        if time:
+            h, m = time.split("-")
+            now = datetime.now()
+            new_start = now.replace(hour=int(h), minute=int(m), second=0, microsecond=0)
+            dp.start_contest(int(new_start.timestamp() * 1000))
+        else:
+            dp.start_contest()
+        return Response(status_code=204)
 
 
 @app.get("/AddActivity")
 def add_activity(request: Request, name: str, duration: str):
     _require_api_key(request)
-    if "-" in duration:
-        mins, secs = duration.split("-")
-        dur_ms = int(mins) * 60000 + int(secs) * 1000
-    else:
-        dur_ms = int(duration) * 1000
-    activities_by_name, _ = dp.get_activities()
-    activities = list(activities_by_name.values())
-    activities.append(
-        {
-            "uuid": str(uuid4()),
-            "name": name,
-            "duration": dur_ms,
-            "isVideo": False,
-        }
-    )
-    dp.write_activities(activities)
-    return Response(status_code=204)
+    with dp.writing():
+        if "-" in duration:
+            mins, secs = duration.split("-")
+            dur_ms = int(mins) * 60000 + int(secs) * 1000
+        else:
+            dur_ms = int(duration) * 1000
+        activities_by_name, _ = dp.get_activities()
+        activities = list(activities_by_name.values())
+        activities.append(
+            {
+                "uuid": str(uuid4()),
+                "name": name,
+                "duration": dur_ms,
+                "isVideo": False,
+            }
+        )
+        dp.write_activities(activities)
+        return Response(status_code=204)
 
 
 @app.get("/VideoList")
 def video_list(request: Request, type: str = "video"):
     _require_api_key(request)
+    now = dp.current_time_ms()
+    rev = dp.get_revisions()
+    # The previous/future split only moves when now passes a scheduled start.
+    etag = _etag(
+        "vl", "v" if type == "video" else "a", rev["videos"] if type == "video" else rev["activities"],
+        rev["schedule"], rev["contest"], dp.count_started(now),
+    )
+    unchanged = _not_modified(request, etag)
+    if unchanged:
+        return unchanged
     if type == "video":
         items_by_name, _ = dp.get_videos()
     else:
         items_by_name, _ = dp.get_activities()
     items = sorted(items_by_name.values(), key=lambda x: x["name"])
-    schedule = dp.get_schedule()
+    schedule = dp.get_sorted_schedule()
     contest_start = dp.get_contest_start()
+    kind = "video" if type == "video" else "activity"
+    previous = _VIDEO_LIST_ROWS[kind]
+    cache = {}
     rows = []
-    now = dp.current_time_ms()
-    for idx, item in enumerate(items):
-        duration_ms = item["duration"]
-        dur = f"{duration_ms // 60000}:{(duration_ms // 1000) % 60:02d}"
-        prev, future = [], []
-        p = f = 0
-        for s in schedule:
-            if s["name"] != item["name"]:
-                continue
-            diff = abs((s["start_timestamp"] - contest_start) // 60000)
-            contest_diff = f"{diff // 60}:{diff % 60:02d}"
-            if s["start_timestamp"] < contest_start:
-                contest_diff = "-" + contest_diff
-            if s["start_timestamp"] < now:
-                prev.append(contest_diff)
-                p += 1
-            else:
-                future.append(contest_diff)
-                f += 1
-        max_list = 5
-        prev_display = prev[:max_list]
-        future_display = future[:max_list]
-        prev_play = ", ".join(prev_display) + (" ..." if len(prev) > max_list else "")
-        future_play = ", ".join(future_display) + (" ..." if len(future) > max_list else "")
-        if type == "video":
-            rows.append(
-                [
-                    f'<input type="submit" value="Schedule" onclick=\'add_event("{item["uuid"]}");\'/>',
-                    f'<input type="submit" value="Archive" onclick=\'archive_video("{item["uuid"]}");\'/>'
-                    f'<input type="submit" value="Rename" onclick=\'rename_video("{item["uuid"]}");\'/>',
-                    item["name"],
-                    dur,
-                    f"{prev_play} ({p})",
-                    f"{future_play} ({f})",
-                ]
-            )
-        else:
-            rows.append(
-                [
-                    f'<input type="submit" value="Schedule" onclick=\'add_event("{item["uuid"]}");\'/>',
-                    "",
-                    item["name"],
-                    dur,
-                    f"{prev_play} ({p})",
-                    f"{future_play} ({f})",
-                ]
-            )
+    for item in items:
+        starts = schedule.starts_for(item["name"])
+        split = bisect_left(starts, now)
+        prev = starts[:min(split, VIDEO_LIST_MAX_PLAYS)]
+        future = starts[split:split + VIDEO_LIST_MAX_PLAYS]
+        key = (item["uuid"], item["name"], item["duration"], contest_start, split, len(starts), tuple(prev), tuple(future))
+        row = previous.get(key)
+        if row is None:
+            row = _html_row(_video_list_cells(kind, item, contest_start, prev, future, split, len(starts) - split))
+        cache[key] = row
+        rows.append(row)
+    _VIDEO_LIST_ROWS[kind] = cache
     # Activity creation inputs are handled by the main UI now.
     headers = ["", "", "Title", "Duration", "Previous plays", "Future plays"]
-    return HTMLResponse(_html_table(headers, rows))
+    return HTMLResponse(_html_table_from_rows(headers, rows), headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def _video_list_cells(kind, item, contest_start, prev, future, p, f):
+    duration_ms = item["duration"]
+    dur = f"{duration_ms // 60000}:{(duration_ms // 1000) % 60:02d}"
+
+    def contest_diff(start):
+        diff = abs((start - contest_start) // 60000)
+        text = f"{diff // 60}:{diff % 60:02d}"
+        return "-" + text if start < contest_start else text
+
+    prev_play = ", ".join(contest_diff(s) for s in prev) + (" ..." if p > VIDEO_LIST_MAX_PLAYS else "")
+    future_play = ", ".join(contest_diff(s) for s in future) + (" ..." if f > VIDEO_LIST_MAX_PLAYS else "")
+    if kind == "video":
+        actions = (
+            f'<input type="submit" value="Archive" onclick=\'archive_video("{item["uuid"]}");\'/>'
+            f'<input type="submit" value="Rename" onclick=\'rename_video("{item["uuid"]}");\'/>'
+        )
+    else:
+        actions = ""
+    return [
+        f'<input type="submit" value="Schedule" onclick=\'add_event("{item["uuid"]}");\'/>',
+        actions,
+        item["name"],
+        dur,
+        f"{prev_play} ({p})",
+        f"{future_play} ({f})",
+    ]
 
 
 @app.get("/VideoListJson")
 def video_list_json(request: Request, type: str = "video"):
     _require_api_key(request)
+    rev = dp.get_revisions()
+    etag = _etag("vj", "v" if type == "video" else "a", rev["videos"] if type == "video" else rev["activities"])
+    unchanged = _not_modified(request, etag)
+    if unchanged:
+        return unchanged
     if type == "video":
         items_by_name, _ = dp.get_videos()
     else:
         items_by_name, _ = dp.get_activities()
     items = sorted(items_by_name.values(), key=lambda x: x["name"])
-    return JSONResponse(items)
+    return JSONResponse(items, headers={"ETag": etag, "Cache-Control": "no-cache"})
 
 
 @app.get("/CurrentState")
 def current_state(request: Request):
     _require_api_key(request)
-    items = dp.get_all_items_by_name()
-    schedule = dp.get_schedule()
-    now = dp.current_time_ms()
+    state = dp.current_state()
     lines = [datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC"), "<br/>"]
-    for e in schedule:
-        item = items.get(e["name"])
-        if not item:
-            continue
-        start = e["start_timestamp"]
-        stop = start + item["duration"]
-        if start < now < stop:
-            lines.append(f"Currently playing: {e['name']}, {(stop - now)//1000} seconds left</html>")
-            return HTMLResponse("".join(lines))
-        if now < start and start - now < 30000:
-            lines.append(f"Playing soon: {e['name']}, in {(start - now)//1000} seconds</html>")
-            return HTMLResponse("".join(lines))
-    lines.append("Currently happens nothing.\n</html>")
+    if state["status"] == "playing":
+        lines.append(f"Currently playing: {state['name']}, {state['seconds_left']} seconds left</html>")
+    elif state["status"] == "soon":
+        lines.append(f"Playing soon: {state['name']}, in {state['seconds_until']} seconds</html>")
+    else:
+        lines.append("Currently happens nothing.\n</html>")
     return HTMLResponse("".join(lines))
 
 @app.get("/CurrentStateJson")
 def current_state_json(request: Request):
     _require_api_key(request)
-    items = dp.get_all_items_by_name()
-    schedule = dp.get_schedule()
-    now = dp.current_time_ms()
-    payload = {
-        "now_ts": now,
-        "status": "idle",
-        "name": None,
-        "seconds_left": None,
-        "seconds_until": None,
-        "start_ts": None,
-        "stop_ts": None,
-    }
-    for e in schedule:
-        item = items.get(e["name"])
-        if not item:
-            continue
-        start = e["start_timestamp"]
-        stop = start + item["duration"]
-        if start < now < stop:
-            payload.update({
-                "status": "playing",
-                "name": e["name"],
-                "seconds_left": int((stop - now) / 1000),
-                "start_ts": start,
-                "stop_ts": stop,
-            })
-            return JSONResponse(payload)
-        if now < start and start - now < 30000:
-            payload.update({
-                "status": "soon",
-                "name": e["name"],
-                "seconds_until": int((start - now) / 1000),
-                "start_ts": start,
-                "stop_ts": stop,
-            })
-            return JSONResponse(payload)
-    return JSONResponse(payload)
+    return JSONResponse(dp.current_state())
 
 
 @app.get("/ContestState")
@@ -458,26 +552,26 @@ def obs_status(request: Request):
     _require_api_key(request)
     try:
         status = heartbeat()
-        return HTMLResponse(f"<html>Connected to OBS (Scene: {status.get('scene', 'unknown')})</html>")
+        return HTMLResponse(f"<html>Connected to OBS (Scene: {status.get('scene') or 'unknown'})</html>")
     except Exception:
         return HTMLResponse("<html>Not connected to OBS</html>")
 
 
 @app.post("/StartStreaming")
-def start_stream(request: Request):
+async def start_stream(request: Request):
     _require_api_key(request)
     try:
-        start_streaming()
+        await start_streaming_async()
         return JSONResponse({"ok": True})
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc))
 
 
 @app.post("/StopStreaming")
-def stop_stream(request: Request):
+async def stop_stream(request: Request):
     _require_api_key(request)
     try:
-        stop_streaming()
+        await stop_streaming_async()
         return JSONResponse({"ok": True})
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc))
@@ -488,21 +582,47 @@ def apply_audio_monitoring_endpoint(request: Request):
     _require_api_key(request)
     try:
         result = apply_audio_monitoring()
-        return JSONResponse({"ok": True, "applied": result.get("applied", []), "failed": result.get("failed", [])})
+        return JSONResponse({
+            "ok": True,
+            "applied": result.get("applied", []),
+            "failed": result.get("failed", []),
+            "skipped": result.get("skipped", 0),
+        })
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc))
 
 
+@app.get("/AudioMonitoringStatus")
+def audio_monitoring_status(request: Request):
+    _require_api_key(request)
+    return JSONResponse(audio_monitoring_stats())
+
+
 @app.get("/StreamStatus")
 def stream_status(request: Request):
     _require_api_key(request)
     try:
-        return JSONResponse({"active": bool(get_stream_status())})
+        return JSONResponse({"active": get_stream_status()})
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc))
 
 
 
+@app.get("/PlaybackStats")
+def playback_stats(request: Request):
+    _require_api_key(request)
+    stats = loop.latency_stats()
+    stats["obs"] = get_last_timings()
+    stats["connection"] = connection_status()
+    return JSONResponse(stats)
+
+
+@app.get("/metrics")
+def metrics_endpoint(request: Request):
+    _require_api_key(request)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/ScheduleGetJson")
 def schedule_get_json(request: Request):
     _require_api_key(request)
@@ -518,10 +638,11 @@ def settings_get(request: Request):
 @app.post("/SettingsUpdate")
 def settings_update(request: Request, payload: dict):
     _require_api_key(request, allow_if_unset=True)
-    current = dp.get_config()
-    current.update(payload)
-    dp.write_config(current)
-    return JSONResponse({"ok": True})
+    with dp.writing():
+        current = dp.get_config()
+        current.update(payload)
+        dp.write_config(current)
+        return JSONResponse({"ok": True})
 
 
 @app.post("/RefreshVideos")
@@ -532,92 +653,79 @@ def refresh_videos(request: Request):
     return JSONResponse({"ok": True, "ffprobe": bool(ffprobe_path), "ffprobe_path": ffprobe_path})
 
 
+@app.get("/RefreshVideosProgress")
+async def refresh_videos_progress(request: Request, stream: bool = True):
+    _require_api_key(request)
+    if not stream:
+        return JSONResponse(media_scanner.get_progress())
+
+    async def events():
+        last = None
+        while True:
+            progress = media_scanner.get_progress()
+            if progress != last:
+                yield f"data: {json.dumps(progress)}\n\n"
+                last = progress
+            if not progress["queued"] and not progress["running"]:
+                return
+            if await request.is_disconnected():
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
 @app.post("/BulkSchedule")
 def bulk_schedule(request: Request, payload: dict):
     _require_api_key(request)
-    entries = payload.get("entries", [])
-    mode = payload.get("mode", "skip")
-    items = dp.get_all_items_by_name()
-    schedule = dp.get_schedule()
-
-    def stop_time(entry):
-        item = items.get(entry["name"])
-        duration = item["duration"] if item and item["duration"] > 0 else 60000
-        return entry["start_timestamp"] + duration
-
-    def overlaps(a_start, a_stop, b_start, b_stop):
-        return a_start < b_stop and b_start < a_stop
-
-    new_entries = []
-    for raw in entries:
-        if "name" not in raw or "start_timestamp" not in raw:
-            continue
-        new_entries.append({
-            "uuid": raw.get("uuid") or str(uuid4()),
-            "name": raw["name"],
-            "start_timestamp": int(raw["start_timestamp"]),
-        })
+    with dp.writing(_if_match(request)):
+        entries = payload.get("entries", [])
+        mode = payload.get("mode", "skip")
+        items = dp.get_all_items_by_name()
+        schedule = dp.get_schedule()
+        index = dp.get_schedule_index()
+
+        new_entries = []
+        for raw in entries:
+            if "name" not in raw or "start_timestamp" not in raw:
+                continue
+            new_entries.append({
+                "uuid": raw.get("uuid") or str(uuid4()),
+                "name": raw["name"],
+                "start_timestamp": int(raw["start_timestamp"]),
+            })
+        durations = {n["uuid"]: dp.item_duration_ms(items.get(n["name"])) for n in new_entries}
 
-    if mode == "overwrite":
-        filtered = []
-        for existing in schedule:
-            e_start = existing["start_timestamp"]
-            e_stop = stop_time(existing)
-            conflict = False
+        if mode == "overwrite":
+            removed = set()
             for n in new_entries:
-                n_start = n["start_timestamp"]
-                n_stop = stop_time(n)
-                if overlaps(e_start, e_stop, n_start, n_stop):
-                    conflict = True
-                    break
-            if not conflict:
-                filtered.append(existing)
-        schedule = filtered
-
-    if mode == "shift":
-        adjusted = []
-        for n in new_entries:
-            n_start = n["start_timestamp"]
-            n_stop = stop_time(n)
-            while True:
-                conflict = None
-                for existing in schedule + adjusted:
-                    e_start = existing["start_timestamp"]
-                    e_stop = stop_time(existing)
-                    if overlaps(n_start, n_stop, e_start, e_stop):
-                        conflict = e_stop
-                        break
-                if conflict:
-                    n_start = conflict
-                    n_stop = n_start + (n_stop - n_start)
-                    continue
-                break
-            adjusted.append({
-                "uuid": n["uuid"],
-                "name": n["name"],
-                "start_timestamp": n_start,
-            })
-        new_entries = adjusted
-
-    if mode == "skip":
-        filtered_new = []
-        for n in new_entries:
-            n_start = n["start_timestamp"]
-            n_stop = stop_time(n)
-            conflict = False
-            for existing in schedule:
-                e_start = existing["start_timestamp"]
-                e_stop = stop_time(existing)
-                if overlaps(n_start, n_stop, e_start, e_stop):
-                    conflict = True
-                    break
-            if not conflict:
-                filtered_new.append(n)
-        new_entries = filtered_new
-
-    schedule.extend(new_entries)
-    dp.write_schedule(schedule)
-    return JSONResponse(dp.as_schedule_payload())
+                start = n["start_timestamp"]
+                removed.update(uuid for _, _, uuid in index.overlapping(start, start + durations[n["uuid"]]))
+            schedule = [e for e in schedule if e["uuid"] not in removed]
+
+        if mode == "shift":
+            adjusted = []
+            for pos, n in enumerate(new_entries):
+                duration = durations[n["uuid"]]
+                start = index.next_free(n["start_timestamp"], duration)
+                # Keyed apart from existing entries that happen to share a uuid.
+                index.add(start, start + duration, f"{n['uuid']}#{pos}")
+                adjusted.append({
+                    "uuid": n["uuid"],
+                    "name": n["name"],
+                    "start_timestamp": start,
+                })
+            new_entries = adjusted
+
+        if mode == "skip":
+            new_entries = [
+                n for n in new_entries
+                if not index.overlaps(n["start_timestamp"], n["start_timestamp"] + durations[n["uuid"]])
+            ]
+
+        schedule.extend(new_entries)
+        dp.write_schedule(schedule)
+        return _schedule_response()
 
 
 static_dir = Path(__file__).resolve().parent.parent / "obs-video-scheduler" / "WebContent"
@@ -0,0 +1,440 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+
+import requests
+
+import data_provider as dp
+from bench_playback import _measure
+from fake_obs import FakeObs
+from scheduler_loop import _percentile
+
+# HTTP load benchmark: serves app.py from a separate process over a large
+# synthetic catalog and schedule, and has N simulated operator dashboards
+# use it the way index.html does while the playback loop plays short clips
+# against fake_obs.FakeObs. Each dashboard subscribes to /events and keeps
+# the few timers the page still runs alongside it; --poll and --legacy
+# replace the stream with the page's polling fallback and the older page.
+# Reports requests/sec and latency per endpoint, events/sec and how long
+# state changes took to reach subscribers, event-loop lag in the server
+# (how late a 50 ms timer fires) and how late clips went on air.
+#
+#   python bench_http.py --dashboards 1,5,10,20 --duration-sec 20
+#
+# Each dashboard count gets a fresh server. Exits with status 1 when a
+# request failed or a --max-* limit is exceeded.
+API_KEY = "bench"
+LAG_PROBE_SEC = 0.05
+STARTUP_TIMEOUT_SEC = 20
+WARMUP_SEC = 2
+STING_MS = 2000
+STING_EVERY_MS = 4000
+
+# Reconnect delay, the "retry:" the event stream sends to EventSource.
+SSE_RETRY_SEC = 3
+# Longer than the stream's keepalive, so only a dead stream times out.
+SSE_READ_TIMEOUT_SEC = 30
+
+# (path, interval in seconds) an index.html connected to /events still
+# polls: play counts roll over with time, not with data changes.
+LIVE_POLLS = [
+    ("/VideoList?type=video", 30),
+]
+# Fetched again by index.html whenever the stream reports a catalog change.
+CATALOG_FETCHES = ["/VideoList?type=video", "/VideoListJson?type=video"]
+# (path, interval in seconds) polled by index.html without /events. Browsers
+# revalidate with If-None-Match, so unchanged schedules and lists are 304s.
+DASHBOARD_POLLS = [
+    ("/OBSStatus.jsp", 1),
+    ("/CurrentStateJson", 1),
+    ("/VideoList?type=video", 1),
+    ("/ScheduleGet", 1),
+    ("/StreamStatus", 2),
+]
+# The older page: server-rendered state every second, no revalidation.
+LEGACY_POLLS = [
+    ("/ContestState", 1),
+    ("/OBSStatus.jsp", 1),
+    ("/CurrentState", 1),
+    ("/VideoList?type=video", 1),
+    ("/ScheduleGet", 1),
+    ("/StreamStatus", 2),
+]
+
+
+def _summary(values) -> dict:
+    return {
+        "count": len(values),
+        "p50_ms": _round(_percentile(values, 50)),
+        "p99_ms": _round(_percentile(values, 99)),
+        "max_ms": _round(max(values) if values else None),
+    }
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _write_data(root: Path, args, obs_port: int, window_ms: int) -> list:
+    rng = random.Random(args.seed)
+    dp.set_data_root(str(root))
+    dp.write_config({
+        "api-key": API_KEY,
+        "obs-host": "127.0.0.1",
+        "obs-port": str(obs_port),
+        "scene-name": "Scene 1",
+        # Points nowhere, so the media scanner leaves the catalog alone.
+        "obs-video-dir": str(root / "media"),
+        "preroll-sec": 1,
+    })
+    videos = [
+        {"uuid": str(uuid.uuid4()), "name": f"video{i:05d}.mp4", "duration": rng.randint(30, 600) * 1000, "isVideo": True}
+        for i in range(args.videos)
+    ]
+    stings = [
+        {"uuid": str(uuid.uuid4()), "name": f"sting{i:03d}.mp4", "duration": STING_MS, "isVideo": True}
+        for i in range(20)
+    ]
+    activities = [
+        {"uuid": str(uuid.uuid4()), "name": f"Activity {i}", "duration": rng.randint(5, 60) * 60000, "isVideo": False}
+        for i in range(args.activities)
+    ]
+    dp.write_videos(videos + stings)
+    dp.write_items(dp.ACTIVITY_LIST_FILE, activities)
+
+    # Half of the day already played, stings through the measured window so
+    # the playback loop is busy, and the rest of the day after it.
+    now = dp.current_time_ms()
+    schedule = []
+    cursor = now - 12 * 3600 * 1000
+    for _ in range(args.schedule_entries // 2):
+        video = rng.choice(videos)
+        schedule.append({"uuid": str(uuid.uuid4()), "start_timestamp": cursor, "name": video["name"]})
+        cursor += video["duration"]
+        if cursor >= now:
+            break
+    start = now + 3000
+    played = []
+    for i, at in enumerate(range(start, start + window_ms, STING_EVERY_MS)):
+        played.append({"uuid": str(uuid.uuid4()), "start_timestamp": at, "name": stings[i % len(stings)]["name"]})
+    schedule += played
+    cursor = start + window_ms
+    while len(schedule) < args.schedule_entries:
+        video = rng.choice(videos)
+        schedule.append({"uuid": str(uuid.uuid4()), "start_timestamp": cursor, "name": video["name"]})
+        cursor += video["duration"]
+    dp.write_schedule(schedule)
+    dp.flush_writes()
+    return played
+
+
+def _session() -> requests.Session:
+    session = requests.Session()
+    session.trust_env = False
+    session.headers["X-OBS-API-KEY"] = API_KEY
+    return session
+
+
+class _Dashboard:
+    def __init__(self, base_url: str, polls, revalidate: bool, results: list, stop: threading.Event, rng,
+                 events: list = None):
+        self.base_url = base_url
+        self.polls = polls
+        self.revalidate = revalidate
+        self.results = results
+        self.stop = stop
+        self.rng = rng
+        # (topic, ms) per event received; None leaves /events alone.
+        self.events = events
+
+    def start(self) -> list:
+        targets = [(self._poll, (path, interval)) for path, interval in self.polls]
+        if self.events is not None:
+            targets.append((self._subscribe, ()))
+        threads = []
+        for target, args in targets:
+            # One timer per poll, like setInterval, each on its own connection.
+            thread = threading.Thread(target=target, args=args, daemon=True)
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def _get(self, session: requests.Session, path: str, etag=None):
+        headers = {"If-None-Match": etag} if self.revalidate and etag else {}
+        started = time.perf_counter()
+        try:
+            response = session.get(self.base_url + path, headers=headers, timeout=10)
+            status = response.status_code
+            etag = response.headers.get("ETag", etag)
+        except requests.RequestException:
+            status = None
+        self.results.append((path, status, (time.perf_counter() - started) * 1000))
+        return etag
+
+    def _poll(self, path: str, interval: float) -> None:
+        session = _session()
+        etag = None
+        due = time.monotonic() + self.rng.uniform(0, interval)
+        while not self.stop.wait(max(0.0, due - time.monotonic())):
+            due += interval
+            etag = self._get(session, path, etag)
+        session.close()
+
+    def _subscribe(self) -> None:
+        # EventSource cannot set headers, so the key goes in the query string.
+        stream = requests.Session()
+        stream.trust_env = False
+        catalog = _session()
+        while not self.stop.is_set():
+            started = time.perf_counter()
+            connected = False
+            topic = None
+            try:
+                with stream.get(self.base_url + "/events", params={"api_key": API_KEY}, stream=True,
+                                timeout=(10, SSE_READ_TIMEOUT_SEC)) as response:
+                    response.raise_for_status()
+                    for line in response.iter_lines(decode_unicode=True):
+                        if self.stop.is_set():
+                            break
+                        if line.startswith("event:"):
+                            topic = line[len("event:"):].strip()
+                            continue
+                        if not line.startswith("data:") or topic is None:
+                            continue
+                        if not connected:
+                            connected = True
+                            self.events.append(("connect", (time.perf_counter() - started) * 1000))
+                        delay = None
+                        if topic == "current":
+                            # now_ts is when the server saw the change.
+                            delay = time.time() * 1000 - json.loads(line[len("data:"):])["now_ts"]
+                        self.events.append((topic, delay))
+                        if topic == "catalog":
+                            for path in CATALOG_FETCHES:
+                                self._get(catalog, path)
+                        topic = None
+            except (requests.RequestException, ValueError):
+                pass
+            if self.stop.is_set():
+                break
+            self.events.append(("error", None))
+            self.stop.wait(SSE_RETRY_SEC)
+        stream.close()
+        catalog.close()
+
+
+def _serve(root: str, port: int) -> None:
+    # Runs in the server process: app.py plus a timer probe on its loop.
+    dp.set_data_root(root)
+    import uvicorn
+    import app as app_module
+
+    lag_ms = deque(maxlen=100000)
+
+    async def probe():
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(LAG_PROBE_SEC)
+            lag_ms.append((time.perf_counter() - started - LAG_PROBE_SEC) * 1000)
+
+    def start_probe():
+        asyncio.get_running_loop().create_task(probe())
+
+    def take_lag():
+        samples = list(lag_ms)
+        lag_ms.clear()
+        return samples
+
+    app_module.app.router.on_startup.append(start_probe)
+    app_module.app.add_api_route("/BenchLoopLag", take_lag, methods=["GET"])
+    # Ahead of the static files mounted at "/".
+    app_module.app.router.routes.insert(0, app_module.app.router.routes.pop())
+    uvicorn.run(app_module.app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+
+
+def _wait_until_up(base_url: str, process: subprocess.Popen) -> None:
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SEC
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited with status {process.returncode}")
+        try:
+            requests.get(base_url + "/Revisions", headers={"X-OBS-API-KEY": API_KEY}, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.1)
+    raise SystemExit("Server did not come up")
+
+
+def run_level(args, dashboards: int) -> dict:
+    fake = FakeObs().start()
+    # Stings run from just after startup until well past the measurement.
+    window_ms = int((STARTUP_TIMEOUT_SEC + WARMUP_SEC + args.duration_sec) * 1000)
+    with tempfile.TemporaryDirectory(prefix="bench-http-") as tmp:
+        stings = _write_data(Path(tmp), args, fake.port, window_ms)
+        port = _free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        env = {k: v for k, v in os.environ.items() if not k.startswith("OBS_")}
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--serve", tmp, "--port", str(port)],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env,
+        )
+        try:
+            _wait_until_up(base_url, process)
+            rng = random.Random(args.seed)
+            results: list = []
+            events = None if args.legacy or args.poll else []
+            stop = threading.Event()
+            if args.legacy:
+                polls = LEGACY_POLLS
+            elif args.poll:
+                polls = DASHBOARD_POLLS
+            else:
+                polls = LIVE_POLLS
+            threads = []
+            for _ in range(dashboards):
+                threads += _Dashboard(base_url, polls, not args.legacy, results, stop, rng, events).start()
+            time.sleep(WARMUP_SEC)
+            warm = len(results)
+            warm_events = len(events or ())
+            session = _session()
+            session.get(base_url + "/BenchLoopLag", timeout=10)
+            started, window_start = time.monotonic(), dp.current_time_ms()
+            time.sleep(args.duration_sec)
+            elapsed = time.monotonic() - started
+            measured = results[warm:len(results)]
+            received = (events or [])[warm_events:len(events or ())]
+            window_stop = dp.current_time_ms()
+            lag = session.get(base_url + "/BenchLoopLag", timeout=10).json()
+            stop.set()
+            for thread in threads:
+                thread.join(timeout=15)
+        finally:
+            process.terminate()
+            process.wait(timeout=15)
+            fake.stop()
+
+    by_path = {}
+    for path, status, ms in measured:
+        by_path.setdefault(path, []).append((status, ms))
+    endpoints = {}
+    for path, samples in sorted(by_path.items()):
+        stats = _summary([ms for _, ms in samples])
+        stats["not_modified"] = sum(1 for status, _ in samples if status == 304)
+        stats["errors"] = sum(1 for status, _ in samples if status not in (200, 304))
+        endpoints[path] = stats
+    overall = _summary([ms for _, _, ms in measured])
+    stream = None
+    if events is not None:
+        topics = {}
+        for topic, _ in received:
+            if topic not in ("connect", "error"):
+                topics[topic] = topics.get(topic, 0) + 1
+        stream = {
+            "subscribers": dashboards,
+            # Connects include the ones made during warm-up.
+            "connect": _summary([ms for topic, ms in events if topic == "connect"]),
+            "events_per_sec": round(sum(topics.values()) / elapsed, 1),
+            "topics": topics,
+            # From the server noticing a state change to a subscriber reading it.
+            "delay": _summary([ms for topic, ms in received if topic == "current"]),
+            "errors": sum(1 for topic, _ in events if topic == "error"),
+        }
+    return {
+        "dashboards": dashboards,
+        "requests_per_sec": round(len(measured) / elapsed, 1),
+        "latency": overall,
+        "errors": sum(stats["errors"] for stats in endpoints.values()) + (stream["errors"] if stream else 0),
+        "endpoints": endpoints,
+        "events": stream,
+        "loop_lag": _summary(lag),
+        # How late clips that started inside the window went on air in OBS.
+        "on_air": _measure(fake, [e for e in stings if window_start <= e["start_timestamp"] < window_stop - STING_MS],
+                           STING_MS)["start"],
+    }
+
+
+def _print_report(levels) -> None:
+    print(f"{'dashboards':>10}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'errors':>8}"
+          f"{'lag p99':>9}{'lag max':>9}{'on-air p99':>11}")
+    for level in levels:
+        latency, lag, on_air = level["latency"], level["loop_lag"], level["on_air"]
+        print(f"{level['dashboards']:>10}{level['requests_per_sec']:>9}{latency['p50_ms']!s:>9}{latency['p99_ms']!s:>9}"
+              f"{latency['max_ms']!s:>9}{level['errors']:>8}{lag['p99_ms']!s:>9}{lag['max_ms']!s:>9}"
+              f"{on_air['p99_ms']!s:>11}")
+    for level in levels:
+        print(f"\n{level['dashboards']} dashboards:")
+        for path, stats in level["endpoints"].items():
+            print(f"  {path:24}{stats['count']:>7}{stats['p50_ms']:>9}{stats['p99_ms']:>9}{stats['max_ms']:>9}"
+                  f"  304: {stats['not_modified']}  errors: {stats['errors']}")
+        stream = level["events"]
+        if stream:
+            connect, delay = stream["connect"], stream["delay"]
+            print(f"  {'/events':24}{stream['subscribers']:>7} subscribers, {stream['events_per_sec']} events/s,"
+                  f" connect p50/p99 {connect['p50_ms']}/{connect['p99_ms']} ms,"
+                  f" delay p50/p99/max {delay['p50_ms']}/{delay['p99_ms']}/{delay['max_ms']} ms,"
+                  f" errors: {stream['errors']}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test app.py with simulated operator dashboards.")
+    parser.add_argument("--dashboards", default="1,5,10", help="comma-separated dashboard counts to run")
+    parser.add_argument("--duration-sec", type=float, default=15)
+    parser.add_argument("--videos", type=int, default=2000)
+    parser.add_argument("--activities", type=int, default=200)
+    parser.add_argument("--schedule-entries", type=int, default=3000)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--poll", action="store_true", help="poll like index.html without /events")
+    mode.add_argument("--legacy", action="store_true", help="poll like the older page, without revalidation")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-p99-ms", type=float)
+    parser.add_argument("--max-lag-p99-ms", type=float)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.serve:
+        _serve(args.serve, args.port)
+        return 0
+
+    levels = [run_level(args, int(n)) for n in args.dashboards.split(",") if n.strip()]
+    if args.json:
+        print(json.dumps(levels, indent=2))
+    else:
+        _print_report(levels)
+
+    failures = []
+    for level in levels:
+        n = level["dashboards"]
+        if level["errors"]:
+            failures.append(f"{n} dashboards: {level['errors']} failed requests or dropped streams")
+        p99 = level["latency"]["p99_ms"]
+        if args.max_p99_ms is not None and p99 is not None and p99 > args.max_p99_ms:
+            failures.append(f"{n} dashboards: p99 {p99} ms exceeds {args.max_p99_ms} ms")
+        lag_p99 = level["loop_lag"]["p99_ms"]
+        if args.max_lag_p99_ms is not None and lag_p99 is not None and lag_p99 > args.max_lag_p99_ms:
+            failures.append(f"{n} dashboards: loop lag p99 {lag_p99} ms exceeds {args.max_lag_p99_ms} ms")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import data_provider as dp
+import obs_gateway
+from fake_obs import FakeObs
+from scheduler_loop import PlaybackLoop, _percentile
+
+# End-to-end playback benchmark: runs PlaybackLoop and obs_gateway against
+# fake_obs.FakeObs with a synthetic schedule and measures, from the fake's
+# point of view, how late each clip appeared on and left the program scene,
+# and how many requests each clip cost.
+#
+#   python bench_playback.py --clips 20 --latency-ms 5 --max-start-p99-ms 150
+#
+# Exits with status 1 when a clip never went on air or a --max-* limit is
+# exceeded, so it can gate CI.
+CONNECT_TIMEOUT_SEC = 10
+SETTLE_MS = 1000
+
+
+def _summary(values) -> dict:
+    return {
+        "count": len(values),
+        "p50_ms": _percentile(values, 50),
+        "p95_ms": _percentile(values, 95),
+        "p99_ms": _percentile(values, 99),
+        "max_ms": max(values) if values else None,
+    }
+
+
+def _parse_pairs(values, default):
+    pairs = {}
+    for value in values or []:
+        key, _, amount = value.partition("=")
+        pairs[key] = float(amount) if amount else default
+    return pairs
+
+
+def _write_data(root: Path, args, port: int) -> None:
+    dp.set_data_root(str(root))
+    dp.write_config({
+        "obs-host": "127.0.0.1",
+        "obs-port": str(port),
+        "obs-password": "",
+        "scene-name": "Scene 1",
+        # Points nowhere, so the media scanner leaves the catalog alone.
+        "obs-video-dir": str(root / "media"),
+        "preroll-sec": args.preroll_sec,
+        "obs-batch-requests": not args.no_batch,
+        "sources-to-mute": args.mute,
+    })
+    dp.write_videos([
+        {"uuid": str(uuid.uuid4()), "name": f"clip{i:04d}.mp4", "duration": args.duration_ms, "isVideo": True}
+        for i in range(args.clips)
+    ])
+    dp.write_schedule([])
+    dp.flush_writes()
+
+
+def _schedule_clips(args) -> list:
+    first = dp.current_time_ms() + args.lead_ms
+    entries = []
+    for i, video in enumerate(sorted(dp.get_videos()[0].values(), key=lambda v: v["name"])):
+        entries.append({
+            "uuid": str(uuid.uuid4()),
+            "start_timestamp": first + i * (args.duration_ms + args.gap_ms),
+            "name": video["name"],
+        })
+    dp.write_schedule(entries)
+    dp.flush_writes()
+    return entries
+
+
+def _measure(fake: FakeObs, entries: list, duration_ms: int) -> dict:
+    shown, hidden = {}, {}
+    for t_ms, change, source in fake.timeline:
+        if change == "show":
+            shown.setdefault(source, t_ms)
+        elif source in shown:
+            hidden.setdefault(source, t_ms)
+    start_late, stop_late, missed = [], [], []
+    for entry in entries:
+        source = f"Scheduler: {entry['name']} [{entry['uuid']}]"
+        if source not in shown:
+            missed.append(entry["name"])
+            continue
+        start_late.append(shown[source] - entry["start_timestamp"])
+        if source in hidden:
+            stop_late.append(hidden[source] - entry["start_timestamp"] - duration_ms)
+    return {"start": _summary(start_late), "stop": _summary(stop_late), "missed": missed}
+
+
+async def _play(args, entries) -> dict:
+    loop = PlaybackLoop()
+    await loop.start()
+    last_stop = max(e["start_timestamp"] for e in entries) + args.duration_ms
+    while dp.current_time_ms() < last_stop + SETTLE_MS:
+        await asyncio.sleep(0.1)
+    loop.stop()
+    return loop.latency_stats()
+
+
+def run(args) -> dict:
+    fake = FakeObs()
+    fake.set_latency("*", args.latency_ms / 1000.0)
+    for request_type, ms in _parse_pairs(args.latency, 0).items():
+        fake.set_latency(request_type, ms / 1000.0)
+    for request_type, count in _parse_pairs(args.fail, 1).items():
+        fake.fail(request_type, int(count) if count >= 0 else None)
+    fake.start()
+    with tempfile.TemporaryDirectory(prefix="bench-playback-") as tmp:
+        root = Path(tmp)
+        _write_data(root, args, fake.port)
+        obs_gateway.start_session()
+        deadline = time.monotonic() + CONNECT_TIMEOUT_SEC
+        while not obs_gateway.connection_status()["connected"]:
+            if time.monotonic() > deadline:
+                raise SystemExit(f"Could not connect to the fake OBS: {obs_gateway.connection_status()['last_error']}")
+            time.sleep(0.05)
+        # Leave the connect-time status and monitoring requests out of the counts.
+        time.sleep(0.5)
+        baseline_requests, baseline_messages = len(fake.requests), fake.messages
+        entries = _schedule_clips(args)
+        loop_stats = asyncio.run(_play(args, entries))
+        dp.flush_writes()
+        log = root / "logs" / "errors.log"
+        # Records start with a timestamp; tracebacks continue on further lines.
+        errors = len(re.findall(r"^\d{4}-\d\d-\d\d ", log.read_text(encoding="utf-8"), re.M)) if log.exists() else 0
+    fake.stop()
+    requests = fake.requests[baseline_requests:]
+    counts = {}
+    for record in requests:
+        counts[record["type"]] = counts.get(record["type"], 0) + 1
+    report = _measure(fake, entries, args.duration_ms)
+    report.update({
+        "clips": args.clips,
+        "requests_per_clip": round(len(requests) / args.clips, 2),
+        "round_trips_per_clip": round((fake.messages - baseline_messages) / args.clips, 2),
+        "failed_requests": sum(1 for record in requests if not record["ok"]),
+        "request_counts": dict(sorted(counts.items())),
+        "loop": loop_stats,
+        "errors_logged": errors,
+    })
+    return report
+
+
+def _print_report(report: dict) -> None:
+    print(f"clips: {report['clips']}  missed: {len(report['missed'])}  errors logged: {report['errors_logged']}")
+    print(f"{'':16}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    rows = [("on air", report["start"]), ("off air", report["stop"]),
+            ("loop dispatch", report["loop"]["dispatch"]), ("loop complete", report["loop"]["complete"])]
+    for label, stats in rows:
+        cells = "".join(f"{'-' if stats[k] is None else stats[k]:>9}" for k in ("p50_ms", "p95_ms", "p99_ms", "max_ms"))
+        print(f"{label:16}{stats['count']:>7}{cells}")
+    print(f"requests/clip: {report['requests_per_clip']}  round trips/clip: {report['round_trips_per_clip']}"
+          f"  failed: {report['failed_requests']}")
+    for request_type, count in report["request_counts"].items():
+        print(f"  {request_type:28}{count:>6}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure playback latency against a fake OBS.")
+    parser.add_argument("--clips", type=int, default=10)
+    parser.add_argument("--duration-ms", type=int, default=1000)
+    parser.add_argument("--gap-ms", type=int, default=300, help="pause between clips; 0 plays them back to back")
+    parser.add_argument("--lead-ms", type=int, default=2000, help="time from scheduling to the first start")
+    parser.add_argument("--preroll-sec", type=float, default=1)
+    parser.add_argument("--no-batch", action="store_true", help="send requests one at a time")
+    parser.add_argument("--mute", action="append", default=[], help="source to mute while clips play")
+    parser.add_argument("--latency-ms", type=float, default=2, help="delay for every request")
+    parser.add_argument("--latency", action="append", metavar="TYPE=MS", help="delay for one request type")
+    parser.add_argument("--fail", action="append", metavar="TYPE[=COUNT]",
+                        help="fail the next COUNT requests of TYPE (default 1, -1 for all)")
+    parser.add_argument("--max-start-p99-ms", type=float)
+    parser.add_argument("--max-stop-p99-ms", type=float)
+    parser.add_argument("--max-requests-per-clip", type=float)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+    # obsws-python logs every failed request itself; the gateway's errors
+    # still land in logs/errors.log and are counted in the report.
+    logging.getLogger("obsws_python").setLevel(logging.CRITICAL)
+    # Environment overrides would point the gateway at a real OBS.
+    for name in ("OBS_HOST", "OBS_PORT", "OBS_PASSWORD", "OBS_SCENE", "OBS_BATCH_REQUESTS", "OBS_SOURCES_TO_MUTE"):
+        os.environ.pop(name, None)
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+
+    failures = []
+    if report["missed"]:
+        failures.append(f"{len(report['missed'])} clips never went on air")
+    for key, limit in (("start", args.max_start_p99_ms), ("stop", args.max_stop_p99_ms)):
+        p99 = report[key]["p99_ms"]
+        if limit is not None and (p99 is None or p99 > limit):
+            failures.append(f"{key} p99 {p99} ms exceeds {limit} ms")
+    if args.max_requests_per_clip is not None and report["requests_per_clip"] > args.max_requests_per_clip:
+        failures.append(f"{report['requests_per_clip']} requests per clip exceeds {args.max_requests_per_clip}")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
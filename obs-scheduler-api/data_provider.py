@@ -1,19 +1,28 @@
 import json
+from contextlib import contextmanager
 import urllib.parse
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Tuple
 import time
 import os
-import uuid
-import subprocess
 import shutil
+import copy
+import threading
+import atexit
+import logging
+from types import MappingProxyType
+
+from schedule_index import IntervalIndex, SortedSchedule
+import metrics
+import sqlite_store
+from schedule_journal import COMPACT_OPS_DEFAULT, KEEP_SEGMENTS_DEFAULT, ScheduleJournal
 
 DATA_ROOT = Path(__file__).resolve().parent.parent / "data"
 
 # Allow override when set before import
 def set_data_root(root_path: str):
-    global DATA_ROOT, VIDEO_LIST_FILE, ACTIVITY_LIST_FILE, SCHEDULE_FILE, EVENT_START_TIMESTAMP_FILE, SCHEDULE_SAVE_DIR, CONFIG_FILE
+    global DATA_ROOT, VIDEO_LIST_FILE, ACTIVITY_LIST_FILE, SCHEDULE_FILE, EVENT_START_TIMESTAMP_FILE, SCHEDULE_SAVE_DIR, CONFIG_FILE, PROBE_CACHE_FILE
     DATA_ROOT = Path(root_path)
     VIDEO_LIST_FILE = DATA_ROOT / "filelist.txt"
     ACTIVITY_LIST_FILE = DATA_ROOT / "alist.txt"
@@ -21,6 +30,7 @@ def set_data_root(root_path: str):
     EVENT_START_TIMESTAMP_FILE = DATA_ROOT / "timestamp"
     SCHEDULE_SAVE_DIR = DATA_ROOT / "schedules"
     CONFIG_FILE = DATA_ROOT / "config.json"
+    PROBE_CACHE_FILE = DATA_ROOT / "probecache.json"
 
 VIDEO_LIST_FILE = DATA_ROOT / "filelist.txt"
 ACTIVITY_LIST_FILE = DATA_ROOT / "alist.txt"
@@ -28,54 +38,408 @@ SCHEDULE_FILE = DATA_ROOT / "schedule.json"
 EVENT_START_TIMESTAMP_FILE = DATA_ROOT / "timestamp"
 SCHEDULE_SAVE_DIR = DATA_ROOT / "schedules"
 CONFIG_FILE = DATA_ROOT / "config.json"
-_LAST_SCAN = 0
-_SCAN_INTERVAL_SEC = 5
+PROBE_CACHE_FILE = DATA_ROOT / "probecache.json"
+
+
+class RevisionConflict(Exception):
+    def __init__(self, store: str, expected: int, actual: int):
+        super().__init__(f"{store} is at revision {actual}, expected {expected}")
+        self.store = store
+        self.expected = expected
+        self.actual = actual
+
+
+class _CachedFile:
+    __slots__ = ("key", "value", "derived")
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+        self.derived = {}
+
+
+# Parsed file contents keyed by path. An entry is reused for as long as the
+# file's (mtime_ns, size) is unchanged, so steady-state reads cost one stat().
+# Cached values are shared between callers and must never be mutated.
+_CACHE: Dict[Path, _CachedFile] = {}
+_CHANGE_LISTENERS = []
+# Bumped every time a path's cached contents are replaced. Only ever grows
+# within a process, so (process, revision) identifies a version of the file.
+_REVISIONS: Dict[Path, int] = {}
+# Guards publishing a cache entry and bumping its revision. Nothing that
+# can block (file reads, flush_writes()) runs while it is held.
+_CACHE_LOCK = threading.Lock()
+_SCHEDULE_PAYLOAD = (None, None)
+_SCHEDULE_INDEX = (None, None)
+# Single writer for read-modify-write cycles on any store; see writing().
+_WRITE_LOCK = threading.RLock()
+# Length assumed for entries whose item is unknown or has no duration yet.
+DEFAULT_DURATION_MS = 60000
+# Writes are visible to readers in this process immediately and reach disk
+# from a background writer after at most write-batch-ms, so a burst of edits
+# to one file costs one durable write. Text waiting to be written by path.
+WRITE_BATCH_MS_DEFAULT = 100
+FLUSH_TIMEOUT_SEC = 10
+# Open SqliteStore while config.json selects "storage-backend": "sqlite".
+_SQLITE = None
+# Open ScheduleJournal for the JSON backend when "schedule-journal" is on.
+_JOURNAL = None
+_PENDING_WRITES: Dict[Path, Tuple[str, str]] = {}
+_WRITE_COND = threading.Condition()
+_FILE_LOCK = threading.Lock()
+_WRITER = None
+_FLUSH_REQUESTED = False
+# Replaces the wall clock behind current_time_ms() when set; see set_clock().
+_CLOCK = None
+# Off for offline tools that work on the catalog as it is on disk.
+_AUTO_SCAN = True
+
+
+def _stat_key(path: Path):
+    try:
+        st = path.stat()
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _sqlite_table(path: Path):
+    # (store, table) when path's data lives in SQLite, else (None, None).
+    global _SQLITE
+    if path == CONFIG_FILE:
+        return None, None
+    table = {SCHEDULE_FILE: "schedule", VIDEO_LIST_FILE: "video", ACTIVITY_LIST_FILE: "activity"}.get(path)
+    if table is None:
+        return None, None
+    cfg = _cached_file(CONFIG_FILE, json.loads, {}).value
+    if str(cfg.get("storage-backend", "json")).strip().lower() != "sqlite":
+        return None, None
+    db_path = DATA_ROOT / sqlite_store.DB_FILE_NAME
+    if _SQLITE is None or _SQLITE.path != db_path:
+        flush_writes()
+        fresh = not db_path.exists()
+        _SQLITE = sqlite_store.SqliteStore(db_path)
+        if fresh:
+            sqlite_store.import_json_layout(_SQLITE, DATA_ROOT)
+    return _SQLITE, table
+
+
+def _schedule_journal():
+    global _JOURNAL
+    if _sqlite_table(SCHEDULE_FILE)[0] is not None:
+        return None
+    cfg = _cached_file(CONFIG_FILE, json.loads, {}).value
+    if str(cfg.get("schedule-journal", "")).strip().lower() not in ("1", "true", "yes", "on"):
+        return None
+    directory = DATA_ROOT / "journal"
+    if _JOURNAL is None or _JOURNAL.directory != directory:
+        flush_writes()
+        _JOURNAL = ScheduleJournal(
+            directory, SCHEDULE_FILE,
+            lambda path, text: _replace_file(path, text, "utf-8"),
+            _dump_json,
+        )
+    return _JOURNAL
+
+
+def _source(path: Path):
+    # Cache key for path's current contents, plus a loader when they do not
+    # come from parsing the file itself.
+    store, table = _sqlite_table(path)
+    if store is not None:
+        return ("sqlite", store.revision(table)), lambda: store.load(table)
+    journal = _schedule_journal() if path == SCHEDULE_FILE else None
+    if journal is not None:
+        return journal.key(), journal.load
+    return _stat_key(path), None
+
+
+def _source_key(path: Path):
+    return _source(path)[0]
+
+
+def _cached_file(path: Path, parse, default) -> _CachedFile:
+    entry = _CACHE.get(path)
+    # Until a pending write lands, the primed entry is newer than the file.
+    if entry is not None and path in _PENDING_WRITES:
+        return entry
+    key, load = _source(path)
+    if entry is not None and entry.key == key:
+        return entry
+    if load is not None:
+        value = load()
+        key = _source_key(path)
+    elif key is None:
+        value = default
+    else:
+        label = _metric_file(path)
+        with metrics.FILE_READ_SECONDS.time(file=label), path.open("r", encoding="utf-8-sig") as fh:
+            metrics.FILE_READ_BYTES.inc(os.fstat(fh.fileno()).st_size, file=label)
+            value = parse(fh.read())
+    with _CACHE_LOCK:
+        # Readers that noticed the same change publish it, and bump the
+        # revision, only once.
+        current = _CACHE.get(path)
+        if current is not None and (path in _PENDING_WRITES or current.key == key):
+            return current
+        entry = _CachedFile(key, value)
+        _CACHE[path] = entry
+        _REVISIONS[path] = _REVISIONS.get(path, 0) + 1
+    return entry
+
+
+def _cached_derived(path: Path, parse, default, name: str, build):
+    entry = _cached_file(path, parse, default)
+    if name not in entry.derived:
+        entry.derived[name] = build(entry.value)
+    return entry.derived[name]
+
+
+def _prime_cache(path: Path, value, derived=None) -> None:
+    entry = _CachedFile(_source_key(path), value)
+    if derived:
+        entry.derived.update(derived)
+    with _CACHE_LOCK:
+        _CACHE[path] = entry
+        _REVISIONS[path] = _REVISIONS.get(path, 0) + 1
+
+
+@contextmanager
+def writing(expected: Dict[str, int] | None = None):
+    # Wrap a read-modify-write cycle so concurrent writers cannot lose each
+    # other's updates. expected maps get_revisions() keys to the revision
+    # the caller based its change on; RevisionConflict is raised if any has
+    # moved. Plain reads never take the lock.
+    with _WRITE_LOCK:
+        if expected:
+            current = get_revisions()
+            for store, revision in expected.items():
+                if current[store] != revision:
+                    raise RevisionConflict(store, revision, current[store])
+        yield
+
+
+def add_change_listener(callback) -> None:
+    # callback(path) runs on the writing thread after every write made
+    # through this module. Edits made outside the process are not reported.
+    if callback not in _CHANGE_LISTENERS:
+        _CHANGE_LISTENERS.append(callback)
+
+
+def _notify_change(path: Path) -> None:
+    for callback in list(_CHANGE_LISTENERS):
+        try:
+            callback(path)
+        except Exception:
+            pass
+
+
+def _read_json_array(path: Path) -> List[dict]:
+    return _cached_file(path, json.loads, []).value
 
 
 def _load_json_array(path: Path) -> List[dict]:
-    if not path.exists():
-        return []
-    with path.open("r", encoding="utf-8-sig") as fh:
-        return json.load(fh)
+    return [dict(entry) for entry in _read_json_array(path)]
+
+
+def _debug_enabled() -> bool:
+    cfg = _cached_file(CONFIG_FILE, json.loads, {}).value
+    return str(cfg.get("debug", "")).strip().lower() in ("1", "true", "yes", "on")
+
 
+def _write_batch_sec() -> float:
+    cfg = _cached_file(CONFIG_FILE, json.loads, {}).value
+    try:
+        return max(0.0, float(cfg.get("write-batch-ms", WRITE_BATCH_MS_DEFAULT)) / 1000.0)
+    except (TypeError, ValueError):
+        return WRITE_BATCH_MS_DEFAULT / 1000.0
+
+
+def _metric_file(path: Path) -> str:
+    # Journal segments and saved schedules are grouped by their directory.
+    return path.name if path.parent == DATA_ROOT else path.parent.name
 
-def _write_json(path: Path, payload) -> None:
+
+def _replace_file(path: Path, text: str, encoding: str) -> None:
+    # Readers, in or out of process, see either the old file or the new one.
+    started = time.perf_counter()
     path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as fh:
-        json.dump(payload, fh, indent=2)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with tmp.open("w", encoding=encoding) as fh:
+        fh.write(text)
+        fh.flush()
+        os.fsync(fh.fileno())
+        size = os.fstat(fh.fileno()).st_size
+    for attempt in range(5):
+        try:
+            os.replace(tmp, path)
+            break
+        except PermissionError:
+            # Windows refuses to replace a file another process has open.
+            if attempt == 4:
+                raise
+            time.sleep(0.05)
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    metrics.FILE_WRITE_BYTES.inc(size, file=_metric_file(path))
+    metrics.FILE_WRITE_SECONDS.observe(time.perf_counter() - started, file=_metric_file(path))
+
+
+def _write_pending(batch: Dict[Path, Tuple[str, str]]) -> None:
+    failed = False
+    with _FILE_LOCK:
+        for path, pending in batch.items():
+            with _WRITE_COND:
+                # Superseded by a newer write, which will land after this one.
+                if _PENDING_WRITES.get(path) is not pending:
+                    continue
+            try:
+                _replace_file(path, *pending)
+            except OSError as exc:
+                failed = True
+                logging.getLogger("obs_scheduler").error("Writing %s failed: %s", path, exc)
+                continue
+            with _WRITE_COND:
+                if _PENDING_WRITES.get(path) is pending:
+                    entry = _CACHE.get(path)
+                    if entry is not None:
+                        entry.key = _stat_key(path)
+                    del _PENDING_WRITES[path]
+    with _WRITE_COND:
+        _WRITE_COND.notify_all()
+    if failed:
+        time.sleep(1)
+
+
+def _writer_loop() -> None:
+    global _FLUSH_REQUESTED
+    while True:
+        with _WRITE_COND:
+            _WRITE_COND.wait_for(lambda: _PENDING_WRITES)
+            deadline = time.monotonic() + _write_batch_sec()
+            while not _FLUSH_REQUESTED and time.monotonic() < deadline:
+                _WRITE_COND.wait(deadline - time.monotonic())
+            _FLUSH_REQUESTED = False
+            batch = dict(_PENDING_WRITES)
+        _write_pending(batch)
+
+
+def _queue_write(path: Path, text: str, encoding: str, value, derived=None) -> None:
+    global _WRITER
+    # Primed before the write is queued, and outside _WRITE_COND, which is
+    # never held while taking _CACHE_LOCK.
+    _prime_cache(path, value, derived)
+    with _WRITE_COND:
+        pending = (text, encoding)
+        _PENDING_WRITES[path] = pending
+        if _write_batch_sec() > 0:
+            if _WRITER is None:
+                _WRITER = threading.Thread(target=_writer_loop, name="data-writer", daemon=True)
+                _WRITER.start()
+            _WRITE_COND.notify_all()
+            pending = None
+    if pending is not None:
+        _write_pending({path: pending})
+    _notify_change(path)
+
+
+def flush_writes() -> None:
+    # Blocks until everything written so far is on disk, or the writer has
+    # been failing for FLUSH_TIMEOUT_SEC.
+    global _FLUSH_REQUESTED
+    with _WRITE_COND:
+        if _PENDING_WRITES and _WRITER is None:
+            batch = dict(_PENDING_WRITES)
+        else:
+            batch = None
+            deadline = time.monotonic() + FLUSH_TIMEOUT_SEC
+            while _PENDING_WRITES and time.monotonic() < deadline:
+                _FLUSH_REQUESTED = True
+                _WRITE_COND.notify_all()
+                _WRITE_COND.wait(1)
+    if batch:
+        _write_pending(batch)
+
+
+atexit.register(flush_writes)
+
+
+def _write_json(path: Path, payload, derived=None) -> None:
+    store, table = _sqlite_table(path)
+    if store is not None:
+        store.replace(table, payload)
+        _prime_cache(path, json.loads(json.dumps(payload)), derived)
+        _notify_change(path)
+        return
+    journal = _schedule_journal() if path == SCHEDULE_FILE else None
+    if journal is not None:
+        with writing():
+            _compact_journal(journal, payload, bump=True)
+            _prime_cache(path, json.loads(json.dumps(payload)), derived)
+        _notify_change(path)
+        return
+    text = _dump_json(payload)
+    _queue_write(path, text, "utf-8", json.loads(text), derived)
+
+
+def _dump_json(payload) -> str:
+    if _debug_enabled():
+        return json.dumps(payload, indent=2)
+    return json.dumps(payload, separators=(",", ":"))
+
+
+def _write_text(path: Path, text: str, value, encoding: str = "utf-8") -> None:
+    _queue_write(path, text, encoding, value)
 
 
 def get_config() -> dict:
-    if not CONFIG_FILE.exists():
-        return {}
-    with CONFIG_FILE.open("r", encoding="utf-8-sig") as fh:
-        return json.load(fh)
+    return copy.deepcopy(_cached_file(CONFIG_FILE, json.loads, {}).value)
+
+def get_config_revision() -> int:
+    _cached_file(CONFIG_FILE, json.loads, {})
+    return _REVISIONS.get(CONFIG_FILE, 0)
 
 def write_config(config: dict) -> None:
     _write_json(CONFIG_FILE, config)
 
 
 def get_contest_start() -> int:
-    if not EVENT_START_TIMESTAMP_FILE.exists():
+    value = _cached_file(EVENT_START_TIMESTAMP_FILE, lambda text: int(text.strip()), None).value
+    if value is None:
         now = int(current_time_ms())
-        EVENT_START_TIMESTAMP_FILE.parent.mkdir(parents=True, exist_ok=True)
-        EVENT_START_TIMESTAMP_FILE.write_text(str(now), encoding="ascii")
+        _write_text(EVENT_START_TIMESTAMP_FILE, str(now), now, encoding="ascii")
         return now
-    return int(EVENT_START_TIMESTAMP_FILE.read_text(encoding="utf-8-sig").strip())
+    return value
 
 
 def current_time_ms() -> int:
+    if _CLOCK is not None:
+        return int(_CLOCK())
     return int(time.time() * 1000)
 
 
-def _load_items(path: Path) -> Tuple[Dict[str, dict], Dict[str, dict]]:
-    items = _load_json_array(path)
+def set_clock(clock) -> None:
+    # clock() returns epoch milliseconds; None goes back to the wall clock.
+    global _CLOCK
+    _CLOCK = clock
+
+
+def _index_items(items: List[dict]) -> Tuple[Dict[str, dict], Dict[str, dict]]:
     by_name = {}
     by_uuid = {}
     for entry in items:
         by_name[entry["name"]] = entry
         by_uuid[entry["uuid"]] = entry
-    return by_name, by_uuid
+    return MappingProxyType(by_name), MappingProxyType(by_uuid)
+
+
+def _load_items(path: Path) -> Tuple[Dict[str, dict], Dict[str, dict]]:
+    # Read-only views over the cached catalog; copy an item before changing it.
+    return _cached_derived(path, json.loads, [], "items", _index_items)
 
 
 def get_videos() -> Tuple[Dict[str, dict], Dict[str, dict]]:
@@ -116,6 +480,103 @@ def write_schedule(schedule: List[dict]) -> None:
     _write_json(SCHEDULE_FILE, schedule)
 
 
+def get_sorted_schedule() -> SortedSchedule:
+    # Shared until the next write; use the mutators below to change it.
+    return _cached_derived(SCHEDULE_FILE, json.loads, [], "sorted", SortedSchedule)
+
+
+def _journal_compact_ops() -> int:
+    cfg = _cached_file(CONFIG_FILE, json.loads, {}).value
+    try:
+        return max(1, int(cfg.get("journal-compact-ops", COMPACT_OPS_DEFAULT)))
+    except (TypeError, ValueError):
+        return COMPACT_OPS_DEFAULT
+
+
+def _journal_keep_segments() -> int:
+    cfg = _cached_file(CONFIG_FILE, json.loads, {}).value
+    try:
+        return max(1, int(cfg.get("journal-keep-segments", KEEP_SEGMENTS_DEFAULT)))
+    except (TypeError, ValueError):
+        return KEEP_SEGMENTS_DEFAULT
+
+
+def _compact_journal(journal: ScheduleJournal, entries: List[dict], bump: bool) -> None:
+    journal.compact(entries, bump)
+    # Segments that saved schedules replay from are kept past the limit.
+    pinned = [v["journal_seq"] for versions in _saved_schedules().values() for v in versions if "journal_seq" in v]
+    journal.prune(_journal_keep_segments(), pinned)
+
+
+def _update_sorted_schedule(change, change_row, record: dict) -> bool:
+    # The new store is handed to the cache with the write, so the edit is
+    # not followed by a re-parse and re-sort of the whole schedule. With
+    # SQLite only the affected rows are written; with the journal the edit
+    # is one appended record.
+    with writing():
+        current = get_sorted_schedule()
+        store = current.copy()
+        if not change(store):
+            return False
+        db, _ = _sqlite_table(SCHEDULE_FILE)
+        journal = _schedule_journal() if db is None else None
+        if db is not None:
+            change_row(db)
+        elif journal is not None:
+            if journal.stale:
+                # schedule.json was replaced from outside; start from it.
+                _compact_journal(journal, current.entries(), bump=True)
+            journal.append(dict(record, ts=current_time_ms()))
+            if journal.ops >= _journal_compact_ops():
+                _compact_journal(journal, store.entries(), bump=False)
+        else:
+            _write_json(SCHEDULE_FILE, store.entries(), {"sorted": store})
+            return True
+        _prime_cache(SCHEDULE_FILE, store.entries(), {"sorted": store})
+    _notify_change(SCHEDULE_FILE)
+    return True
+
+
+def add_schedule_entry(entry: dict) -> None:
+    _update_sorted_schedule(
+        lambda store: store.add(entry) or True,
+        lambda db: db.add_schedule_entry(entry),
+        {"op": "add", "entry": entry},
+    )
+
+
+def remove_schedule_entry(uuid: str) -> bool:
+    return _update_sorted_schedule(
+        lambda store: store.remove(uuid),
+        lambda db: db.remove_schedule_entry(uuid),
+        {"op": "remove", "uuid": uuid},
+    )
+
+
+def reschedule_schedule_entry(uuid: str, start: int) -> bool:
+    return _update_sorted_schedule(
+        lambda store: store.reschedule(uuid, start),
+        lambda db: db.reschedule_schedule_entry(uuid, start),
+        {"op": "reschedule", "uuid": uuid, "start": start},
+    )
+
+
+def rename_schedule_item(old: str, new: str) -> bool:
+    return _update_sorted_schedule(
+        lambda store: store.rename(old, new),
+        lambda db: db.rename_schedule_item(old, new),
+        {"op": "rename", "from": old, "to": new},
+    )
+
+
+def shift_schedule(delta: int) -> bool:
+    return _update_sorted_schedule(
+        lambda store: store.shift(delta),
+        lambda db: db.shift_schedule(delta),
+        {"op": "shift", "delta": delta},
+    )
+
+
 def update_schedule_from_json(raw: str) -> None:
     decoded = urllib.parse.unquote(raw)
     payload = json.loads(decoded)
@@ -125,107 +586,273 @@ def update_schedule_from_json(raw: str) -> None:
 def start_contest(new_ts_ms: int | None = None) -> None:
     if new_ts_ms is None:
         new_ts_ms = current_time_ms()
-    current_start = get_contest_start()
-    diff = new_ts_ms - current_start
-    EVENT_START_TIMESTAMP_FILE.write_text(str(new_ts_ms), encoding="utf-8")
-    schedule = get_schedule()
-    for entry in schedule:
-        entry["start_timestamp"] += diff
-    write_schedule(schedule)
+    with writing():
+        current_start = get_contest_start()
+        diff = new_ts_ms - current_start
+        _write_text(EVENT_START_TIMESTAMP_FILE, str(new_ts_ms), int(new_ts_ms))
+        shift_schedule(diff)
 
 
-def get_schedule_list() -> List[str]:
+def _manifest_path() -> Path:
+    return SCHEDULE_SAVE_DIR / "manifest.json"
+
+
+def _scan_saved_schedules() -> Dict[str, List[dict]]:
+    manifest: Dict[str, List[dict]] = {}
     if not SCHEDULE_SAVE_DIR.exists():
-        return []
-    seen = set()
-    for f in SCHEDULE_SAVE_DIR.glob("*.*"):
-        seen.add(f.stem)
-    return sorted(seen)
+        return manifest
+    for f in SCHEDULE_SAVE_DIR.iterdir():
+        name, _, version = f.name.rpartition(".")
+        if not name or name.startswith(".") or not version.isdigit() or not f.is_file():
+            continue
+        st = f.stat()
+        info = {"version": int(version), "size": st.st_size, "saved_at": st.st_mtime_ns // 1_000_000}
+        try:
+            payload = json.loads(f.read_text(encoding="utf-8-sig"))
+        except (OSError, ValueError):
+            payload = None
+        if isinstance(payload, dict) and "journal_seq" in payload:
+            info["journal_seq"] = payload["journal_seq"]
+        manifest.setdefault(name, []).append(info)
+    for versions in manifest.values():
+        versions.sort(key=lambda v: v["version"])
+    return manifest
+
+
+def _saved_schedules(rebuild: bool = False) -> Dict[str, List[dict]]:
+    # name -> versions (ascending), kept in schedules/manifest.json so listing
+    # and picking the latest version never scan the directory. Rebuilt from
+    # the files when the manifest is missing.
+    path = _manifest_path()
+    manifest = None if rebuild else _cached_file(path, json.loads, None).value
+    if manifest is None:
+        manifest = _scan_saved_schedules()
+        _write_json(path, manifest)
+    return manifest
+
+
+def get_schedule_list() -> List[str]:
+    return sorted(_saved_schedules())
+
+
+def _journal_seq_for_save() -> int | None:
+    # A journal position that rebuilds exactly the schedule being served.
+    journal = _schedule_journal()
+    if journal is None:
+        return None
+    current = get_sorted_schedule()
+    if journal.base is None or journal.stale:
+        # No segment yet, or schedule.json was replaced from outside and the
+        # journal's records no longer describe it: start a segment from it.
+        _compact_journal(journal, current.entries(), bump=True)
+        _prime_cache(SCHEDULE_FILE, current.entries(), {"sorted": current})
+    return journal.seq
 
 
 def save_schedule(name: str) -> None:
-    schedule = _load_json_array(SCHEDULE_FILE)
-    payload = {"start_timestamp": get_contest_start(), "schedule": schedule}
-    count = sum(1 for f in SCHEDULE_SAVE_DIR.glob(f"{name}.*"))
-    target = SCHEDULE_SAVE_DIR / f"{name}.{count}"
-    _write_json(target, payload)
+    with writing():
+        seq = _journal_seq_for_save()
+        if seq is not None:
+            # The journal can rebuild the schedule at seq; no need to copy it.
+            payload = {"start_timestamp": get_contest_start(), "journal_seq": seq}
+        else:
+            payload = {"start_timestamp": get_contest_start(), "schedule": _read_json_array(SCHEDULE_FILE)}
+        manifest = copy.deepcopy(_saved_schedules())
+        versions = manifest.setdefault(name, [])
+        version = versions[-1]["version"] + 1 if versions else 0
+        text = _dump_json(payload)
+        _queue_write(SCHEDULE_SAVE_DIR / f"{name}.{version}", text, "utf-8", json.loads(text))
+        info = {"version": version, "size": len(text.encode("utf-8")), "saved_at": current_time_ms()}
+        if seq is not None:
+            info["journal_seq"] = seq
+        versions.append(info)
+        _write_json(_manifest_path(), manifest)
+
+
+def _latest_saved_schedule(name: str) -> Path:
+    for rebuild in (False, True):
+        versions = _saved_schedules(rebuild).get(name)
+        if versions:
+            path = SCHEDULE_SAVE_DIR / f"{name}.{versions[-1]['version']}"
+            if path.exists():
+                return path
+    raise FileNotFoundError(name)
 
 
 def load_schedule(name: str) -> None:
-    versions = sorted(SCHEDULE_SAVE_DIR.glob(f"{name}.*"))
-    if not versions:
-        raise FileNotFoundError(name)
-    latest = versions[-1]
-    payload = json.loads(latest.read_text())
-    start_ts = payload["start_timestamp"]
-    schedule = payload["schedule"]
-
-    contest_start = datetime.utcnow()
-    loaded_start = datetime.utcfromtimestamp(start_ts / 1000)
-    contest_start = contest_start.replace(hour=loaded_start.hour, minute=loaded_start.minute, second=loaded_start.second, microsecond=loaded_start.microsecond)
-    start_contest(int(contest_start.timestamp() * 1000))
-
-    rebased = []
-    for entry in schedule:
-        new_start = contest_start.replace()
-        old = datetime.utcfromtimestamp(entry["start_timestamp"] / 1000)
-        new_start = new_start.replace(hour=old.hour, minute=old.minute, second=old.second, microsecond=old.microsecond)
-        entry_copy = dict(entry)
-        entry_copy["start_timestamp"] = int(new_start.timestamp() * 1000)
-        rebased.append(entry_copy)
-    write_schedule(rebased)
+    with writing():
+        flush_writes()
+        latest = _latest_saved_schedule(name)
+        payload = json.loads(latest.read_text())
+        start_ts = payload["start_timestamp"]
+        if "journal_seq" in payload:
+            journal = _schedule_journal()
+            if journal is None:
+                raise FileNotFoundError(name)
+            try:
+                schedule = journal.state_at(payload["journal_seq"])
+            except KeyError:
+                raise FileNotFoundError(name)
+        else:
+            schedule = payload["schedule"]
+
+        contest_start = datetime.utcnow()
+        loaded_start = datetime.utcfromtimestamp(start_ts / 1000)
+        contest_start = contest_start.replace(hour=loaded_start.hour, minute=loaded_start.minute, second=loaded_start.second, microsecond=loaded_start.microsecond)
+        start_contest(int(contest_start.timestamp() * 1000))
+
+        rebased = []
+        for entry in schedule:
+            new_start = contest_start.replace()
+            old = datetime.utcfromtimestamp(entry["start_timestamp"] / 1000)
+            new_start = new_start.replace(hour=old.hour, minute=old.minute, second=old.second, microsecond=old.microsecond)
+            entry_copy = dict(entry)
+            entry_copy["start_timestamp"] = int(new_start.timestamp() * 1000)
+            rebased.append(entry_copy)
+        write_schedule(rebased)
+
+
+def get_revisions() -> Dict[str, int]:
+    _read_json_array(SCHEDULE_FILE)
+    _read_json_array(VIDEO_LIST_FILE)
+    _read_json_array(ACTIVITY_LIST_FILE)
+    get_contest_start()
+    return {
+        "schedule": _REVISIONS.get(SCHEDULE_FILE, 0),
+        "videos": _REVISIONS.get(VIDEO_LIST_FILE, 0),
+        "activities": _REVISIONS.get(ACTIVITY_LIST_FILE, 0),
+        "contest": _REVISIONS.get(EVENT_START_TIMESTAMP_FILE, 0),
+    }
+
+
+def count_started(now: int) -> int:
+    return get_sorted_schedule().count_before(now)
+
+
+def item_duration_ms(item: dict | None) -> int:
+    if item and item["duration"] > 0:
+        return item["duration"]
+    return DEFAULT_DURATION_MS
+
+
+def get_schedule_index() -> IntervalIndex:
+    # Returns a private copy; callers may add and remove entries freely.
+    global _SCHEDULE_INDEX
+    revisions = get_revisions()
+    key = (SCHEDULE_FILE, revisions["schedule"], revisions["videos"], revisions["activities"])
+    if _SCHEDULE_INDEX[0] != key:
+        items = get_all_items_by_name()
+        index = IntervalIndex(
+            (e["start_timestamp"], e["start_timestamp"] + item_duration_ms(items.get(e["name"])), e["uuid"])
+            for e in _read_json_array(SCHEDULE_FILE)
+        )
+        _SCHEDULE_INDEX = (key, index)
+    return _SCHEDULE_INDEX[1].copy()
 
 
 def as_schedule_payload() -> dict:
+    # Shared between callers until the next revision; do not mutate.
+    global _SCHEDULE_PAYLOAD
+    revisions = get_revisions()
+    key = (SCHEDULE_FILE, revisions["schedule"], revisions["videos"], revisions["activities"], revisions["contest"])
+    if _SCHEDULE_PAYLOAD[0] == key:
+        return _SCHEDULE_PAYLOAD[1]
     items = get_all_items_by_name()
-    schedule = sorted(get_schedule(), key=lambda e: e["start_timestamp"])
+    schedule = get_sorted_schedule()
     contest_ts = get_contest_start()
     rendered = []
     for entry in schedule:
         item = items.get(entry["name"])
         if not item:
             continue
-        duration = item["duration"]
-        if duration <= 0:
-            duration = 60000
         # Disclaimer offsets will be handled by caller if needed.
-        stop = entry["start_timestamp"] + duration
+        stop = entry["start_timestamp"] + item_duration_ms(item)
         rendered.append({
             "_id": entry["uuid"],
             "start": entry["start_timestamp"],
             "stop": stop,
             "name": entry["name"],
         })
-    return {"contest_timestamp": contest_ts, "schedule": rendered}
+    payload = {"contest_timestamp": contest_ts, "schedule": rendered}
+    _SCHEDULE_PAYLOAD = (key, payload)
+    return payload
+
+
+def _max_duration(path: Path) -> int:
+    return _cached_derived(
+        path, json.loads, [], "max_duration",
+        lambda items: max((item["duration"] for item in items), default=0),
+    )
+
+
+def current_state(now: int | None = None) -> dict:
+    if now is None:
+        now = current_time_ms()
+    videos, _ = get_videos()
+    activities, _ = get_activities()
+    max_len = max(_max_duration(VIDEO_LIST_FILE), _max_duration(ACTIVITY_LIST_FILE))
+
+    def item_for(entry):
+        # Activities win over videos of the same name, as in get_all_items_by_name().
+        return activities.get(entry["name"]) or videos.get(entry["name"])
+
+    def duration_of(entry):
+        item = item_for(entry)
+        return item["duration"] if item else None
+
+    payload = {
+        "now_ts": now,
+        "status": "idle",
+        "name": None,
+        "seconds_left": None,
+        "seconds_until": None,
+        "start_ts": None,
+        "stop_ts": None,
+    }
+    schedule = get_sorted_schedule()
+    playing = schedule.playing_at(now, duration_of, max_len)
+    if playing is not None:
+        entry, stop = playing
+        payload.update({
+            "status": "playing",
+            "name": entry["name"],
+            "seconds_left": int((stop - now) / 1000),
+            "start_ts": entry["start_timestamp"],
+            "stop_ts": stop,
+        })
+        return payload
+    for entry in schedule.starting_after(now):
+        start = entry["start_timestamp"]
+        if start - now >= 30000:
+            break
+        item = item_for(entry)
+        if not item:
+            continue
+        payload.update({
+            "status": "soon",
+            "name": entry["name"],
+            "seconds_until": int((start - now) / 1000),
+            "start_ts": start,
+            "stop_ts": start + item["duration"],
+        })
+        break
+    return payload
 
 
-def _video_dir_from_config() -> Path | None:
-    cfg = get_config()
+def get_video_dir() -> Path | None:
+    cfg = _cached_file(CONFIG_FILE, json.loads, {}).value
     video_dir = cfg.get("server-video-dir") or cfg.get("obs-video-dir")
     if not video_dir:
         return None
     return Path(video_dir)
 
 
-def _probe_duration_ms(path: Path) -> int:
-    try:
-        ffprobe_path = _get_ffprobe_path()
-        if not ffprobe_path:
-            return 0
-        result = subprocess.run(
-            [ffprobe_path, "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", str(path)],
-            capture_output=True,
-            text=True,
-            timeout=5,
-            check=False,
-        )
-        output = result.stdout.strip()
-        if output:
-            seconds = float(output)
-            return int(seconds * 1000)
-    except Exception:
-        pass
-    return 0
+def get_probe_cache() -> dict:
+    return _cached_file(PROBE_CACHE_FILE, json.loads, {}).value
+
+
+def write_probe_cache(cache: dict) -> None:
+    _write_json(PROBE_CACHE_FILE, cache)
 
 
 def _get_ffprobe_path() -> str | None:
@@ -243,35 +870,15 @@ def get_ffprobe_path() -> str | None:
 
 
 def refresh_videos_if_needed(force: bool = False, rebuild: bool = False) -> None:
-    global _LAST_SCAN
-    now = time.time()
-    if not force and (now - _LAST_SCAN) < _SCAN_INTERVAL_SEC:
-        return
-    _LAST_SCAN = now
-    video_dir = _video_dir_from_config()
-    if not video_dir or not video_dir.exists():
-        return
-    by_name, _ = _load_items(VIDEO_LIST_FILE)
-    extensions = {".mp4", ".mov", ".mkv", ".avi", ".webm", ".mpg", ".mpeg"}
-    updated = [] if rebuild else list(by_name.values())
-    updated_map = {item["name"]: item for item in updated}
-    for path in video_dir.iterdir():
-        if not path.is_file():
-            continue
-        if path.suffix.lower() not in extensions:
-            continue
-        name = path.name
-        duration = _probe_duration_ms(path)
-        if name in updated_map:
-            existing = updated_map[name]
-            if existing.get("duration", 0) <= 0 and duration > 0:
-                existing["duration"] = duration
-            continue
-        item_uuid = str(uuid.uuid5(uuid.NAMESPACE_DNS, name))
-        updated.append({
-            "uuid": item_uuid,
-            "name": name,
-            "duration": duration,
-            "isVideo": True,
-        })
-    write_videos(updated)
+    # Scanning and probing run on the media_scanner worker thread; this only
+    # makes sure it is running, or queues an immediate pass when forced.
+    import media_scanner
+    if force:
+        media_scanner.request_scan(rebuild=rebuild)
+    elif _AUTO_SCAN:
+        media_scanner.ensure_started()
+
+
+def set_auto_scan(enabled: bool) -> None:
+    global _AUTO_SCAN
+    _AUTO_SCAN = enabled
@@ -0,0 +1,150 @@
+import asyncio
+import json
+from typing import Dict, Optional
+
+import data_provider as dp
+from logging_setup import get_error_logger
+from obs_gateway import add_status_listener, get_status
+
+STATE_INTERVAL_SEC = 0.5
+KEEPALIVE_SEC = 15.0
+
+
+def _format(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _schedule_diff(old: dict, new: dict) -> dict:
+    old_by_id = {e["_id"]: e for e in old["schedule"]}
+    new_by_id = {e["_id"]: e for e in new["schedule"]}
+    upsert = [e for uid, e in new_by_id.items() if old_by_id.get(uid) != e]
+    remove = [uid for uid in old_by_id if uid not in new_by_id]
+    return {"contest_timestamp": new["contest_timestamp"], "upsert": upsert, "remove": remove}
+
+
+class EventBroadcaster:
+    def __init__(self):
+        self._subscribers = set()
+        self._last: Dict[str, object] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._tasks = []
+        self._revisions = None
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        dp.add_change_listener(self._on_data_change)
+        add_status_listener(self._on_obs_status)
+        self._tasks = [asyncio.create_task(self._state_loop())]
+
+    def notify(self):
+        if self._loop is None or self._wake is None:
+            return
+        self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _on_data_change(self, _path):
+        self.notify()
+
+    def _collect(self) -> Dict[str, object]:
+        state = dp.current_state()
+        snapshot = {
+            "current": {
+                "now_ts": state["now_ts"],
+                "status": state["status"],
+                "name": state["name"],
+                "start_ts": state["start_ts"],
+                "stop_ts": state["stop_ts"],
+            },
+            "contest": {"contest_start_ts": dp.get_contest_start()},
+        }
+        revisions = dp.get_revisions()
+        if revisions != self._revisions:
+            self._revisions = revisions
+            snapshot["schedule"] = dp.as_schedule_payload()
+            snapshot["catalog"] = {"videos": revisions["videos"], "activities": revisions["activities"]}
+        return snapshot
+
+    def _publish(self, event: str, data) -> None:
+        message = _format(event, data)
+        for queue in list(self._subscribers):
+            queue.put_nowait(message)
+
+    def _update(self, snapshot: Dict[str, object]) -> None:
+        for topic, value in snapshot.items():
+            previous = self._last.get(topic)
+            if topic == "current" and previous is not None:
+                # now_ts moves every pass; only the state itself is news.
+                if {k: v for k, v in previous.items() if k != "now_ts"} == {k: v for k, v in value.items() if k != "now_ts"}:
+                    continue
+            elif previous == value:
+                continue
+            self._last[topic] = value
+            if previous is None:
+                continue
+            if topic == "schedule":
+                self._publish("schedule", _schedule_diff(previous, value))
+            elif topic == "catalog":
+                self._publish("catalog", {})
+            else:
+                self._publish(topic, value)
+
+    async def _state_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=STATE_INTERVAL_SEC)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not self._subscribers:
+                continue
+            try:
+                self._update(await asyncio.to_thread(self._collect))
+            except Exception as exc:
+                get_error_logger().exception("Event stream update failed: %s", exc)
+
+    def _obs_snapshot(self) -> dict:
+        status = get_status()
+        if not status["connected"]:
+            return {"connected": False, "scene": None, "streaming": False}
+        return {"connected": True, "scene": status["scene"], "streaming": status["streaming"]}
+
+    def _on_obs_status(self, _status):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._update_obs)
+
+    def _update_obs(self):
+        value = self._obs_snapshot()
+        if self._last.get("obs") != value:
+            self._last["obs"] = value
+            if self._subscribers:
+                self._publish("obs", value)
+
+    async def stream(self, request):
+        queue: asyncio.Queue = asyncio.Queue()
+        if not self._subscribers:
+            # Nothing has been kept up to date while nobody was listening.
+            self._update(await asyncio.to_thread(self._collect))
+        self._last["obs"] = self._obs_snapshot()
+        for topic in ("schedule", "current", "contest", "obs"):
+            if topic in self._last:
+                data = self._last[topic]
+                if topic == "schedule":
+                    data = dict(data, full=True)
+                queue.put_nowait(_format(topic, data))
+        self._subscribers.add(queue)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SEC)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                yield message
+        finally:
+            self._subscribers.discard(queue)
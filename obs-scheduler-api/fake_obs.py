@@ -0,0 +1,425 @@
+import base64
+import hashlib
+import itertools
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# A stand-in for OBS with obs-websocket v5 enabled, speaking just enough of
+# the protocol for obs_gateway and obs_session: Hello/Identify (with
+# optional password), single requests, request batches and events. It keeps
+# a small model of scenes, inputs and mute state, records every request and
+# every change in what is visible on the program scene, and can delay or fail
+# requests on demand. Used by bench_playback.py; run it directly to point a
+# development copy of the scheduler at it.
+_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# obs-websocket RequestStatus codes.
+CODE_SUCCESS = 100
+CODE_UNKNOWN_REQUEST = 204
+CODE_NOT_FOUND = 600
+CODE_ALREADY_EXISTS = 601
+CODE_PROCESSING_FAILED = 702
+
+
+def _wall_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class RequestFailed(Exception):
+    def __init__(self, code: int, comment: str):
+        super().__init__(comment)
+        self.code = code
+        self.comment = comment
+
+
+def _recv_exact(conn: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("client closed the connection")
+        data += chunk
+    return data
+
+
+def _recv_message(conn: socket.socket) -> Optional[str]:
+    # Returns None on a close frame; pings are answered inline.
+    while True:
+        head = _recv_exact(conn, 2)
+        opcode = head[0] & 0x0F
+        size = head[1] & 0x7F
+        if size == 126:
+            size = struct.unpack(">H", _recv_exact(conn, 2))[0]
+        elif size == 127:
+            size = struct.unpack(">Q", _recv_exact(conn, 8))[0]
+        mask = _recv_exact(conn, 4) if head[1] & 0x80 else b"\0\0\0\0"
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(_recv_exact(conn, size)))
+        if opcode == 0x8:
+            return None
+        if opcode == 0x9:
+            _send_frame(conn, 0xA, payload)
+            continue
+        if opcode in (0x1, 0x2):
+            return payload.decode("utf-8")
+
+
+def _send_frame(conn: socket.socket, opcode: int, payload: bytes) -> None:
+    size = len(payload)
+    if size < 126:
+        head = struct.pack(">BB", 0x80 | opcode, size)
+    elif size < 65536:
+        head = struct.pack(">BBH", 0x80 | opcode, 126, size)
+    else:
+        head = struct.pack(">BBQ", 0x80 | opcode, 127, size)
+    conn.sendall(head + payload)
+
+
+class FakeObs:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, password: str = "",
+                 scenes=("Scene 1", "Slides"), base_size=(1920, 1080),
+                 clock: Callable[[], int] = _wall_ms):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.base_size = base_size
+        # clock() stamps the request log and the timeline, in ms.
+        self.clock = clock
+        self.program_scene = scenes[0]
+        self.streaming = False
+        self.scenes: Dict[str, List[dict]] = {name: [] for name in scenes}
+        self.inputs: Dict[str, dict] = {}
+        # request type -> seconds to wait before answering; "*" is the default.
+        self.latency: Dict[str, float] = {}
+        # request type -> failures left (None fails every request of that type).
+        self.failures: Dict[str, Optional[int]] = {}
+        # {"t_ms", "type", "data", "ok", "batch"} for every request handled.
+        self.requests: List[dict] = []
+        # (t_ms, "show" | "hide", source name) whenever an input appears on or
+        # leaves the program scene.
+        self.timeline: List[tuple] = []
+        self.messages = 0
+        self._visible = set()
+        self._item_ids = itertools.count(1)
+        self._lock = threading.RLock()
+        self._clients: List[socket.socket] = []
+        self._server: Optional[socket.socket] = None
+
+    # -- control -----------------------------------------------------------
+
+    def start(self) -> "FakeObs":
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((self.host, self.port))
+        server.listen()
+        self.port = server.getsockname()[1]
+        self._server = server
+        threading.Thread(target=self._accept, name="fake-obs", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        self.drop_connections()
+
+    def drop_connections(self) -> None:
+        with self._lock:
+            clients = list(self._clients)
+        for conn in clients:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+
+    def set_latency(self, request_type: str, seconds: float) -> None:
+        self.latency[request_type] = seconds
+
+    def fail(self, request_type: str, count: Optional[int] = 1) -> None:
+        self.failures[request_type] = count
+
+    def emit(self, event_type: str, data: Optional[dict] = None) -> None:
+        message = json.dumps({"op": 5, "d": {"eventType": event_type, "eventIntent": 1, "eventData": data or {}}})
+        with self._lock:
+            for conn in list(self._clients):
+                try:
+                    _send_frame(conn, 0x1, message.encode("utf-8"))
+                except OSError:
+                    pass
+
+    def request_counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for record in self.requests:
+            counts[record["type"]] = counts.get(record["type"], 0) + 1
+        return counts
+
+    # -- connection handling -----------------------------------------------
+
+    def _accept(self) -> None:
+        while self._server is not None:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._serve, args=(conn,), name="fake-obs-client", daemon=True).start()
+
+    def _handshake(self, conn: socket.socket) -> None:
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = conn.recv(4096)
+            if not chunk:
+                raise ConnectionError("client closed during the handshake")
+            request += chunk
+        key = None
+        for line in request.split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"sec-websocket-key":
+                key = value.strip().decode("ascii")
+        if key is None:
+            raise ConnectionError("not a websocket upgrade")
+        accept = base64.b64encode(hashlib.sha1((key + _GUID).encode("ascii")).digest()).decode("ascii")
+        conn.sendall(
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode("ascii")
+        )
+
+    def _send(self, conn: socket.socket, op: int, data: dict) -> None:
+        # Events go out from other clients' threads; keep frames whole.
+        with self._lock:
+            _send_frame(conn, 0x1, json.dumps({"op": op, "d": data}).encode("utf-8"))
+
+    def _serve(self, conn: socket.socket) -> None:
+        try:
+            self._handshake(conn)
+            hello = {"obsWebSocketVersion": "5.0.0", "rpcVersion": 1}
+            if self.password:
+                salt = base64.b64encode(os.urandom(16)).decode("ascii")
+                challenge = base64.b64encode(os.urandom(16)).decode("ascii")
+                hello["authentication"] = {"salt": salt, "challenge": challenge}
+            self._send(conn, 0, hello)
+            identify = json.loads(_recv_message(conn) or "null")
+            if not identify or identify.get("op") != 1:
+                return
+            if self.password:
+                secret = base64.b64encode(hashlib.sha256((self.password + salt).encode()).digest())
+                expected = base64.b64encode(hashlib.sha256(secret + challenge.encode()).digest()).decode()
+                if identify["d"].get("authentication") != expected:
+                    _send_frame(conn, 0x8, struct.pack(">H", 4009) + b"Authentication failed.")
+                    return
+            self._send(conn, 2, {"negotiatedRpcVersion": 1})
+            with self._lock:
+                self._clients.append(conn)
+            while True:
+                text = _recv_message(conn)
+                if text is None:
+                    return
+                message = json.loads(text)
+                data = message.get("d") or {}
+                self.messages += 1
+                if message.get("op") == 6:
+                    self._send(conn, 7, dict(self._handle(data, batch=False), requestId=data.get("requestId")))
+                elif message.get("op") == 8:
+                    results = [self._handle(request, batch=True) for request in data.get("requests", [])]
+                    self._send(conn, 9, {"requestId": data.get("requestId"), "results": results})
+        except (OSError, ConnectionError, ValueError):
+            pass
+        finally:
+            with self._lock:
+                if conn in self._clients:
+                    self._clients.remove(conn)
+            conn.close()
+
+    # -- requests ----------------------------------------------------------
+
+    def _handle(self, request: dict, batch: bool) -> dict:
+        req_type = request.get("requestType")
+        data = request.get("requestData") or {}
+        delay = self.latency.get(req_type, self.latency.get("*", 0))
+        if req_type == "Sleep":
+            delay = data.get("sleepMillis", 0) / 1000.0
+        if delay > 0:
+            time.sleep(delay)
+        response = {"requestType": req_type}
+        with self._lock:
+            try:
+                left = self.failures.get(req_type, 0)
+                if left is None or left > 0:
+                    if left is not None:
+                        self.failures[req_type] = left - 1
+                    raise RequestFailed(CODE_PROCESSING_FAILED, f"Injected failure for {req_type}")
+                handler = getattr(self, f"_req_{req_type}", None)
+                if handler is None:
+                    raise RequestFailed(CODE_UNKNOWN_REQUEST, f"Your request type is not valid: {req_type}")
+                result = handler(data)
+                response["requestStatus"] = {"result": True, "code": CODE_SUCCESS}
+                if result is not None:
+                    response["responseData"] = result
+            except RequestFailed as exc:
+                response["requestStatus"] = {"result": False, "code": exc.code, "comment": exc.comment}
+            except KeyError as exc:
+                response["requestStatus"] = {"result": False, "code": 300, "comment": f"Missing field {exc}"}
+            ok = response["requestStatus"]["result"]
+            self.requests.append({"t_ms": self.clock(), "type": req_type, "data": data, "ok": ok, "batch": batch})
+            self._update_timeline()
+        return response
+
+    def _update_timeline(self) -> None:
+        visible = {
+            item["sourceName"] for item in self.scenes.get(self.program_scene, []) if item["sceneItemEnabled"]
+        }
+        now = self.clock()
+        for name in sorted(self._visible - visible):
+            self.timeline.append((now, "hide", name))
+        for name in sorted(visible - self._visible):
+            self.timeline.append((now, "show", name))
+        self._visible = visible
+
+    def _scene(self, data: dict) -> List[dict]:
+        name = data["sceneName"]
+        if name not in self.scenes:
+            raise RequestFailed(CODE_NOT_FOUND, f"No source was found by the name of `{name}`.")
+        return self.scenes[name]
+
+    def _item(self, data: dict) -> dict:
+        for item in self._scene(data):
+            if item["sceneItemId"] == data["sceneItemId"]:
+                return item
+        raise RequestFailed(CODE_NOT_FOUND, "No scene items were found in the specified scene by that ID.")
+
+    def _input(self, data: dict) -> dict:
+        name = data["inputName"]
+        if name not in self.inputs:
+            raise RequestFailed(CODE_NOT_FOUND, f"No source was found by the name of `{name}`.")
+        return self.inputs[name]
+
+    def _req_GetVersion(self, data):
+        return {"obsVersion": "30.0.0", "obsWebSocketVersion": "5.0.0", "rpcVersion": 1,
+                "availableRequests": sorted(n[5:] for n in dir(self) if n.startswith("_req_"))}
+
+    def _req_GetVideoSettings(self, data):
+        width, height = self.base_size
+        return {"baseWidth": width, "baseHeight": height, "outputWidth": width, "outputHeight": height,
+                "fpsNumerator": 30, "fpsDenominator": 1}
+
+    def _req_GetCurrentProgramScene(self, data):
+        return {"currentProgramSceneName": self.program_scene, "sceneName": self.program_scene}
+
+    def _req_SetCurrentProgramScene(self, data):
+        self._scene(data)
+        self.program_scene = data["sceneName"]
+        self.emit("CurrentProgramSceneChanged", {"sceneName": self.program_scene})
+
+    def _req_GetStreamStatus(self, data):
+        return {"outputActive": self.streaming, "outputReconnecting": False, "outputTimecode": "00:00:00.000",
+                "outputDuration": 0, "outputBytes": 0, "outputSkippedFrames": 0, "outputTotalFrames": 0}
+
+    def _req_StartStream(self, data):
+        self.streaming = True
+        self.emit("StreamStateChanged", {"outputActive": True, "outputState": "OBS_WEBSOCKET_OUTPUT_STARTED"})
+
+    def _req_StopStream(self, data):
+        self.streaming = False
+        self.emit("StreamStateChanged", {"outputActive": False, "outputState": "OBS_WEBSOCKET_OUTPUT_STOPPED"})
+
+    def _req_GetInputList(self, data):
+        return {"inputs": [
+            {"inputName": name, "inputKind": entry["kind"], "unversionedInputKind": entry["kind"]}
+            for name, entry in self.inputs.items()
+        ]}
+
+    def _req_CreateInput(self, data):
+        scene = self._scene(data)
+        name = data["inputName"]
+        if name in self.inputs:
+            raise RequestFailed(CODE_ALREADY_EXISTS, "A source already exists by that input name.")
+        self.inputs[name] = {
+            "kind": data["inputKind"],
+            "settings": dict(data.get("inputSettings") or {}),
+            "muted": False,
+            "monitorType": "OBS_MONITORING_TYPE_NONE",
+        }
+        item_id = next(self._item_ids)
+        scene.append({
+            "sceneItemId": item_id,
+            "sourceName": name,
+            "sceneItemEnabled": data.get("sceneItemEnabled", True),
+            "sceneItemTransform": {},
+        })
+        self.emit("InputCreated", {"inputName": name, "inputKind": data["inputKind"]})
+        return {"sceneItemId": item_id}
+
+    def _req_RemoveInput(self, data):
+        self._input(data)
+        name = data["inputName"]
+        del self.inputs[name]
+        for scene in self.scenes.values():
+            scene[:] = [item for item in scene if item["sourceName"] != name]
+        self.emit("InputRemoved", {"inputName": name})
+
+    def _req_RemoveSceneItem(self, data):
+        item = self._item(data)
+        self._scene(data).remove(item)
+
+    def _req_GetSceneItemId(self, data):
+        for item in self._scene(data):
+            if item["sourceName"] == data["sourceName"]:
+                return {"sceneItemId": item["sceneItemId"]}
+        raise RequestFailed(CODE_NOT_FOUND, "No scene items were found in the specified scene by that name.")
+
+    def _req_SetSceneItemEnabled(self, data):
+        self._item(data)["sceneItemEnabled"] = bool(data["sceneItemEnabled"])
+
+    def _req_SetSceneItemIndex(self, data):
+        scene = self._scene(data)
+        item = self._item(data)
+        scene.remove(item)
+        scene.insert(min(max(0, int(data["sceneItemIndex"])), len(scene)), item)
+
+    def _req_SetSceneItemTransform(self, data):
+        self._item(data)["sceneItemTransform"].update(data["sceneItemTransform"])
+
+    def _req_SetInputSettings(self, data):
+        entry = self._input(data)
+        if data.get("overlay", True):
+            entry["settings"].update(data["inputSettings"])
+        else:
+            entry["settings"] = dict(data["inputSettings"])
+
+    def _req_SetInputMute(self, data):
+        self._input(data)["muted"] = bool(data["inputMuted"])
+
+    def _req_SetInputAudioMonitorType(self, data):
+        self._input(data)["monitorType"] = data["monitorType"]
+
+    def _req_GetSourceScreenshot(self, data):
+        # A 1x1 transparent PNG is enough for the preview endpoint.
+        return {"imageData": "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="}
+
+    def _req_Sleep(self, data):
+        return None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a fake obs-websocket v5 server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4455)
+    parser.add_argument("--password", default="")
+    parser.add_argument("--latency-ms", type=float, default=0, help="delay before answering each request")
+    args = parser.parse_args()
+    fake = FakeObs(args.host, args.port, args.password)
+    fake.set_latency("*", args.latency_ms / 1000.0)
+    fake.start()
+    print(f"Fake OBS listening on ws://{args.host}:{fake.port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        fake.stop()
@@ -0,0 +1,384 @@
+import os
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Optional
+
+import data_provider as dp
+import metrics
+from logging_setup import get_error_logger
+
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".mkv", ".avi", ".webm", ".mpg", ".mpeg"}
+SCAN_INTERVAL_SEC = 5
+PROBE_TIMEOUT_SEC = 5
+# With a filesystem watcher running, full rescans only act as a safety net.
+WATCH_RESYNC_SEC = 300
+# A changed file is picked up once its size and mtime stop moving for this long.
+STABLE_SEC = 1.0
+
+_lock = threading.Lock()
+_wake = threading.Event()
+_worker: Optional[threading.Thread] = None
+_rebuild_requested = False
+_scan_requested = False
+_last_full_scan = 0.0
+
+_observer = None
+_watched_dir: Optional[Path] = None
+# name -> (size, mtime_ns, monotonic time first seen at that size) or None.
+_pending: Dict[str, Optional[tuple]] = {}
+
+# path -> {"size", "mtime_ns", "duration"}; persisted to PROBE_CACHE_FILE.
+_probe_cache: Dict[str, dict] = {}
+_probe_cache_root: Optional[Path] = None
+
+_progress = {
+    "queued": False,
+    "running": False,
+    "total": 0,
+    "done": 0,
+    "failed": 0,
+    "started_at": None,
+    "finished_at": None,
+}
+
+
+def get_progress() -> dict:
+    with _lock:
+        return dict(_progress)
+
+
+def _update_progress(**changes) -> None:
+    with _lock:
+        _progress.update(changes)
+
+
+def _probe_settings() -> tuple:
+    cfg = dp.get_config()
+    try:
+        workers = int(cfg.get("probe-concurrency") or 0)
+    except (TypeError, ValueError):
+        workers = 0
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    try:
+        timeout = float(cfg.get("probe-timeout-sec") or PROBE_TIMEOUT_SEC)
+    except (TypeError, ValueError):
+        timeout = PROBE_TIMEOUT_SEC
+    return workers, timeout
+
+
+def _probe_duration_ms(ffprobe_path: str, path: Path, timeout: float = PROBE_TIMEOUT_SEC) -> int:
+    started = time.perf_counter()
+    outcome = "failed"
+    try:
+        result = subprocess.run(
+            [ffprobe_path, "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", str(path)],
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+            check=False,
+        )
+        output = result.stdout.strip()
+        if output:
+            seconds = float(output)
+            outcome = "ok"
+            return int(seconds * 1000)
+    except subprocess.TimeoutExpired:
+        outcome = "timeout"
+    except Exception:
+        pass
+    finally:
+        metrics.FFPROBE_SECONDS.observe(time.perf_counter() - started, result=outcome)
+    return 0
+
+
+def _load_probe_cache() -> Dict[str, dict]:
+    global _probe_cache, _probe_cache_root
+    if _probe_cache_root != dp.DATA_ROOT:
+        _probe_cache_root = dp.DATA_ROOT
+        try:
+            raw = dp.get_probe_cache()
+        except Exception:
+            raw = {}
+        _probe_cache = {path: dict(entry) for path, entry in raw.items()}
+    return _probe_cache
+
+
+def _list_media(video_dir: Path) -> Dict[str, os.stat_result]:
+    found = {}
+    with os.scandir(video_dir) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            if Path(entry.name).suffix.lower() not in VIDEO_EXTENSIONS:
+                continue
+            found[entry.name] = entry.stat()
+    return found
+
+
+def _resolve_durations(video_dir: Path, files: Dict[str, os.stat_result], rebuild: bool,
+                       report: bool = True) -> tuple:
+    # report: publish probe counts to get_progress(); only full scans do.
+    cache = _load_probe_cache()
+    ffprobe_path = dp.get_ffprobe_path()
+    durations = {}
+    fresh = set()
+    to_probe = []
+    for name, st in files.items():
+        key = str(video_dir / name)
+        cached = cache.get(key)
+        if cached and cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns:
+            # Failed probes are only retried on an explicit rebuild.
+            if cached["duration"] > 0 or not rebuild or not ffprobe_path:
+                durations[name] = cached["duration"]
+                continue
+        if not ffprobe_path:
+            durations[name] = 0
+            continue
+        to_probe.append((name, st))
+    if to_probe:
+        workers, timeout = _probe_settings()
+        if report:
+            _update_progress(total=len(to_probe), done=0, failed=0)
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=min(workers, len(to_probe)), thread_name_prefix="ffprobe") as pool:
+            futures = {
+                pool.submit(_probe_duration_ms, ffprobe_path, video_dir / name, timeout): (name, st)
+                for name, st in to_probe
+            }
+            for future in as_completed(futures):
+                name, st = futures[future]
+                duration = future.result()
+                cache[str(video_dir / name)] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "duration": duration}
+                durations[name] = duration
+                fresh.add(name)
+                done += 1
+                if duration <= 0:
+                    failed += 1
+                if report:
+                    _update_progress(done=done, failed=failed)
+    return durations, fresh
+
+
+def scan_library(rebuild: bool = False) -> None:
+    video_dir = dp.get_video_dir()
+    if not video_dir or not video_dir.exists():
+        return
+    files = _list_media(video_dir)
+    durations, fresh = _resolve_durations(video_dir, files, rebuild)
+    cache = _load_probe_cache()
+    live_keys = {str(video_dir / name) for name in files}
+    stale = [k for k in cache if Path(k).parent == video_dir and k not in live_keys]
+    for key in stale:
+        del cache[key]
+    if fresh or stale:
+        dp.write_probe_cache(cache)
+    _apply_scan(durations, fresh, rebuild, listed=set(files))
+
+
+def _apply_scan(durations: Dict[str, int], fresh: set, rebuild: bool, removed: tuple = (),
+                listed: Optional[set] = None) -> None:
+    # Merge against the catalog as it is now, not as it was when the scan
+    # started, so edits made while probing are not overwritten. The writer
+    # lock keeps a concurrent rename or delete from landing in between.
+    with dp.writing():
+        by_name, _ = dp.get_videos()
+        if listed is not None:
+            # A full scan saw every file, so anything else was deleted, as the
+            # watcher would have reported.
+            removed = tuple(name for name in by_name if name not in listed)
+        if rebuild:
+            updated = []
+        else:
+            updated = [dict(item) for item in by_name.values() if item["name"] not in removed]
+        updated_map = {item["name"]: item for item in updated}
+        changed = rebuild or len(updated) != len(by_name)
+        for name, duration in durations.items():
+            if name in updated_map:
+                existing = updated_map[name]
+                if duration > 0 and (existing.get("duration", 0) <= 0 or name in fresh) and existing.get("duration") != duration:
+                    existing["duration"] = duration
+                    changed = True
+                continue
+            item = {
+                "uuid": str(uuid.uuid5(uuid.NAMESPACE_DNS, name)),
+                "name": name,
+                "duration": duration,
+                "isVideo": True,
+            }
+            updated.append(item)
+            updated_map[name] = item
+            changed = True
+        if changed:
+            dp.write_videos(updated)
+
+
+def _note_path(raw_path) -> None:
+    path = Path(os.fsdecode(raw_path))
+    if _watched_dir is None or path.parent != _watched_dir:
+        return
+    if path.suffix.lower() not in VIDEO_EXTENSIONS:
+        return
+    with _lock:
+        _pending.setdefault(path.name, None)
+    _wake.set()
+
+
+def _make_observer(video_dir: Path):
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        return None
+
+    class _Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if event.is_directory:
+                return
+            _note_path(event.src_path)
+            dest = getattr(event, "dest_path", None)
+            if dest:
+                _note_path(dest)
+
+    observer = Observer()
+    observer.schedule(_Handler(), str(video_dir), recursive=False)
+    observer.daemon = True
+    observer.start()
+    return observer
+
+
+def _sync_watcher() -> None:
+    global _observer, _watched_dir, _scan_requested
+    video_dir = dp.get_video_dir()
+    wanted = str(dp.get_config().get("watch-video-dir", "true")).strip().lower() in ("1", "true", "yes", "on")
+    if not wanted or not video_dir or not video_dir.is_dir():
+        video_dir = None
+    if video_dir == _watched_dir:
+        return
+    if _observer is not None:
+        try:
+            _observer.stop()
+        except Exception:
+            pass
+        _observer = None
+    with _lock:
+        _pending.clear()
+        # A new directory, or polling taking over, starts from a full scan.
+        _scan_requested = True
+    _wake.set()
+    _watched_dir = video_dir
+    if video_dir is None:
+        return
+    try:
+        _observer = _make_observer(video_dir)
+    except Exception as exc:
+        _observer = None
+        get_error_logger().exception("Video directory watcher failed, falling back to polling: %s", exc)
+
+
+def _apply_pending() -> None:
+    video_dir = _watched_dir
+    if video_dir is None:
+        return
+    now = time.monotonic()
+    ready = {}
+    removed = []
+    with _lock:
+        names = list(_pending.items())
+    for name, seen in names:
+        try:
+            st = (video_dir / name).stat()
+        except FileNotFoundError:
+            removed.append(name)
+            continue
+        signature = (st.st_size, st.st_mtime_ns)
+        if seen is not None and seen[:2] == signature:
+            if now - seen[2] >= STABLE_SEC:
+                ready[name] = st
+            continue
+        with _lock:
+            _pending[name] = signature + (now,)
+    with _lock:
+        for name in list(ready) + removed:
+            _pending.pop(name, None)
+    if not ready and not removed:
+        return
+    durations, fresh = _resolve_durations(video_dir, ready, rebuild=False, report=False)
+    cache = _load_probe_cache()
+    for name in removed:
+        cache.pop(str(video_dir / name), None)
+    if fresh or removed:
+        dp.write_probe_cache(cache)
+    _apply_scan(durations, fresh, rebuild=False, removed=tuple(removed))
+
+
+def _next_timeout() -> float:
+    with _lock:
+        if _pending:
+            return STABLE_SEC / 2
+    interval = WATCH_RESYNC_SEC if _observer is not None else SCAN_INTERVAL_SEC
+    return max(0.0, _last_full_scan + interval - time.monotonic())
+
+
+def _run() -> None:
+    global _rebuild_requested, _scan_requested, _last_full_scan
+    while True:
+        try:
+            _sync_watcher()
+        except Exception as exc:
+            get_error_logger().exception("Video directory watcher failed: %s", exc)
+        _wake.wait(timeout=_next_timeout())
+        _wake.clear()
+        interval = WATCH_RESYNC_SEC if _observer is not None else SCAN_INTERVAL_SEC
+        with _lock:
+            full = _scan_requested or time.monotonic() - _last_full_scan >= interval
+            rebuild = _rebuild_requested
+            if full:
+                _rebuild_requested = False
+                _scan_requested = False
+                _progress.update(queued=False, running=True, total=0, done=0, failed=0,
+                                 started_at=time.time(), finished_at=None)
+        try:
+            if full:
+                _last_full_scan = time.monotonic()
+                scan_library(rebuild=rebuild)
+            else:
+                _apply_pending()
+        except Exception as exc:
+            get_error_logger().exception("Media library scan failed: %s", exc)
+        finally:
+            if full:
+                _update_progress(running=False, finished_at=time.time())
+
+
+def _on_data_change(path) -> None:
+    # Watch settings and the video directory apply now, not at the next
+    # resync, which can be WATCH_RESYNC_SEC away.
+    if path == dp.CONFIG_FILE:
+        _wake.set()
+
+
+def ensure_started() -> None:
+    global _worker, _scan_requested
+    with _lock:
+        if _worker is not None and _worker.is_alive():
+            return
+        dp.add_change_listener(_on_data_change)
+        _scan_requested = True
+        _worker = threading.Thread(target=_run, name="media-scanner", daemon=True)
+        _worker.start()
+    _wake.set()
+
+
+def request_scan(rebuild: bool = False) -> None:
+    global _rebuild_requested, _scan_requested
+    with _lock:
+        _rebuild_requested = _rebuild_requested or rebuild
+        _scan_requested = True
+        _progress["queued"] = True
+    ensure_started()
+    _wake.set()
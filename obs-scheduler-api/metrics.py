@@ -0,0 +1,151 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+# Counters and histograms rendered in the Prometheus text format by
+# /metrics. Kept dependency-free; label values must come from a small fixed
+# set (request types, file names, route paths), never from user input.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra: Tuple[str, str] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, object]) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (last is +Inf), sum, count]
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            values = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self._values.items())
+        for key, (counts, total, count) in values:
+            running = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                running += bucket_count
+                le = ("le", _format_value(float(bound)))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {running}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+def render() -> str:
+    lines = []
+    for metric in list(_registry):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "scheduler_http_request_seconds", "Time from receiving an HTTP request to sending its response headers.",
+    ("method", "path"),
+)
+HTTP_REQUESTS = Counter("scheduler_http_requests_total", "HTTP requests answered.", ("method", "path", "status"))
+
+PLAYBACK_TICK_SECONDS = Histogram("scheduler_playback_tick_seconds", "Duration of one PlaybackLoop.tick().")
+PLAYBACK_START_LATENESS_SECONDS = Histogram(
+    "scheduler_playback_start_lateness_seconds",
+    "How long after its scheduled start a clip was dispatched to OBS and confirmed.",
+    ("stage",),
+)
+
+OBS_REQUEST_SECONDS = Histogram(
+    "scheduler_obs_request_seconds",
+    "obs-websocket round trip including time queued behind others. batch=\"false\" is one per message (type "
+    "RequestBatch for batches); batch=\"true\" is each request inside a batch, timed by the whole batch.",
+    ("type", "batch"),
+)
+OBS_BATCHED_REQUESTS = Counter("scheduler_obs_batched_requests_total", "Requests sent inside RequestBatch messages.", ("type",))
+OBS_REQUEST_FAILURES = Counter("scheduler_obs_request_failures_total", "Requests OBS answered with a failure status.", ("type",))
+OBS_REQUEST_TIMEOUTS = Counter("scheduler_obs_request_timeouts_total", "Requests that got no answer in time.")
+
+FILE_READ_SECONDS = Histogram("scheduler_file_read_seconds", "Time to read and parse a data file.", ("file",))
+FILE_READ_BYTES = Counter("scheduler_file_read_bytes_total", "Bytes read from data files.", ("file",))
+FILE_WRITE_SECONDS = Histogram("scheduler_file_write_seconds", "Time to write and fsync a data file.", ("file",))
+FILE_WRITE_BYTES = Counter("scheduler_file_write_bytes_total", "Bytes written to data files.", ("file",))
+
+FFPROBE_SECONDS = Histogram(
+    "scheduler_ffprobe_seconds", "Duration of ffprobe runs.", ("result",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
@@ -1,13 +1,28 @@
+import asyncio
 import os
+import threading
 import time
-from typing import List, Optional, Dict
+from typing import Callable, Generator, List, Optional, Dict, Tuple
 
 from obsws_python import ReqClient
 
 from logging_setup import get_error_logger
+from obs_session import ObsSession, PRIORITY_CONTROL, PRIORITY_PLAYBACK, priority
 
-_client: Optional[ReqClient] = None
-_conn_settings: Dict[str, str] = {}
+# source name -> scene item id of inputs created hidden ahead of their start.
+_prepared: Dict[str, int] = {}
+# operation -> {"mode", "total_ms", "steps": [(step, ms), ...]} of its last run.
+_last_timings: Dict[str, dict] = {}
+# Last known OBS state, kept current from obs-websocket events so status
+# endpoints never need a round trip.
+_status = {"connected": False, "scene": None, "streaming": False, "updated_at": None}
+_status_listeners: List[Callable[[dict], None]] = []
+
+_MONITOR_TYPES = {
+    "monitor_and_output": "OBS_MONITORING_TYPE_MONITOR_AND_OUTPUT",
+    "monitor_only": "OBS_MONITORING_TYPE_MONITOR_ONLY",
+    "monitor_off": "OBS_MONITORING_TYPE_MONITOR_OFF",
+}
 
 
 def _as_bool(value) -> bool:
@@ -26,7 +41,7 @@ def _get_config():
         return {}
 
 
-def _resolve_settings() -> Dict[str, str]:
+def _compute_settings() -> Dict[str, str]:
     cfg = _get_config()
     settings = {
         "host": os.getenv("OBS_HOST") or cfg.get("obs-host", "127.0.0.1"),
@@ -44,49 +59,132 @@ def _resolve_settings() -> Dict[str, str]:
         "audio_monitor_sources": os.getenv("OBS_AUDIO_MONITOR_SOURCES") or cfg.get("audio-monitor-sources", ""),
         "audio_monitor_prefix": os.getenv("OBS_AUDIO_MONITOR_PREFIX") or cfg.get("audio-monitor-prefix", "Scheduler:"),
         "audio_monitor_mode": os.getenv("OBS_AUDIO_MONITOR_MODE") or cfg.get("audio-monitor-mode", "monitor_and_output"),
+        "batch_requests": os.getenv("OBS_BATCH_REQUESTS") or cfg.get("obs-batch-requests", True),
     }
     return settings
 
 
+def _config_revision():
+    try:
+        from data_provider import get_config_revision
+        return get_config_revision()
+    except Exception:
+        return None
+
+
+_session = ObsSession(_compute_settings, _config_revision)
+
+
+def _resolve_settings() -> Dict[str, str]:
+    return _session.settings()
+
+
 def _ensure_client() -> ReqClient:
-    global _client
-    global _conn_settings
-    settings = _resolve_settings()
-    if _client is not None:
+    return _session.client()
+
+
+def start_session() -> None:
+    _session.start()
+
+
+def connection_status() -> dict:
+    return _session.status()
+
+
+def add_event_listener(event_type: str, callback: Callable[[dict], None]) -> None:
+    _session.add_event_listener(event_type, callback)
+
+
+def add_connection_listener(callback: Callable[[bool], None]) -> None:
+    _session.add_connection_listener(callback)
+
+
+def get_status() -> dict:
+    return dict(_status)
+
+
+def add_status_listener(callback: Callable[[dict], None]) -> None:
+    _status_listeners.append(callback)
+
+
+def _set_status(**changes) -> None:
+    if all(_status.get(key) == value for key, value in changes.items()):
+        return
+    _status.update(changes, updated_at=time.time())
+    snapshot = get_status()
+    for callback in list(_status_listeners):
         try:
-            _client.get_version()
-            if settings != _conn_settings:
-                _client = None
-            else:
-                return _client
-        except Exception:
-            _client = None
-    _conn_settings = settings
-    _client = ReqClient(
-        host=settings["host"],
-        port=int(settings["port"]),
-        password=settings["password"],
-        timeout=3
-    )
-    return _client
+            callback(snapshot)
+        except Exception as exc:
+            get_error_logger().exception("OBS status listener failed: %s", exc)
 
 
-def heartbeat():
+def _require_connection() -> dict:
+    _session.start()
+    status = get_status()
+    if not status["connected"]:
+        raise ConnectionError(_session.last_error or "Not connected to OBS")
+    return status
+
+
+def _on_connection(connected: bool) -> None:
+    if not connected:
+        _set_status(connected=False)
+        return
+    _set_status(connected=True)
     client = _ensure_client()
-    res = client.get_current_program_scene()
-    _apply_audio_monitoring(client, _resolve_settings())
-    return {"ok": True, "scene": res.current_program_scene_name}
+    scene = client.get_current_program_scene().current_program_scene_name
+    streaming = client.get_stream_status().output_active
+    _set_status(scene=scene, streaming=bool(streaming))
+    # OBS may have restarted, so nothing applied before still counts.
+    _monitor.reset(item.get("inputName") for item in client.get_input_list().inputs)
+    _monitor.reconcile(_resolve_settings())
+
+
+def _on_settings_changed(settings: Dict[str, str]) -> None:
+    if _session.connected:
+        _monitor.reconcile(settings)
+
+
+def _on_input_created(data: dict) -> None:
+    name = data.get("inputName")
+    if name:
+        _monitor.input_created(name)
+        _monitor.reconcile(_resolve_settings(), [name])
+
+
+def _on_input_renamed(data: dict) -> None:
+    old_name, new_name = data.get("oldInputName"), data.get("inputName")
+    if old_name and new_name:
+        _monitor.input_renamed(old_name, new_name)
+        _monitor.reconcile(_resolve_settings(), [new_name])
+
+
+def _on_monitor_type_changed(data: dict) -> None:
+    name = data.get("inputName")
+    if name and data.get("monitorType"):
+        # Someone changed it in OBS; put it back if it no longer matches.
+        _monitor.observed(name, data["monitorType"])
+        _monitor.reconcile(_resolve_settings(), [name])
+
+
+_session.add_connection_listener(_on_connection)
+_session.add_settings_listener(_on_settings_changed)
+_session.add_event_listener("InputCreated", _on_input_created)
+_session.add_event_listener("InputRemoved", lambda data: _monitor.input_removed(data.get("inputName")))
+_session.add_event_listener("InputNameChanged", _on_input_renamed)
+_session.add_event_listener("InputAudioMonitorTypeChanged", _on_monitor_type_changed)
+_session.add_event_listener("CurrentProgramSceneChanged", lambda data: _set_status(scene=data.get("sceneName")))
+_session.add_event_listener("StreamStateChanged", lambda data: _set_status(streaming=bool(data.get("outputActive"))))
+
+
+def heartbeat():
+    status = _require_connection()
+    return {"ok": True, "scene": status["scene"]}
 
 
 def get_stream_status() -> bool:
-    client = _ensure_client()
-    if hasattr(client, "get_stream_status"):
-        res = client.get_stream_status()
-        return bool(getattr(res, "output_active", False) or getattr(res, "outputActive", False))
-    if hasattr(client, "call"):
-        res = client.call("GetStreamStatus", {})
-        return bool(res.get("outputActive"))
-    return False
+    return bool(_require_connection()["streaming"])
 
 
 def get_program_screenshot(width: int = 480, height: int = 270) -> str | None:
@@ -110,40 +208,16 @@ def get_program_screenshot(width: int = 480, height: int = 270) -> str | None:
     return None
 
 
-def start_streaming() -> None:
-    client = _ensure_client()
-    if hasattr(client, "start_stream"):
-        client.start_stream()
-        return
-    if hasattr(client, "call"):
-        client.call("StartStream", {})
-        return
-    if hasattr(client, "send"):
-        client.send("StartStream", {})
+async def start_streaming_async() -> None:
+    await _session.request_async("StartStream", level=PRIORITY_CONTROL)
 
 
-def stop_streaming() -> None:
-    client = _ensure_client()
-    if hasattr(client, "stop_stream"):
-        client.stop_stream()
-        return
-    if hasattr(client, "call"):
-        client.call("StopStream", {})
-        return
-    if hasattr(client, "send"):
-        client.send("StopStream", {})
+async def stop_streaming_async() -> None:
+    await _session.request_async("StopStream", level=PRIORITY_CONTROL)
 
 
-def set_current_scene(scene_name: str) -> None:
-    client = _ensure_client()
-    if hasattr(client, "set_current_program_scene"):
-        client.set_current_program_scene(scene_name)
-        return
-    if hasattr(client, "call"):
-        client.call("SetCurrentProgramScene", {"sceneName": scene_name})
-        return
-    if hasattr(client, "send"):
-        client.send("SetCurrentProgramScene", {"sceneName": scene_name})
+async def set_current_scene_async(scene_name: str) -> None:
+    await _session.request_async("SetCurrentProgramScene", {"sceneName": scene_name}, PRIORITY_PLAYBACK)
 
 
 def _mute_sources(mute: bool) -> None:
@@ -154,138 +228,168 @@ def _mute_sources(mute: bool) -> None:
         client.set_input_mute(name, mute)
 
 
-def _apply_audio_monitoring(client: ReqClient, settings: Dict[str, str]) -> Dict[str, list]:
-    raw_sources = settings.get("audio_monitor_sources", "")
-    source_entries = [s.strip() for s in raw_sources.split(",") if s.strip()]
-    sources = []
-    prefixes = []
-    for entry in source_entries:
-        if entry.endswith(":"):
-            prefixes.append(entry)
-        else:
-            sources.append(entry)
-    prefix = (settings.get("audio_monitor_prefix") or "").strip()
-    if prefix:
-        prefixes.append(prefix)
-    if not sources and not prefixes:
-        return {"applied": [], "failed": []}
-    mode_key = (settings.get("audio_monitor_mode") or "monitor_and_output").lower()
-    mode_map = {
-        "monitor_and_output": ["OBS_MONITORING_TYPE_MONITOR_AND_OUTPUT"],
-        "monitor_only": ["OBS_MONITORING_TYPE_MONITOR_ONLY"],
-        "monitor_off": ["OBS_MONITORING_TYPE_MONITOR_OFF"],
-    }
-    modes = mode_map.get(mode_key, mode_map["monitor_and_output"])
-    applied = []
-    failed = []
-    targets = []
-    if sources:
-        targets.extend([(name, False) for name in sources])
-    if prefixes:
-        try:
-            inputs = client.get_input_list()
-            for item in inputs.inputs:
-                name = getattr(item, "input_name", None) or getattr(item, "inputName", None)
-                if not name:
-                    continue
-                for prefix_value in prefixes:
-                    if name.startswith(prefix_value):
-                        targets.append((name, True))
-                        break
-        except Exception:
-            pass
-    if not targets:
-        return {"applied": [], "failed": []}
-    seen = set()
-    for name, _ in targets:
-        if name in seen:
-            continue
-        seen.add(name)
-        updated = False
-        for mode in modes:
-            try:
-                if hasattr(client, "set_input_audio_monitor_type"):
-                    client.set_input_audio_monitor_type(name, mode)
-                    updated = True
-                    break
-            except Exception:
-                pass
-            try:
-                if hasattr(client, "send"):
-                    client.send("SetInputAudioMonitorType", {"inputName": name, "monitorType": mode})
-                    updated = True
-                    break
-            except Exception:
-                pass
-            try:
-                if hasattr(client, "call"):
-                    client.call("SetInputAudioMonitorType", {"inputName": name, "monitorType": mode})
-                    updated = True
-                    break
-            except Exception:
-                pass
-        if updated:
-            applied.append(name)
-        else:
-            failed.append(name)
+# Tracks the monitor type last applied to each input so that only inputs
+# whose desired state differs are sent SetInputAudioMonitorType. Driven by
+# the input set OBS reports on connect and by input events afterwards.
+class _MonitorReconciler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inputs = set()
+        self._applied: Dict[str, str] = {}
+        # Inputs that failed with a given mode are not retried until they are
+        # recreated, renamed or the mode changes.
+        self._failed: Dict[str, str] = {}
+        # Inputs whose monitor type playback is setting in its own batch.
+        self._claimed = set()
+        self.counters = {"applied": 0, "failed": 0, "skipped": 0}
+
+    def reset(self, inputs) -> None:
+        with self._lock:
+            self._inputs = set(inputs)
+            self._applied.clear()
+            self._failed.clear()
+
+    def input_created(self, name: str) -> None:
+        # Anything applied under this name already belongs to the new input:
+        # InputRemoved clears the old one, and playback may have configured
+        # it before this event is delivered.
+        with self._lock:
+            self._inputs.add(name)
+            self._failed.pop(name, None)
+
+    def input_removed(self, name: str) -> None:
+        with self._lock:
+            self._inputs.discard(name)
+            self._applied.pop(name, None)
+            self._failed.pop(name, None)
+
+    def input_renamed(self, old_name: str, new_name: str) -> None:
+        with self._lock:
+            self._inputs.discard(old_name)
+            self._inputs.add(new_name)
+            self._failed.pop(old_name, None)
+            # The monitor type stays with the input across a rename.
+            if old_name in self._applied:
+                self._applied[new_name] = self._applied.pop(old_name)
+
+    def observed(self, name: str, mode: str) -> None:
+        with self._lock:
+            self._applied[name] = mode
+
+    def claim(self, name: str) -> None:
+        with self._lock:
+            self._claimed.add(name)
+
+    def release(self, name: str) -> None:
+        with self._lock:
+            self._claimed.discard(name)
+
+    def record(self, mode: str, outcome: Dict[str, bool]) -> None:
+        failed = []
+        with self._lock:
+            for name, ok in outcome.items():
+                if ok:
+                    self._applied[name] = mode
+                    self._failed.pop(name, None)
+                    self.counters["applied"] += 1
+                else:
+                    self._applied.pop(name, None)
+                    self._failed[name] = mode
+                    self.counters["failed"] += 1
+                    failed.append(name)
+        for name in failed:
             get_error_logger().error(
-                "Audio monitoring update failed for source '%s'. Check the input name.",
+                "Audio monitoring update failed for source '%s'. Check the exact input name.",
                 name,
             )
-    return {"applied": applied, "failed": failed}
+
+    def _plan(self, settings: Dict[str, str], names, force: bool) -> Tuple[str, List[str], int]:
+        sources, prefixes = _monitor_config(settings)
+        mode = _monitor_type(settings)
+        todo = []
+        skipped = 0
+        with self._lock:
+            candidates = set(sources) | self._inputs if names is None else set(names)
+            for name in sorted(candidates):
+                if name not in sources and not any(name.startswith(p) for p in prefixes):
+                    continue
+                if name in self._claimed:
+                    skipped += 1
+                elif not force and (self._applied.get(name) == mode or self._failed.get(name) == mode):
+                    skipped += 1
+                else:
+                    todo.append(name)
+            self.counters["skipped"] += skipped
+        return mode, todo, skipped
+
+    def reconcile(self, settings: Dict[str, str], names=None, force: bool = False) -> Dict[str, object]:
+        mode, todo, skipped = self._plan(settings, names, force)
+        outcome = {}
+        if todo:
+            if _batching_enabled(settings):
+                requests = [("SetInputAudioMonitorType", {"inputName": name, "monitorType": mode}) for name in todo]
+                results = _session.batch(requests)
+                outcome = {name: res["ok"] for name, res in zip(todo, results)}
+            else:
+                client = _ensure_client()
+                for name in todo:
+                    try:
+                        client.set_input_audio_monitor_type(name, mode)
+                        outcome[name] = True
+                    except ConnectionError:
+                        raise
+                    except Exception:
+                        outcome[name] = False
+            self.record(mode, outcome)
+        return {
+            "applied": [name for name, ok in outcome.items() if ok],
+            "failed": [name for name, ok in outcome.items() if not ok],
+            "skipped": skipped,
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters, tracked=len(self._applied), failing=sorted(self._failed))
+
+
+_monitor = _MonitorReconciler()
 
 
 def _set_audio_monitoring_for_input(client: ReqClient, input_name: str, settings: Dict[str, str]) -> bool:
-    mode_key = (settings.get("audio_monitor_mode") or "monitor_and_output").lower()
-    mode_map = {
-        "monitor_and_output": "OBS_MONITORING_TYPE_MONITOR_AND_OUTPUT",
-        "monitor_only": "OBS_MONITORING_TYPE_MONITOR_ONLY",
-        "monitor_off": "OBS_MONITORING_TYPE_MONITOR_OFF",
-    }
-    mode = mode_map.get(mode_key, mode_map["monitor_and_output"])
-    try:
-        if hasattr(client, "set_input_audio_monitor_type"):
-            client.set_input_audio_monitor_type(input_name, mode)
-            return True
-    except Exception:
-        pass
+    mode = _monitor_type(settings)
     try:
-        if hasattr(client, "send"):
-            client.send("SetInputAudioMonitorType", {"inputName": input_name, "monitorType": mode})
-            return True
+        client.set_input_audio_monitor_type(input_name, mode)
+        ok = True
+    except ConnectionError:
+        raise
     except Exception:
-        pass
-    try:
-        if hasattr(client, "call"):
-            client.call("SetInputAudioMonitorType", {"inputName": input_name, "monitorType": mode})
-            return True
-    except Exception:
-        pass
-    get_error_logger().error(
-        "Audio monitoring update failed for source '%s'. Check the exact input name.",
-        input_name,
-    )
-    return False
+        ok = False
+    _monitor.record(mode, {input_name: ok})
+    return ok
 
 
-def _ensure_media_input(client: ReqClient, source_name: str, file_path: str, layer: int) -> int:
+def _ensure_media_input(client: ReqClient, source_name: str, file_path: str, layer: int, enabled: bool = True) -> int:
     settings = _resolve_settings()
     scene_name = settings["scene"]
     scene_item_id = None
+    input_settings = {"local_file": file_path}
+    if not enabled:
+        # A hidden input must start from the top when it is finally shown.
+        input_settings["restart_on_activate"] = True
     try:
         created = client.create_input(
             sceneName=scene_name,
             inputName=source_name,
             inputKind="ffmpeg_source",
-            inputSettings={"local_file": file_path},
-            sceneItemEnabled=True,
+            inputSettings=input_settings,
+            sceneItemEnabled=enabled,
         )
         scene_item_id = created.scene_item_id
     except Exception:
         resp = client.get_scene_item_id(scene_name, source_name)
         scene_item_id = resp.scene_item_id
-        client.set_input_settings(source_name, {"local_file": file_path}, True)
-        client.set_scene_item_enabled(scene_name, scene_item_id, True)
+        client.set_input_settings(source_name, input_settings, True)
+        client.set_scene_item_enabled(scene_name, scene_item_id, enabled)
 
     if layer is not None:
         client.set_scene_item_index(scene_name, scene_item_id, layer)
@@ -299,31 +403,7 @@ def _apply_source_dimensions(client: ReqClient, scene_name: str, scene_item_id:
         base_height = getattr(video_settings, "base_height", None) or getattr(video_settings, "baseHeight", None)
         if not base_width or not base_height:
             return
-        left_margin = float(settings.get("left_margin", 0) or 0)
-        top_margin = float(settings.get("top_margin", 0) or 0)
-        rel_width = float(settings.get("relative_width", 1) or 1)
-        rel_height = float(settings.get("relative_height", 1) or 1)
-        if rel_width <= 0:
-            rel_width = 1
-        if rel_height <= 0:
-            rel_height = 1
-        bounds_width = base_width * rel_width
-        bounds_height = base_height * rel_height
-        transform = {
-            "positionX": left_margin,
-            "positionY": top_margin,
-            "rotation": 0,
-            "scaleX": 1.0,
-            "scaleY": 1.0,
-            "cropLeft": 0,
-            "cropTop": 0,
-            "cropRight": 0,
-            "cropBottom": 0,
-            "boundsType": "OBS_BOUNDS_STRETCH",
-            "boundsWidth": bounds_width,
-            "boundsHeight": bounds_height,
-            "boundsAlignment": 0,
-        }
+        transform = _transform_for(settings, base_width, base_height)
         client.set_scene_item_transform(scene_name, scene_item_id, transform)
     except Exception:
         return
@@ -339,48 +419,410 @@ def _restart_media(client: ReqClient, scene_name: str, scene_item_id: int, sourc
         return
 
 
-def play(file_path: str, source_name: str, layer: int | None = None):
+class _Timer:
+    def __init__(self, operation: str, mode: str):
+        self.operation = operation
+        self.mode = mode
+        self.steps: List[Tuple[str, float]] = []
+        self._started = time.perf_counter()
+        self._mark = self._started
+
+    def step(self, name: str) -> None:
+        now = time.perf_counter()
+        self.steps.append((name, round((now - self._mark) * 1000, 2)))
+        self._mark = now
+
+    def finish(self) -> dict:
+        result = {
+            "mode": self.mode,
+            "total_ms": round((time.perf_counter() - self._started) * 1000, 2),
+            "steps": self.steps,
+        }
+        _last_timings[self.operation] = result
+        return result
+
+
+def get_last_timings() -> Dict[str, dict]:
+    return dict(_last_timings)
+
+
+def _batching_enabled(settings: Dict[str, str]) -> bool:
+    value = settings.get("batch_requests", True)
+    if isinstance(value, bool):
+        return value
+    return _as_bool(value)
+
+
+def _monitor_type(settings: Dict[str, str]) -> str:
+    mode_key = (settings.get("audio_monitor_mode") or "monitor_and_output").lower()
+    return _MONITOR_TYPES.get(mode_key, _MONITOR_TYPES["monitor_and_output"])
+
+
+def _monitor_config(settings: Dict[str, str]) -> Tuple[List[str], List[str]]:
+    raw_sources = settings.get("audio_monitor_sources", "")
+    sources = []
+    prefixes = []
+    for entry in [s.strip() for s in raw_sources.split(",") if s.strip()]:
+        if entry.endswith(":"):
+            prefixes.append(entry)
+        else:
+            sources.append(entry)
+    prefix = (settings.get("audio_monitor_prefix") or "").strip()
+    if prefix:
+        prefixes.append(prefix)
+    return sources, prefixes
+
+
+def _mute_targets(settings: Dict[str, str]) -> List[str]:
+    return [s.strip() for s in settings.get("mute_sources", "").split(",") if s.strip()]
+
+
+def _transform_for(settings: Dict[str, str], base_width, base_height) -> dict:
+    left_margin = float(settings.get("left_margin", 0) or 0)
+    top_margin = float(settings.get("top_margin", 0) or 0)
+    rel_width = float(settings.get("relative_width", 1) or 1)
+    rel_height = float(settings.get("relative_height", 1) or 1)
+    if rel_width <= 0:
+        rel_width = 1
+    if rel_height <= 0:
+        rel_height = 1
+    return {
+        "positionX": left_margin,
+        "positionY": top_margin,
+        "rotation": 0,
+        "scaleX": 1.0,
+        "scaleY": 1.0,
+        "cropLeft": 0,
+        "cropTop": 0,
+        "cropRight": 0,
+        "cropBottom": 0,
+        "boundsType": "OBS_BOUNDS_STRETCH",
+        "boundsWidth": base_width * rel_width,
+        "boundsHeight": base_height * rel_height,
+        "boundsAlignment": 0,
+    }
+
+
+# Batched operations are written as generators that yield (step name,
+# requests) and receive that batch's results, so the same sequence can be
+# driven from a worker thread or straight from the event loop.
+Steps = Generator[Tuple[str, List[Tuple[str, Optional[dict]]]], List[dict], Optional[dict]]
+
+
+def _drive(steps: Steps, timer: _Timer) -> Optional[dict]:
+    try:
+        name, requests = next(steps)
+        while True:
+            results = _session.batch(requests)
+            timer.step(name)
+            name, requests = steps.send(results)
+    except StopIteration as done:
+        return _finish(done.value, timer)
+    finally:
+        steps.close()
+
+
+async def _drive_async(steps: Steps, timer: _Timer, level: int) -> Optional[dict]:
+    try:
+        name, requests = next(steps)
+        while True:
+            results = await _session.batch_async(requests, level)
+            timer.step(name)
+            name, requests = steps.send(results)
+    except StopIteration as done:
+        return _finish(done.value, timer)
+    finally:
+        steps.close()
+
+
+def _finish(result: Optional[dict], timer: _Timer) -> Optional[dict]:
+    timings = timer.finish()
+    if result is not None:
+        result["timings"] = timings
+    return result
+
+
+def _run_with_priority(level: int, func, *args):
+    with priority(level):
+        return func(*args)
+
+
+def _execute(operation: str, steps: Optional[Steps], sequential, *args):
+    if steps is not None:
+        try:
+            return _drive(steps, _Timer(operation, "batch"))
+        except ConnectionError:
+            raise
+        except Exception as exc:
+            get_error_logger().error("Batched %s failed, retrying sequentially: %s", operation, exc)
+    return sequential(*args)
+
+
+async def _execute_async(operation: str, steps: Optional[Steps], sequential, *args):
+    if steps is not None:
+        try:
+            return await _drive_async(steps, _Timer(operation, "batch"), PRIORITY_PLAYBACK)
+        except ConnectionError:
+            raise
+        except Exception as exc:
+            get_error_logger().error("Batched %s failed, retrying sequentially: %s", operation, exc)
+    return await asyncio.to_thread(_run_with_priority, PRIORITY_PLAYBACK, sequential, *args)
+
+
+def _setup_steps(settings: Dict[str, str], file_path: str, source_name: str, layer: int,
+                 enabled: bool, restart: bool, mute: bool) -> Steps:
+    scene_name = settings["scene"]
+    input_settings = {"local_file": file_path}
+    if not enabled:
+        input_settings["restart_on_activate"] = True
+    # The new input's monitor type goes in the configure batch below; keep
+    # the reconciler from sending it again when InputCreated arrives.
+    _monitor.claim(source_name)
+    try:
+        return (yield from _setup_input_steps(settings, scene_name, input_settings, file_path, source_name,
+                                              layer, enabled, restart, mute))
+    finally:
+        _monitor.release(source_name)
+
+
+def _setup_input_steps(settings: Dict[str, str], scene_name: str, input_settings: dict, file_path: str,
+                       source_name: str, layer: int, enabled: bool, restart: bool, mute: bool) -> Steps:
+    first = [
+        ("GetVideoSettings", None),
+        ("CreateInput", {
+            "sceneName": scene_name,
+            "inputName": source_name,
+            "inputKind": "ffmpeg_source",
+            "inputSettings": input_settings,
+            "sceneItemEnabled": enabled,
+        }),
+    ]
+    results = yield "batch:create", first
+    video, created = results[0], results[1]
+    existed = not created["ok"]
+    if existed:
+        lookup = (yield "batch:lookup", [("GetSceneItemId", {"sceneName": scene_name, "sourceName": source_name})])[0]
+        if not lookup["ok"]:
+            raise RuntimeError(f"Could not create or find input '{source_name}': {created['comment']}")
+        scene_item_id = lookup["data"]["sceneItemId"]
+    else:
+        scene_item_id = created["data"]["sceneItemId"]
+
+    second = []
+    if mute:
+        second.extend(("SetInputMute", {"inputName": name, "inputMuted": True}) for name in _mute_targets(settings))
+    if existed:
+        second.append(("SetInputSettings", {"inputName": source_name, "inputSettings": input_settings, "overlay": True}))
+    if layer is not None:
+        second.append(("SetSceneItemIndex", {"sceneName": scene_name, "sceneItemId": scene_item_id, "sceneItemIndex": layer}))
+    mode = _monitor_type(settings)
+    second.append(("SetInputAudioMonitorType", {"inputName": source_name, "monitorType": mode}))
+    base_width = video["data"].get("baseWidth") if video["ok"] else None
+    base_height = video["data"].get("baseHeight") if video["ok"] else None
+    if base_width and base_height:
+        second.append(("SetSceneItemTransform", {
+            "sceneName": scene_name,
+            "sceneItemId": scene_item_id,
+            "sceneItemTransform": _transform_for(settings, base_width, base_height),
+        }))
+    if restart:
+        second.extend([
+            ("SetSceneItemEnabled", {"sceneName": scene_name, "sceneItemId": scene_item_id, "sceneItemEnabled": False}),
+            ("Sleep", {"sleepMillis": 100}),
+            ("SetInputSettings", {"inputName": source_name, "inputSettings": {"local_file": file_path}, "overlay": True}),
+            ("SetSceneItemEnabled", {"sceneName": scene_name, "sceneItemId": scene_item_id, "sceneItemEnabled": True}),
+        ])
+    elif existed:
+        second.append(("SetSceneItemEnabled", {"sceneName": scene_name, "sceneItemId": scene_item_id, "sceneItemEnabled": enabled}))
+    results = yield "batch:configure", second
+    for (req_type, data), res in zip(second, results):
+        if req_type == "SetInputMute" and not res["ok"]:
+            raise RuntimeError(f"Could not mute '{data['inputName']}': {res['comment']}")
+        if req_type == "SetInputAudioMonitorType":
+            _monitor.record(mode, {source_name: res["ok"]})
+    return {"ok": True, "sceneItemId": scene_item_id}
+
+
+def _go_live_steps(settings: Dict[str, str], scene_item_id: int) -> Steps:
+    requests = [("SetSceneItemEnabled", {"sceneName": settings["scene"], "sceneItemId": scene_item_id, "sceneItemEnabled": True})]
+    requests.extend(("SetInputMute", {"inputName": name, "inputMuted": True}) for name in _mute_targets(settings))
+    results = yield "batch:enable", requests
+    for (req_type, _), res in zip(requests, results):
+        if not res["ok"]:
+            raise RuntimeError(f"{req_type} failed: {res['comment']}")
+    return {"ok": True, "sceneItemId": scene_item_id}
+
+
+def _remove_steps(settings: Dict[str, str], source_name: str, unmute: bool) -> Steps:
+    scene_name = settings["scene"]
+    lookup = (yield "batch:lookup", [("GetSceneItemId", {"sceneName": scene_name, "sourceName": source_name})])[0]
+    requests = []
+    if lookup["ok"]:
+        requests.extend([
+            ("SetSceneItemEnabled", {"sceneName": scene_name, "sceneItemId": lookup["data"]["sceneItemId"], "sceneItemEnabled": False}),
+            ("Sleep", {"sleepMillis": 100}),
+        ])
+    requests.append(("RemoveInput", {"inputName": source_name}))
+    if unmute:
+        requests.extend(("SetInputMute", {"inputName": name, "inputMuted": False}) for name in _mute_targets(settings))
+    results = yield "batch:remove", requests
+    for (req_type, data), res in zip(requests, results):
+        if req_type == "SetInputMute" and not res["ok"]:
+            raise RuntimeError(f"Could not unmute '{data['inputName']}': {res['comment']}")
+    return {"ok": True}
+
+
+def _resolved_layer(settings: Dict[str, str], layer: int | None) -> int:
+    return layer if layer is not None else int(settings["layer"])
+
+
+def _play_sequential(file_path: str, source_name: str, layer: int):
     client = _ensure_client()
-    _mute_sources(True)
     settings = _resolve_settings()
-    scene_item_id = _ensure_media_input(
-        client,
-        source_name=source_name,
-        file_path=file_path,
-        layer=layer if layer is not None else int(settings["layer"]),
-    )
-    _apply_audio_monitoring(client, settings)
-    _set_audio_monitoring_for_input(client, source_name, settings)
+    timer = _Timer("play", "sequential")
+    _mute_sources(True)
+    timer.step("mute")
+    # As in _setup_steps: the monitor type is set below, so the reconciler
+    # must not send it again when InputCreated arrives.
+    _monitor.claim(source_name)
+    try:
+        scene_item_id = _ensure_media_input(
+            client,
+            source_name=source_name,
+            file_path=file_path,
+            layer=layer,
+        )
+        timer.step("create")
+        _set_audio_monitoring_for_input(client, source_name, settings)
+        timer.step("monitoring")
+    finally:
+        _monitor.release(source_name)
     _apply_source_dimensions(client, settings["scene"], scene_item_id, settings)
+    timer.step("transform")
     _restart_media(client, settings["scene"], scene_item_id, source_name, file_path)
-    _set_audio_monitoring_for_input(client, source_name, settings)
-    return {"ok": True, "sceneItemId": scene_item_id}
+    timer.step("restart")
+    return {"ok": True, "sceneItemId": scene_item_id, "timings": timer.finish()}
 
 
-def stop(source_name: str, clear: bool = False):
+def _prepare_sequential(file_path: str, source_name: str, layer: int):
     client = _ensure_client()
     settings = _resolve_settings()
-    if clear:
+    timer = _Timer("prepare", "sequential")
+    _monitor.claim(source_name)
+    try:
+        scene_item_id = _ensure_media_input(
+            client,
+            source_name=source_name,
+            file_path=file_path,
+            layer=layer,
+            enabled=False,
+        )
+        timer.step("create")
+        _set_audio_monitoring_for_input(client, source_name, settings)
+        timer.step("monitoring")
+    finally:
+        _monitor.release(source_name)
+    _apply_source_dimensions(client, settings["scene"], scene_item_id, settings)
+    timer.step("transform")
+    return {"ok": True, "sceneItemId": scene_item_id, "timings": timer.finish()}
+
+
+def _go_live_sequential(scene_item_id: int):
+    client = _ensure_client()
+    settings = _resolve_settings()
+    timer = _Timer("go_live", "sequential")
+    client.set_scene_item_enabled(settings["scene"], scene_item_id, True)
+    timer.step("enable")
+    _mute_sources(True)
+    timer.step("mute")
+    return {"ok": True, "sceneItemId": scene_item_id, "timings": timer.finish()}
+
+
+def _remove_sequential(source_name: str, unmute: bool):
+    client = _ensure_client()
+    settings = _resolve_settings()
+    timer = _Timer("stop" if unmute else "remove", "sequential")
+    try:
+        resp = client.get_scene_item_id(settings["scene"], source_name)
+        client.set_scene_item_enabled(settings["scene"], resp.scene_item_id, False)
+        time.sleep(0.1)
+    except Exception:
+        pass
+    try:
+        client.remove_input(source_name)
+    except Exception:
         try:
             resp = client.get_scene_item_id(settings["scene"], source_name)
-            client.set_scene_item_enabled(settings["scene"], resp.scene_item_id, False)
-            time.sleep(0.1)
+            if hasattr(client, "remove_scene_item"):
+                client.remove_scene_item(settings["scene"], resp.scene_item_id)
+            elif hasattr(client, "call"):
+                client.call("RemoveSceneItem", {"sceneName": settings["scene"], "sceneItemId": resp.scene_item_id})
+            elif hasattr(client, "send"):
+                client.send("RemoveSceneItem", {"sceneName": settings["scene"], "sceneItemId": resp.scene_item_id})
         except Exception:
             pass
-        try:
-            client.remove_input(source_name)
-        except Exception:
-            try:
-                resp = client.get_scene_item_id(settings["scene"], source_name)
-                if hasattr(client, "remove_scene_item"):
-                    client.remove_scene_item(settings["scene"], resp.scene_item_id)
-                elif hasattr(client, "call"):
-                    client.call("RemoveSceneItem", {"sceneName": settings["scene"], "sceneItemId": resp.scene_item_id})
-                elif hasattr(client, "send"):
-                    client.send("RemoveSceneItem", {"sceneName": settings["scene"], "sceneItemId": resp.scene_item_id})
-            except Exception:
-                pass
+    timer.step("remove")
+    if unmute:
+        _mute_sources(False)
+        timer.step("unmute")
+    return {"ok": True, "timings": timer.finish()}
+
+
+def _batched(settings: Dict[str, str], steps: Callable[[], Steps]) -> Optional[Steps]:
+    return steps() if _batching_enabled(settings) else None
+
+
+def play(file_path: str, source_name: str, layer: int | None = None):
+    settings = _resolve_settings()
+    layer = _resolved_layer(settings, layer)
+    steps = _batched(settings, lambda: _setup_steps(settings, file_path, source_name, layer, True, True, True))
+    _ensure_client()
+    return _execute("play", steps, _play_sequential, file_path, source_name, layer)
+
+
+async def play_async(file_path: str, source_name: str, layer: int | None = None):
+    settings = _resolve_settings()
+    layer = _resolved_layer(settings, layer)
+    steps = _batched(settings, lambda: _setup_steps(settings, file_path, source_name, layer, True, True, True))
+    return await _execute_async("play", steps, _play_sequential, file_path, source_name, layer)
+
+
+async def prepare_async(file_path: str, source_name: str, layer: int | None = None):
+    settings = _resolve_settings()
+    layer = _resolved_layer(settings, layer)
+    steps = _batched(settings, lambda: _setup_steps(settings, file_path, source_name, layer, False, False, False))
+    result = await _execute_async("prepare", steps, _prepare_sequential, file_path, source_name, layer)
+    _prepared[source_name] = result["sceneItemId"]
+    return result
+
+
+async def go_live_async(source_name: str):
+    scene_item_id = _prepared.pop(source_name, None)
+    if scene_item_id is None:
+        raise KeyError(source_name)
+    settings = _resolve_settings()
+    return await _execute_async("go_live", _batched(settings, lambda: _go_live_steps(settings, scene_item_id)),
+                                _go_live_sequential, scene_item_id)
+
+
+async def remove_source_async(source_name: str) -> None:
+    _prepared.pop(source_name, None)
+    settings = _resolve_settings()
+    await _execute_async("remove", _batched(settings, lambda: _remove_steps(settings, source_name, False)),
+                         _remove_sequential, source_name, False)
+
+
+def stop(source_name: str, clear: bool = False):
+    if clear:
+        _prepared.pop(source_name, None)
+        settings = _resolve_settings()
+        _ensure_client()
+        _execute("stop", _batched(settings, lambda: _remove_steps(settings, source_name, True)),
+                 _remove_sequential, source_name, True)
+        return {"ok": True}
     else:
+        client = _ensure_client()
+        settings = _resolve_settings()
         try:
             resp = client.get_scene_item_id(settings["scene"], source_name)
             client.set_scene_item_enabled(settings["scene"], resp.scene_item_id, False)
@@ -390,7 +832,21 @@ def stop(source_name: str, clear: bool = False):
     return {"ok": True}
 
 
-def apply_audio_monitoring() -> Dict[str, list]:
-    client = _ensure_client()
+async def stop_async(source_name: str, clear: bool = False):
+    if not clear:
+        return await asyncio.to_thread(_run_with_priority, PRIORITY_PLAYBACK, stop, source_name, False)
+    _prepared.pop(source_name, None)
     settings = _resolve_settings()
-    return _apply_audio_monitoring(client, settings)
+    await _execute_async("stop", _batched(settings, lambda: _remove_steps(settings, source_name, True)),
+                         _remove_sequential, source_name, True)
+    return {"ok": True}
+
+
+def apply_audio_monitoring() -> Dict[str, object]:
+    client = _ensure_client()
+    _monitor.reset(item.get("inputName") for item in client.get_input_list().inputs)
+    return _monitor.reconcile(_resolve_settings(), force=True)
+
+
+def audio_monitoring_stats() -> dict:
+    return _monitor.stats()
@@ -0,0 +1,414 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from obsws_python import ReqClient
+from obsws_python.error import OBSSDKRequestError, OBSSDKTimeoutError
+from obsws_python.subs import Subs
+
+import metrics
+from logging_setup import get_error_logger
+
+RECONNECT_MIN_SEC = 0.5
+RECONNECT_MAX_SEC = 30.0
+# How often the session re-checks config.json for edits made outside the API.
+SETTINGS_CHECK_SEC = 2.0
+REQUEST_TIMEOUT_SEC = 3.0
+# Requests on the wire at once. With one, anything queued behind it is sent
+# strictly by priority, so playback never waits behind a backlog of probes.
+MAX_IN_FLIGHT = 1
+CONNECTION_KEYS = ("host", "port", "password")
+
+PRIORITY_PLAYBACK = 0
+PRIORITY_CONTROL = 1
+PRIORITY_STATUS = 2
+
+_priority = contextvars.ContextVar("obs_priority", default=PRIORITY_STATUS)
+
+
+@contextmanager
+def priority(level: int):
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def _batch_results(requests, response: dict) -> List[dict]:
+    results = []
+    for res in response.get("results", []):
+        status = res.get("requestStatus", {})
+        results.append({
+            "type": res.get("requestType"),
+            "ok": bool(status.get("result")),
+            "comment": status.get("comment"),
+            "data": res.get("responseData") or {},
+        })
+    if len(results) != len(requests):
+        raise RuntimeError("obs-websocket returned an incomplete request batch")
+    return results
+
+
+def _record_response(sent: Tuple[str, float], payload: dict) -> None:
+    req_type, started = sent
+    elapsed = time.perf_counter() - started
+    metrics.OBS_REQUEST_SECONDS.observe(elapsed, type=req_type, batch="false")
+    if "results" in payload:
+        for res in payload["results"]:
+            # Each request in a batch is charged the batch's round trip.
+            metrics.OBS_REQUEST_SECONDS.observe(elapsed, type=res.get("requestType"), batch="true")
+            if not res.get("requestStatus", {}).get("result"):
+                metrics.OBS_REQUEST_FAILURES.inc(type=res.get("requestType"))
+    elif not payload.get("requestStatus", {}).get("result"):
+        metrics.OBS_REQUEST_FAILURES.inc(type=req_type)
+
+
+def _batch_payload(requests) -> dict:
+    # SerialRealtime execution keeps the order and honours Sleep requests.
+    return {
+        "haltOnFailure": False,
+        "executionType": 0,
+        "requests": [
+            dict({"requestType": req_type, "requestId": str(idx)}, **({"requestData": data} if data else {}))
+            for idx, (req_type, data) in enumerate(requests)
+        ],
+    }
+
+
+# One long-lived obs-websocket connection shared by playback, the API and the
+# event stream. Responses are matched to requests by requestId, so callers on
+# any thread or on the event loop can have requests outstanding at once;
+# events arrive on the same socket. Liveness comes from the reader noticing
+# the socket drop and from request errors; a background thread reconnects
+# with backoff, so callers never probe OBS before a request.
+class ObsSession:
+    def __init__(self, resolve_settings: Callable[[], Dict[str, str]], config_revision: Callable[[], object]):
+        self._resolve_settings = resolve_settings
+        self._config_revision = config_revision
+        self._lock = threading.RLock()
+        self._send_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._client: Optional[ReqClient] = None
+        self._socket = None
+        self._waiting: Dict[str, Future] = {}
+        # request id -> (request type, perf_counter at submit) for metrics.
+        self._sent_at: Dict[str, Tuple[str, float]] = {}
+        self._queue: List[Tuple[int, int, str, str]] = []
+        self._in_flight = 0
+        self._ids = itertools.count(1)
+        self._events: "queue.Queue" = queue.Queue()
+        self._settings: Optional[Dict[str, str]] = None
+        self._settings_revision = None
+        # Last resolved settings, kept across invalidation to detect changes.
+        self._resolved: Optional[Dict[str, str]] = None
+        self._conn_key = None
+        self._backoff = RECONNECT_MIN_SEC
+        self._next_attempt = 0.0
+        self._event_listeners: Dict[str, List[Callable]] = {}
+        self._connection_listeners: List[Callable] = []
+        self._settings_listeners: List[Callable] = []
+        self.connected = False
+        self.connected_since: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def start(self) -> None:
+        # Called on every request, so the running case takes no lock.
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            try:
+                from data_provider import add_change_listener, CONFIG_FILE
+                add_change_listener(lambda path: path == CONFIG_FILE and self.invalidate_settings())
+            except Exception:
+                pass
+            self._thread = threading.Thread(target=self._supervise, name="obs-session", daemon=True)
+            self._thread.start()
+            threading.Thread(target=self._dispatch_events, name="obs-events", daemon=True).start()
+
+    def settings(self) -> Dict[str, str]:
+        settings = self._settings
+        if settings is None:
+            revision = self._config_revision()
+            settings = self._resolve_settings()
+            previous = self._resolved
+            self._settings = settings
+            self._resolved = settings
+            self._settings_revision = revision
+            if previous is not None and previous != settings:
+                self._events.put((list(self._settings_listeners), settings))
+        return settings
+
+    def invalidate_settings(self) -> None:
+        self._settings = None
+        self._wake.set()
+
+    def add_settings_listener(self, callback: Callable[[Dict[str, str]], None]) -> None:
+        self._settings_listeners.append(callback)
+
+    def add_event_listener(self, event_type: str, callback: Callable[[dict], None]) -> None:
+        self._event_listeners.setdefault(event_type, []).append(callback)
+
+    def add_connection_listener(self, callback: Callable[[bool], None]) -> None:
+        self._connection_listeners.append(callback)
+
+    def client(self) -> ReqClient:
+        self.start()
+        client = self._client
+        if client is None:
+            # Reconnecting is left to the supervisor thread; callers never
+            # wait on a handshake or on the lock it holds.
+            raise ConnectionError(self.last_error or "Not connected to OBS")
+        return client
+
+    def status(self) -> dict:
+        return {
+            "connected": self.connected,
+            "connected_since": self.connected_since,
+            "last_error": self.last_error,
+            "retry_in_sec": None if self.connected else round(max(0.0, self._next_attempt - time.monotonic()), 1),
+            "queued": len(self._queue),
+        }
+
+    def batch(self, requests: List[Tuple[str, Optional[dict]]]) -> List[dict]:
+        self.client()
+        future = self._submit(8, _batch_payload(requests), _priority.get())
+        return _batch_results(requests, self._wait(future))
+
+    async def request_async(self, req_type: str, data: Optional[dict] = None, level: int = PRIORITY_STATUS) -> dict:
+        self.start()
+        payload = {"requestType": req_type}
+        if data:
+            payload["requestData"] = data
+        response = await self._wait_async(self._submit(6, payload, level))
+        status = response.get("requestStatus", {})
+        if not status.get("result"):
+            raise OBSSDKRequestError(req_type, status.get("code"), status.get("comment"))
+        return response.get("responseData") or {}
+
+    async def batch_async(self, requests: List[Tuple[str, Optional[dict]]], level: int = PRIORITY_STATUS) -> List[dict]:
+        self.start()
+        response = await self._wait_async(self._submit(8, _batch_payload(requests), level))
+        return _batch_results(requests, response)
+
+    def mark_down(self, exc: BaseException) -> None:
+        with self._lock:
+            if self._socket is None:
+                return
+            self._close(ConnectionError(f"Lost connection to OBS: {exc}"))
+            self.last_error = f"{type(exc).__name__}: {exc}"
+            self._backoff = RECONNECT_MIN_SEC
+            self._next_attempt = time.monotonic()
+        get_error_logger().error("Lost connection to OBS: %s", self.last_error)
+        self._notify_connection(False)
+        self._wake.set()
+
+    def _request_sync(self, req_type: str, req_data: Optional[dict] = None) -> dict:
+        # Stands in for obsws-python's ObsClient.req so ReqClient's typed
+        # helpers share the multiplexed socket.
+        payload = {"requestType": req_type}
+        if req_data:
+            payload["requestData"] = req_data
+        return self._wait(self._submit(6, payload, _priority.get()))
+
+    def _submit(self, op: int, payload: dict, level: int) -> Future:
+        future: Future = Future()
+        request_id = str(next(self._ids))
+        payload["requestId"] = request_id
+        message = json.dumps({"op": op, "d": payload})
+        error = None
+        with self._send_lock:
+            ws = self._socket
+            if ws is None:
+                self._wake.set()
+                raise ConnectionError(self.last_error or "Not connected to OBS")
+            self._waiting[request_id] = future
+            self._sent_at[request_id] = (payload.get("requestType", "RequestBatch"), time.perf_counter())
+            for request in payload.get("requests", ()):
+                metrics.OBS_BATCHED_REQUESTS.inc(type=request["requestType"])
+            if self._in_flight < MAX_IN_FLIGHT:
+                error = self._send(ws, message)
+            else:
+                heapq.heappush(self._queue, (level, next(self._ids), request_id, message))
+        if error is not None:
+            self.mark_down(error)
+        return future
+
+    def _send(self, ws, message: str) -> Optional[BaseException]:
+        # Called with _send_lock held.
+        self._in_flight += 1
+        try:
+            ws.send(message)
+        except Exception as exc:
+            return exc
+        return None
+
+    def _resolve(self, payload: dict) -> None:
+        error = None
+        with self._send_lock:
+            future = self._waiting.pop(payload.get("requestId"), None)
+            sent = self._sent_at.pop(payload.get("requestId"), None)
+            if future is not None:
+                self._in_flight -= 1
+            while self._queue and self._in_flight < MAX_IN_FLIGHT and error is None:
+                _, _, _, message = heapq.heappop(self._queue)
+                error = self._send(self._socket, message)
+        if sent is not None:
+            _record_response(sent, payload)
+        if future is not None:
+            try:
+                future.set_result(payload)
+            except InvalidStateError:
+                pass
+        if error is not None:
+            self.mark_down(error)
+
+    def _wait(self, future: Future) -> dict:
+        try:
+            return future.result(timeout=REQUEST_TIMEOUT_SEC)
+        except FutureTimeoutError:
+            metrics.OBS_REQUEST_TIMEOUTS.inc()
+            error = OBSSDKTimeoutError("Timeout while waiting for an OBS response")
+            self.mark_down(error)
+            raise error
+
+    async def _wait_async(self, future: Future) -> dict:
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=REQUEST_TIMEOUT_SEC)
+        except asyncio.TimeoutError:
+            metrics.OBS_REQUEST_TIMEOUTS.inc()
+            error = OBSSDKTimeoutError("Timeout while waiting for an OBS response")
+            self.mark_down(error)
+            raise error
+
+    def _connect(self) -> None:
+        # Runs on the supervisor thread only. The handshake happens without
+        # the lock; the new connection is published under it.
+        settings = self.settings()
+        try:
+            client = ReqClient(
+                host=settings["host"],
+                port=int(settings["port"]),
+                password=settings["password"],
+                subs=Subs.LOW_VOLUME,
+                timeout=3
+            )
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            if error != self.last_error:
+                get_error_logger().error("Could not connect to OBS: %s", error)
+            with self._lock:
+                self.last_error = error
+                self._next_attempt = time.monotonic() + self._backoff
+                self._backoff = min(self._backoff * 2, RECONNECT_MAX_SEC)
+            return
+        ws = client.base_client.ws
+        # The reader blocks on this socket; request timeouts are enforced on
+        # the waiting side instead.
+        ws.settimeout(None)
+        client.base_client.req = self._request_sync
+        with self._lock:
+            with self._send_lock:
+                self._socket = ws
+                self._in_flight = 0
+            self._client = client
+            self._conn_key = tuple(settings[k] for k in CONNECTION_KEYS)
+            self._backoff = RECONNECT_MIN_SEC
+            self.connected = True
+            self.connected_since = time.time()
+            self.last_error = None
+        threading.Thread(target=self._read, args=(ws,), name="obs-reader", daemon=True).start()
+        self._notify_connection(True)
+
+    def _close(self, error: BaseException) -> None:
+        with self._send_lock:
+            ws = self._socket
+            waiting = list(self._waiting.values())
+            self._socket = None
+            self._waiting.clear()
+            self._sent_at.clear()
+            self._queue.clear()
+            self._in_flight = 0
+        self._client = None
+        self.connected = False
+        self.connected_since = None
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+        for future in waiting:
+            try:
+                future.set_exception(error)
+            except InvalidStateError:
+                pass
+
+    def _read(self, ws) -> None:
+        while True:
+            try:
+                message = json.loads(ws.recv())
+            except Exception as exc:
+                if self._socket is ws:
+                    self.mark_down(exc)
+                return
+            op = message.get("op")
+            payload = message.get("d") or {}
+            if op in (7, 9):
+                self._resolve(payload)
+            elif op == 5:
+                callbacks = self._event_listeners.get(payload.get("eventType"))
+                if callbacks:
+                    self._events.put((list(callbacks), payload.get("eventData") or {}))
+
+    def _dispatch_events(self) -> None:
+        # Listeners run here rather than on the reader (or under the session
+        # lock) so they can make requests of their own without deadlocking.
+        while True:
+            callbacks, arg = self._events.get()
+            for callback in callbacks:
+                try:
+                    callback(arg)
+                except Exception as exc:
+                    get_error_logger().exception("OBS listener failed: %s", exc)
+
+    def _notify_connection(self, connected: bool) -> None:
+        self._events.put((list(self._connection_listeners), connected))
+
+    def _check_settings(self) -> None:
+        if self._settings is not None and self._config_revision() != self._settings_revision:
+            self._settings = None
+        settings = self.settings()
+        with self._lock:
+            if self._client is not None and tuple(settings[k] for k in CONNECTION_KEYS) != self._conn_key:
+                self._close(ConnectionError("OBS connection settings changed"))
+                self._next_attempt = 0.0
+                self._notify_connection(False)
+
+    def _supervise(self) -> None:
+        while True:
+            try:
+                self._check_settings()
+                with self._lock:
+                    due = self._client is None and time.monotonic() >= self._next_attempt
+                if due:
+                    self._connect()
+            except Exception as exc:
+                get_error_logger().exception("OBS session supervisor failed: %s", exc)
+            if self._client is None:
+                timeout = min(SETTINGS_CHECK_SEC, max(0.05, self._next_attempt - time.monotonic()))
+            else:
+                timeout = SETTINGS_CHECK_SEC
+            self._wake.wait(timeout=timeout)
+            self._wake.clear()
@@ -0,0 +1,234 @@
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+Interval = Tuple[int, int, str]
+
+
+# Schedule entries as (start, stop, uuid) intervals sorted by start. Lookups
+# bisect on start; because no interval is longer than _max_len, every
+# interval that can overlap [start, stop) starts within
+# (start - _max_len, stop), so overlap queries only look at that window.
+# The union of all intervals is kept alongside as disjoint busy blocks, so a
+# free-slot search jumps over a packed stretch in one step.
+class IntervalIndex:
+    def __init__(self, intervals: Iterable[Interval] = ()):
+        self._items: List[Interval] = sorted(intervals)
+        self._starts = [item[0] for item in self._items]
+        self._by_uuid = {item[2]: item for item in self._items}
+        self._max_len = max((stop - start for start, stop, _ in self._items), default=0)
+        self._block_starts: List[int] = []
+        self._block_stops: List[int] = []
+        for start, stop, _ in self._items:
+            self._merge_block(start, stop)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, uuid: str) -> bool:
+        return uuid in self._by_uuid
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def copy(self) -> "IntervalIndex":
+        clone = IntervalIndex()
+        clone._items = list(self._items)
+        clone._starts = list(self._starts)
+        clone._by_uuid = dict(self._by_uuid)
+        clone._max_len = self._max_len
+        clone._block_starts = list(self._block_starts)
+        clone._block_stops = list(self._block_stops)
+        return clone
+
+    def get(self, uuid: str) -> Optional[Interval]:
+        return self._by_uuid.get(uuid)
+
+    def add(self, start: int, stop: int, uuid: str) -> None:
+        if uuid in self._by_uuid:
+            self.remove(uuid)
+        item = (start, stop, uuid)
+        idx = bisect_right(self._items, item)
+        self._items.insert(idx, item)
+        self._starts.insert(idx, start)
+        self._by_uuid[uuid] = item
+        if stop - start > self._max_len:
+            self._max_len = stop - start
+        self._merge_block(start, stop)
+
+    def remove(self, uuid: str) -> Optional[Interval]:
+        # _max_len is left as is: an upper bound keeps queries correct.
+        item = self._by_uuid.pop(uuid, None)
+        if item is None:
+            return None
+        idx = bisect_left(self._items, item)
+        del self._items[idx]
+        del self._starts[idx]
+        # Rebuild the busy block that contained it from the intervals left.
+        block = bisect_right(self._block_starts, item[0]) - 1
+        block_start, block_stop = self._block_starts[block], self._block_stops[block]
+        del self._block_starts[block]
+        del self._block_stops[block]
+        lo = bisect_left(self._starts, block_start)
+        hi = bisect_right(self._starts, block_stop)
+        for start, stop, _ in self._items[lo:hi]:
+            self._merge_block(start, stop)
+        return item
+
+    def _merge_block(self, start: int, stop: int) -> None:
+        # Touching blocks are merged too; no slot fits in a zero-length gap.
+        lo = bisect_left(self._block_stops, start)
+        hi = bisect_right(self._block_starts, stop)
+        if lo < hi:
+            start = min(start, self._block_starts[lo])
+            stop = max(stop, self._block_stops[hi - 1])
+            del self._block_starts[lo:hi]
+            del self._block_stops[lo:hi]
+        self._block_starts.insert(lo, start)
+        self._block_stops.insert(lo, stop)
+
+    def overlapping(self, start: int, stop: int) -> List[Interval]:
+        lo = bisect_right(self._starts, start - self._max_len)
+        hi = bisect_left(self._starts, stop)
+        return [item for item in self._items[lo:hi] if item[1] > start]
+
+    def overlaps(self, start: int, stop: int) -> bool:
+        lo = bisect_right(self._starts, start - self._max_len)
+        hi = bisect_left(self._starts, stop)
+        return any(self._items[idx][1] > start for idx in range(lo, hi))
+
+    def next_free(self, start: int, duration: int) -> int:
+        # Earliest slot at or after start whose [slot, slot + duration) is
+        # clear. Only gaps too short for the duration are stepped over.
+        slot = start
+        idx = bisect_right(self._block_starts, start) - 1
+        if idx >= 0 and self._block_stops[idx] > slot:
+            slot = self._block_stops[idx]
+        idx += 1
+        while idx < len(self._block_starts) and self._block_starts[idx] < slot + duration:
+            slot = max(slot, self._block_stops[idx])
+            idx += 1
+        return slot
+
+
+# Schedule entries kept ordered by start_timestamp, with a uuid lookup and
+# the sorted start times of every item name (its play history).
+# Positions are found by bisecting on the start and then matching the entry
+# itself among equal starts, so add/remove/reschedule never re-sort.
+class SortedSchedule:
+    def __init__(self, entries: Iterable[dict] = ()):
+        self._entries: List[dict] = sorted((dict(e) for e in entries), key=lambda e: e["start_timestamp"])
+        self._starts = [e["start_timestamp"] for e in self._entries]
+        self._by_uuid: Dict[str, List[dict]] = {}
+        self._starts_by_name: Dict[str, List[int]] = {}
+        for entry in self._entries:
+            self._by_uuid.setdefault(entry["uuid"], []).append(entry)
+            self._starts_by_name.setdefault(entry["name"], []).append(entry["start_timestamp"])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def entries(self) -> List[dict]:
+        return list(self._entries)
+
+    def copy(self) -> "SortedSchedule":
+        clone = SortedSchedule()
+        clone._entries = list(self._entries)
+        clone._starts = list(self._starts)
+        clone._by_uuid = {uuid: list(group) for uuid, group in self._by_uuid.items()}
+        clone._starts_by_name = {name: list(starts) for name, starts in self._starts_by_name.items()}
+        return clone
+
+    def get(self, uuid: str) -> Optional[dict]:
+        group = self._by_uuid.get(uuid)
+        return group[0] if group else None
+
+    def _position(self, entry: dict) -> int:
+        idx = bisect_left(self._starts, entry["start_timestamp"])
+        while self._entries[idx] is not entry:
+            idx += 1
+        return idx
+
+    def add(self, entry: dict) -> None:
+        entry = dict(entry)
+        idx = bisect_right(self._starts, entry["start_timestamp"])
+        self._entries.insert(idx, entry)
+        self._starts.insert(idx, entry["start_timestamp"])
+        self._by_uuid.setdefault(entry["uuid"], []).append(entry)
+        insort(self._starts_by_name.setdefault(entry["name"], []), entry["start_timestamp"])
+
+    def remove(self, uuid: str) -> bool:
+        group = self._by_uuid.pop(uuid, None)
+        if not group:
+            return False
+        for entry in group:
+            idx = self._position(entry)
+            del self._entries[idx]
+            del self._starts[idx]
+            starts = self._starts_by_name[entry["name"]]
+            del starts[bisect_left(starts, entry["start_timestamp"])]
+            if not starts:
+                del self._starts_by_name[entry["name"]]
+        return True
+
+    def reschedule(self, uuid: str, start: int) -> bool:
+        group = self._by_uuid.get(uuid)
+        if not group or all(e["start_timestamp"] == start for e in group):
+            return False
+        self.remove(uuid)
+        for entry in group:
+            self.add(dict(entry, start_timestamp=start))
+        return True
+
+    def starts_for(self, name: str) -> List[int]:
+        # Shared with the store; do not mutate.
+        return self._starts_by_name.get(name, [])
+
+    def rename(self, old: str, new: str) -> bool:
+        # Entries are shared with copies of this store, so they are replaced
+        # rather than edited.
+        starts = self._starts_by_name.pop(old, None)
+        if not starts:
+            return False
+        for idx, entry in enumerate(self._entries):
+            if entry["name"] != old:
+                continue
+            renamed = dict(entry, name=new)
+            self._entries[idx] = renamed
+            group = self._by_uuid[entry["uuid"]]
+            group[:] = [renamed if e is entry else e for e in group]
+        self._starts_by_name[new] = sorted(self._starts_by_name.get(new, []) + starts)
+        return True
+
+    def shift(self, delta: int) -> bool:
+        if not delta or not self._entries:
+            return False
+        shifted = SortedSchedule()
+        shifted._entries = [dict(e, start_timestamp=e["start_timestamp"] + delta) for e in self._entries]
+        shifted._starts = [e["start_timestamp"] for e in shifted._entries]
+        for entry in shifted._entries:
+            shifted._by_uuid.setdefault(entry["uuid"], []).append(entry)
+            shifted._starts_by_name.setdefault(entry["name"], []).append(entry["start_timestamp"])
+        self.__dict__.update(shifted.__dict__)
+        return True
+
+    def count_before(self, now: int) -> int:
+        return bisect_left(self._starts, now)
+
+    def playing_at(self, now: int, duration_of, max_len: int) -> Optional[Tuple[dict, int]]:
+        # Anything still on air at now started within (now - max_len, now).
+        # duration_of(entry) returns None for entries that cannot play.
+        idx = bisect_left(self._starts, now) - 1
+        while idx >= 0 and self._starts[idx] > now - max_len:
+            entry = self._entries[idx]
+            duration = duration_of(entry)
+            if duration is not None and self._starts[idx] + duration > now:
+                return entry, self._starts[idx] + duration
+            idx -= 1
+        return None
+
+    def starting_after(self, now: int):
+        for idx in range(bisect_right(self._starts, now), len(self._entries)):
+            yield self._entries[idx]
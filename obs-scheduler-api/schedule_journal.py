@@ -0,0 +1,204 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import metrics
+from schedule_index import SortedSchedule
+
+# Append-only history of schedule edits. The journal directory holds
+# segments: <base>.json is the full schedule at sequence number `base` and
+# <base>.log lists the edits made after it, one JSON record per line, led by
+# a header line. Only the newest segment is live; older ones are kept, up to
+# prune()'s limit, so earlier points in the history can be rebuilt.
+# schedule.json is rewritten when a new
+# segment starts, so the original file layout stays readable, and an edit
+# made to it outside the process is picked up as a new starting point.
+COMPACT_OPS_DEFAULT = 1000
+KEEP_SEGMENTS_DEFAULT = 10
+
+
+def _stat_key(path: Path):
+    try:
+        st = path.stat()
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def apply_record(store: SortedSchedule, record: dict) -> bool:
+    op = record["op"]
+    if op == "add":
+        store.add(record["entry"])
+        return True
+    if op == "remove":
+        return store.remove(record["uuid"])
+    if op == "reschedule":
+        return store.reschedule(record["uuid"], record["start"])
+    if op == "rename":
+        return store.rename(record["from"], record["to"])
+    if op == "shift":
+        return store.shift(record["delta"])
+    raise ValueError(f"unknown journal op {op!r}")
+
+
+class ScheduleJournal:
+    def __init__(self, directory: Path, schedule_file: Path, write_file, dumps):
+        # write_file(path, text) must replace path atomically; dumps renders
+        # a schedule the way the rest of the data directory is written.
+        self.directory = Path(directory)
+        self.schedule_file = Path(schedule_file)
+        self._write_file = write_file
+        self._dumps = dumps
+        live = self._segments()
+        self.base: Optional[int] = live[-1] if live else None
+        self.seq = 0
+        self.ops = 0
+        self.stale = True
+        self._valid_end = None
+        self._loaded = False
+        # Readers may reload while a writer appends; both go through this.
+        self._lock = threading.RLock()
+
+    def _segments(self) -> List[int]:
+        if not self.directory.exists():
+            return []
+        return sorted(int(p.stem) for p in self.directory.glob("*.json") if p.stem.isdigit())
+
+    def _paths(self, base: int):
+        return self.directory / f"{base:012d}.json", self.directory / f"{base:012d}.log"
+
+    def key(self):
+        # Only this process appends, so the live segment is known; the stats
+        # catch appends and outside edits of schedule.json.
+        log = self._paths(self.base)[1] if self.base is not None else None
+        return ("journal", self.base, _stat_key(log) if log else None, _stat_key(self.schedule_file))
+
+    def _read_external(self) -> List[dict]:
+        if not self.schedule_file.exists():
+            return []
+        return json.loads(self.schedule_file.read_text(encoding="utf-8-sig"))
+
+    def _read_log(self, log: Path):
+        # Returns (header, records, end of the last complete line). A record
+        # cut short by a crash is dropped and overwritten by the next append.
+        header, records, end = None, [], 0
+        if not log.exists():
+            return header, records, end
+        with log.open("rb") as fh:
+            for line in fh:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                end += len(line)
+                if header is None:
+                    header = record
+                else:
+                    records.append(record)
+        return header, records, end
+
+    def load(self) -> List[dict]:
+        with self._lock:
+            live = self._segments()
+            self.base = live[-1] if live else None
+            self._loaded = True
+            if not live:
+                self.seq, self.ops, self.stale = 0, 0, True
+                return self._read_external()
+            snapshot, log = self._paths(live[-1])
+            header, records, end = self._read_log(log)
+            self.base = live[-1]
+            self.seq = records[-1]["seq"] if records else self.base
+            self.ops = len(records)
+            self._valid_end = end
+            if header is None or header.get("schedule_json") != _stat_key(self.schedule_file):
+                # schedule.json no longer matches what this segment started from.
+                self.stale = True
+                return self._read_external()
+            self.stale = False
+            store = SortedSchedule(json.loads(snapshot.read_text(encoding="utf-8")))
+            for record in records:
+                apply_record(store, record)
+            return store.entries()
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.load()
+
+    def compact(self, entries: List[dict], bump: bool) -> int:
+        # Start a new segment holding entries. bump marks it as a change of
+        # its own (a whole-schedule write or an outside edit) rather than a
+        # fold of edits already in the log.
+        with self._lock:
+            self._ensure_loaded()
+            base = self.seq + 1 if bump or self.base is None else self.seq
+            snapshot, log = self._paths(base)
+            self.directory.mkdir(parents=True, exist_ok=True)
+            text = self._dumps(entries)
+            self._write_file(snapshot, text)
+            self._write_file(self.schedule_file, text)
+            header = {"base": base, "schedule_json": _stat_key(self.schedule_file)}
+            self._write_file(log, json.dumps(header) + "\n")
+            self.base, self.seq, self.ops, self.stale = base, base, 0, False
+            self._valid_end = log.stat().st_size
+            self._loaded = True
+            return base
+
+    def append(self, record: dict) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            record = dict(record, seq=self.seq + 1)
+            line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+            log = self._paths(self.base)[1]
+            started = time.perf_counter()
+            with log.open("r+b") as fh:
+                fh.seek(self._valid_end)
+                fh.write(line)
+                fh.truncate()
+                fh.flush()
+                os.fsync(fh.fileno())
+            metrics.FILE_WRITE_BYTES.inc(len(line), file="journal")
+            metrics.FILE_WRITE_SECONDS.observe(time.perf_counter() - started, file="journal")
+            self._valid_end += len(line)
+            self.seq += 1
+            self.ops += 1
+            self._loaded = True
+            return self.seq
+
+    def state_at(self, seq: int) -> List[dict]:
+        # The schedule as it was right after edit `seq`.
+        bases = [b for b in self._segments() if b <= seq]
+        if not bases:
+            raise KeyError(seq)
+        snapshot, log = self._paths(bases[-1])
+        store = SortedSchedule(json.loads(snapshot.read_text(encoding="utf-8")))
+        _, records, _ = self._read_log(log)
+        for record in records:
+            if record["seq"] > seq:
+                break
+            apply_record(store, record)
+        return store.entries()
+
+    def prune(self, keep: int, pinned=()) -> None:
+        # Delete all but the newest `keep` segments and those needed to
+        # rebuild the schedule at any seq in pinned.
+        with self._lock:
+            segments = self._segments()
+            needed = set(segments[-max(1, keep):])
+            for seq in pinned:
+                bases = [b for b in segments if b <= seq]
+                if bases:
+                    needed.add(bases[-1])
+            for base in segments:
+                if base in needed:
+                    continue
+                for path in self._paths(base):
+                    try:
+                        path.unlink()
+                    except FileNotFoundError:
+                        pass
@@ -1,85 +1,287 @@
 import asyncio
+import heapq
 import os
+from bisect import bisect_right
+from collections import deque
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional
 
+import data_provider as dp
+import metrics
 from data_provider import (
     get_all_items_by_name,
-    get_schedule,
+    get_sorted_schedule,
     get_config,
     current_time_ms,
 )
-from pathlib import Path
-from obs_gateway import play, stop, set_current_scene
+import obs_gateway
 from logging_setup import get_error_logger
 
+# Wake up this long before an edge, then sleep the remainder precisely.
+EDGE_MARGIN_MS = 20
+# Upper bound on any single sleep so edits made outside the process are
+# noticed even though they do not trigger a change notification.
+MAX_SLEEP_SEC = 5.0
+LATENCY_SAMPLES = 500
+PREROLL_SEC_DEFAULT = 5
+
 
 def _now_ms() -> int:
     return current_time_ms()
 
 
+def _percentile(values, pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class _Plan:
+    def __init__(self, schedule, items):
+        # schedule is already ordered by start, so entries need no sort.
+        entries = []
+        for entry in schedule:
+            item = items.get(entry["name"])
+            if not item:
+                continue
+            start = entry["start_timestamp"]
+            entries.append((start, start + item["duration"], entry["uuid"], entry["name"]))
+        self.entries = entries
+        self.starts = [e[0] for e in entries]
+        self.by_uuid = {e[2]: e for e in entries}
+        # Running maximum of stop times lets active_at() stop scanning as
+        # soon as nothing earlier can still be on air.
+        self.max_stop = []
+        running = None
+        for e in entries:
+            running = e[1] if running is None else max(running, e[1])
+            self.max_stop.append(running)
+
+    def active_at(self, now: int):
+        idx = bisect_right(self.starts, now) - 1
+        while idx >= 0 and self.max_stop[idx] > now:
+            entry = self.entries[idx]
+            if entry[1] > now:
+                return entry
+            idx -= 1
+        return None
+
+    def next_start_after(self, now: int):
+        idx = bisect_right(self.starts, now)
+        if idx >= len(self.entries):
+            return None
+        return self.entries[idx]
+
+    def edges_after(self, now: int, preroll_ms: int = 0):
+        edges = []
+        for start, stop_ts, uuid, _ in self.entries:
+            if start > now:
+                edges.append((start, "start", uuid))
+            if preroll_ms > 0 and start - preroll_ms > now:
+                edges.append((start - preroll_ms, "preroll", uuid))
+            if stop_ts > now:
+                edges.append((stop_ts, "stop", uuid))
+        heapq.heapify(edges)
+        return edges
+
+
 class PlaybackLoop:
-    def __init__(self):
+    def __init__(self, obs=None):
+        # obs provides obs_gateway's *_async playback calls; the simulator
+        # passes a recording stand-in.
+        self._obs = obs if obs is not None else obs_gateway
         self.running = False
         self.current_uuid: Optional[str] = None
+        self.current_source: Optional[str] = None
         self.active_scene: Optional[str] = None
+        self.prepared_uuid: Optional[str] = None
+        self.prepared_source: Optional[str] = None
+        self._plan: Optional[_Plan] = None
+        self._plan_key = None
+        self._edges = []
+        # The time the last tick() acted on; edges up to it are handled.
+        self._handled_ms: Optional[int] = None
+        self._expected_starts = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._event_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._dispatch_late_ms = deque(maxlen=LATENCY_SAMPLES)
+        self._complete_late_ms = deque(maxlen=LATENCY_SAMPLES)
 
     async def start(self):
         if self.running:
             return
         self.running = True
+        self._event_loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        dp.add_change_listener(self._on_data_change)
         asyncio.create_task(self._loop())
 
+    def _on_data_change(self, path):
+        if path not in (dp.SCHEDULE_FILE, dp.VIDEO_LIST_FILE, dp.ACTIVITY_LIST_FILE, dp.CONFIG_FILE):
+            return
+        if self._event_loop is not None and self._wake is not None:
+            self._event_loop.call_soon_threadsafe(self._wake.set)
+
+    def _refresh_plan(self, now: int, preroll_ms: int) -> None:
+        revisions = dp.get_revisions()
+        key = (revisions["schedule"], revisions["videos"], revisions["activities"], preroll_ms)
+        if key == self._plan_key and self._plan is not None:
+            return
+        self._plan_key = key
+        self._plan = _Plan(get_sorted_schedule(), get_all_items_by_name())
+        self._edges = self._plan.edges_after(now, preroll_ms)
+        # Only starts we saw coming count towards latency; entries already
+        # running when the plan was built (startup, late edits) do not.
+        self._expected_starts = {uuid for _, kind, uuid in self._edges if kind == "start"}
+
+    def next_edge_ms(self) -> Optional[int]:
+        # The next time tick() has something to do, as of the last plan.
+        # Only edges the last tick() saw are dropped: one that passed while
+        # it waited on OBS is still returned, already due.
+        while self._edges and self._handled_ms is not None and self._edges[0][0] <= self._handled_ms:
+            heapq.heappop(self._edges)
+        if not self._edges:
+            return None
+        return self._edges[0][0]
+
+    async def _sleep_until_edge(self) -> None:
+        edge = self.next_edge_ms()
+        now = _now_ms()
+        if edge is not None and edge <= now:
+            return
+        if edge is None:
+            delay = MAX_SLEEP_SEC
+        else:
+            delay = min(MAX_SLEEP_SEC, max(0, edge - now - EDGE_MARGIN_MS) / 1000.0)
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            self._wake.clear()
+            return
+        except asyncio.TimeoutError:
+            pass
+        if edge is not None:
+            remaining = (edge - _now_ms()) / 1000.0
+            if 0 < remaining <= (EDGE_MARGIN_MS * 2) / 1000.0:
+                await asyncio.sleep(remaining)
+
     async def _loop(self):
         while self.running:
             try:
-                await self.tick()
+                with metrics.PLAYBACK_TICK_SECONDS.time():
+                    await self.tick()
             except Exception as exc:
                 get_error_logger().exception("Playback loop error: %s", exc)
-            await asyncio.sleep(1)
+                await asyncio.sleep(1)
+                continue
+            await self._sleep_until_edge()
 
     async def tick(self):
-        schedule = sorted(get_schedule(), key=lambda e: e["start_timestamp"])
-        items = get_all_items_by_name()
-        now = _now_ms()
         config = get_config()
+        try:
+            preroll_ms = int(float(config.get("preroll-sec", PREROLL_SEC_DEFAULT)) * 1000)
+        except (TypeError, ValueError):
+            preroll_ms = PREROLL_SEC_DEFAULT * 1000
+        now = _now_ms()
+        self._handled_ms = now
+        self._refresh_plan(now, preroll_ms)
         media_root = Path(config.get("obs-video-dir", config.get("server-video-dir", ".")))
         idle_enabled = str(config.get("idle-scene-enabled", "")).strip().lower() in ("1", "true", "yes", "on")
         idle_scene = config.get("idle-scene-name", "Slides")
         video_scene = config.get("scene-name", "Scene 1")
-        found_current = False
-        for idx, entry in enumerate(schedule):
-            item = items.get(entry["name"])
-            if not item:
-                continue
-            start = entry["start_timestamp"]
-            stop_ts = start + item["duration"]
-            media_path = str(media_root / entry["name"])
-            if self.current_uuid == entry["uuid"]:
-                found_current = True
 
-            if start <= now < stop_ts and self.current_uuid != entry["uuid"]:
-                source_name = f"Scheduler: {entry['name']} [{entry['uuid']}]"
+        desired = self._plan.active_at(now)
+        desired_uuid = desired[2] if desired else None
+        if desired_uuid != self.current_uuid:
+            previous_source = self.current_source
+            if desired is not None:
+                start, _, uuid, name = desired
+                source_name = f"Scheduler: {name} [{uuid}]"
                 if idle_enabled and self.active_scene != video_scene:
-                    await asyncio.to_thread(set_current_scene, video_scene)
+                    await self._obs.set_current_scene_async(video_scene)
                     self.active_scene = video_scene
-                await asyncio.to_thread(play, media_path, source_name, layer=None)
-                self.current_uuid = entry["uuid"]
-                return
-
-            if self.current_uuid == entry["uuid"] and now >= stop_ts:
-                source_name = f"Scheduler: {entry['name']} [{entry['uuid']}]"
-                await asyncio.to_thread(stop, source_name, clear=True)
+                dispatched = _now_ms()
+                await self._go_live(str(media_root / name), uuid, source_name)
+                completed = _now_ms()
+                if uuid in self._expected_starts:
+                    self._expected_starts.discard(uuid)
+                    self._dispatch_late_ms.append(dispatched - start)
+                    self._complete_late_ms.append(completed - start)
+                    metrics.PLAYBACK_START_LATENESS_SECONDS.observe((dispatched - start) / 1000.0, stage="dispatch")
+                    metrics.PLAYBACK_START_LATENESS_SECONDS.observe((completed - start) / 1000.0, stage="complete")
+                self.current_uuid = uuid
+                self.current_source = source_name
+            else:
                 self.current_uuid = None
-                continue
-
-        if self.current_uuid is not None and not found_current:
-            self.current_uuid = None
+                self.current_source = None
+            # Tear the old source down only after the cut. Going to nothing
+            # goes through stop() so muted sources are restored.
+            if previous_source is not None:
+                if self.current_source is not None:
+                    await self._obs.remove_source_async(previous_source)
+                else:
+                    await self._obs.stop_async(previous_source, clear=True)
 
         if idle_enabled and self.current_uuid is None and self.active_scene != idle_scene:
-            await asyncio.to_thread(set_current_scene, idle_scene)
+            await self._obs.set_current_scene_async(idle_scene)
             self.active_scene = idle_scene
 
+        await self._preroll(now, preroll_ms, media_root)
+
+    async def _go_live(self, media_path: str, uuid: str, source_name: str) -> None:
+        if self.prepared_uuid == uuid:
+            self.prepared_uuid = None
+            self.prepared_source = None
+            try:
+                await self._obs.go_live_async(source_name)
+                return
+            except Exception as exc:
+                get_error_logger().exception("Pre-rolled source unavailable, playing directly: %s", exc)
+        await self._obs.play_async(media_path, source_name, layer=None)
+
+    async def _preroll(self, now: int, preroll_ms: int, media_root: Path) -> None:
+        upcoming = self._plan.next_start_after(now) if preroll_ms > 0 else None
+        if upcoming is not None and upcoming[0] - now > preroll_ms:
+            upcoming = None
+        wanted_uuid = upcoming[2] if upcoming else None
+        if wanted_uuid == self.prepared_uuid:
+            return
+        if self.prepared_source is not None:
+            stale = self.prepared_source
+            self.prepared_uuid = None
+            self.prepared_source = None
+            await self._obs.remove_source_async(stale)
+        if upcoming is None or wanted_uuid == self.current_uuid:
+            return
+        _, _, uuid, name = upcoming
+        source_name = f"Scheduler: {name} [{uuid}]"
+        try:
+            await self._obs.prepare_async(str(media_root / name), source_name, layer=None)
+        except Exception as exc:
+            get_error_logger().exception("Pre-roll failed for %s: %s", name, exc)
+            return
+        self.prepared_uuid = uuid
+        self.prepared_source = source_name
+
+    def latency_stats(self) -> dict:
+        def summarize(samples):
+            values = list(samples)
+            return {
+                "count": len(values),
+                "p50_ms": _percentile(values, 50),
+                "p95_ms": _percentile(values, 95),
+                "p99_ms": _percentile(values, 99),
+                "max_ms": max(values) if values else None,
+                "last_ms": values[-1] if values else None,
+            }
+        return {
+            "dispatch": summarize(self._dispatch_late_ms),
+            "complete": summarize(self._complete_late_ms),
+        }
+
     def stop(self):
         self.running = False
+        if self._event_loop is not None and self._wake is not None:
+            self._event_loop.call_soon_threadsafe(self._wake.set)
@@ -0,0 +1,272 @@
+import argparse
+import asyncio
+import json
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import data_provider as dp
+from media_scanner import VIDEO_EXTENSIONS
+from scheduler_loop import PlaybackLoop
+
+# Fast-forward simulation of a schedule. PlaybackLoop runs against
+# RecordingObs on a virtual clock that jumps from one edge (pre-roll, start,
+# stop) to the next, so a full event day takes seconds. Works on a copy of
+# the data directory, so nothing in it is changed.
+#
+#   python simulate.py [data-dir] [--schedule rundown.json] [--json]
+#
+# Prints every scene switch, pre-roll, play and stop in order, then the
+# overlaps, gaps and missing media found. Exits with status 1 when a clip
+# was cut short by the next one or could not be played.
+
+
+def _source_uuid(source_name: str) -> str:
+    # Sources are named "Scheduler: <name> [<uuid>]" by the playback loop.
+    return source_name.rpartition(" [")[2].rstrip("]")
+
+
+class RecordingObs:
+    def __init__(self, clock, video_dir: Optional[Path]):
+        self.clock = clock
+        # Local copy of the media folder, if there is one, to spot missing files.
+        self.video_dir = video_dir
+        self.events: List[dict] = []
+        self.on_air: Optional[str] = None
+        self._prepared = set()
+
+    def _record(self, action: str, target: str, **extra) -> None:
+        self.events.append(dict({"t_ms": self.clock(), "action": action, "target": target}, **extra))
+
+    def _check_media(self, file_path: str) -> None:
+        if self.video_dir is None:
+            return
+        name = Path(file_path).name
+        if not (self.video_dir / name).is_file():
+            self._record("missing-media", name)
+
+    async def set_current_scene_async(self, scene_name: str) -> None:
+        self._record("scene", scene_name)
+
+    async def play_async(self, file_path: str, source_name: str, layer=None):
+        self._check_media(file_path)
+        self._record("play", source_name, file=file_path)
+        self.on_air = source_name
+        return {"ok": True}
+
+    async def prepare_async(self, file_path: str, source_name: str, layer=None):
+        self._check_media(file_path)
+        self._record("prepare", source_name, file=file_path)
+        self._prepared.add(source_name)
+        return {"ok": True}
+
+    async def go_live_async(self, source_name: str):
+        if source_name not in self._prepared:
+            raise KeyError(source_name)
+        self._prepared.discard(source_name)
+        self._record("go-live", source_name)
+        self.on_air = source_name
+        return {"ok": True}
+
+    async def remove_source_async(self, source_name: str) -> None:
+        self._prepared.discard(source_name)
+        self._record("remove", source_name)
+        if self.on_air == source_name:
+            self.on_air = None
+
+    async def stop_async(self, source_name: str, clear: bool = False):
+        self._prepared.discard(source_name)
+        self._record("stop", source_name)
+        if self.on_air == source_name:
+            self.on_air = None
+        return {"ok": True}
+
+
+def _copy_data(source: Path, target: Path) -> None:
+    # Logs, saved schedules and any media kept alongside are not needed.
+    patterns = ["logs", "schedules", "*.tmp"] + [f"*{ext}" for ext in VIDEO_EXTENSIONS]
+    shutil.copytree(source, target, ignore=shutil.ignore_patterns(*patterns), dirs_exist_ok=True)
+
+
+async def _run(loop: PlaybackLoop, clock: Dict[str, int], end_ms: int) -> None:
+    while True:
+        await loop.tick()
+        edge = loop.next_edge_ms()
+        if edge is None or edge > end_ms:
+            return
+        clock["now"] = edge
+
+
+def _analyse(schedule, items, events, start_ms: int, end_ms: int) -> dict:
+    on_air: Dict[str, List[int]] = {}
+    current = None
+    for event in events:
+        if event["action"] in ("play", "go-live"):
+            if current is not None and on_air[current][1] is None:
+                on_air[current][1] = event["t_ms"]
+            current = _source_uuid(event["target"])
+            on_air[current] = [event["t_ms"], None]
+        elif event["action"] in ("stop", "remove") and _source_uuid(event["target"]) == current:
+            on_air[current][1] = event["t_ms"]
+            current = None
+
+    overlaps, missing, played = [], [], []
+    for entry in schedule:
+        start = entry["start_timestamp"]
+        item = items.get(entry["name"])
+        if item is None:
+            if start_ms <= start <= end_ms:
+                missing.append({"uuid": entry["uuid"], "name": entry["name"], "start_ms": start,
+                                "reason": "not in the video or activity list"})
+            continue
+        stop = start + item["duration"]
+        if stop <= start_ms or start > end_ms:
+            continue
+        if item["duration"] <= 0:
+            missing.append({"uuid": entry["uuid"], "name": entry["name"], "start_ms": start, "reason": "no duration"})
+            continue
+        span = on_air.get(entry["uuid"])
+        if span is None:
+            # Valid entries only stay off air when later ones cover them.
+            overlaps.append({"uuid": entry["uuid"], "name": entry["name"], "start_ms": start,
+                             "cut_at_ms": start, "cut_ms": item["duration"]})
+            continue
+        off = span[1] if span[1] is not None else end_ms
+        played.append((span[0], off, entry))
+        if off < stop and off < end_ms:
+            overlaps.append({"uuid": entry["uuid"], "name": entry["name"], "start_ms": start,
+                             "cut_at_ms": off, "cut_ms": stop - off})
+
+    missing_files = sorted({e["target"] for e in events if e["action"] == "missing-media"})
+    gaps = []
+    played.sort(key=lambda p: p[0])
+    for (_, prev_off, prev), (on, _, entry) in zip(played, played[1:]):
+        if on > prev_off:
+            gaps.append({"after": prev["name"], "before": entry["name"], "from_ms": prev_off, "to_ms": on,
+                         "gap_ms": on - prev_off})
+    return {
+        "played": len(played),
+        "on_air_ms": sum(off - on for on, off, _ in played),
+        "overlaps": overlaps,
+        "gaps": gaps,
+        "missing": missing,
+        "missing_files": missing_files,
+    }
+
+
+def _format_ms(ms: int) -> str:
+    return datetime.fromtimestamp(ms / 1000).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+def _format_duration(ms: int) -> str:
+    seconds = ms / 1000
+    if seconds < 60:
+        return f"{seconds:g}s"
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def _print_report(report: dict, min_gap_ms: int) -> None:
+    for event in report["events"]:
+        print(f"{_format_ms(event['t_ms'])}  {event['action']:<13} {event['target']}")
+    print(f"\nSimulated {_format_ms(report['start_ms'])} to {_format_ms(report['end_ms'])}"
+          f" in {report['elapsed_sec']}s: {report['played']} clips played,"
+          f" {_format_duration(report['on_air_ms'])} on air.")
+    print(f"\nOverlaps ({len(report['overlaps'])}):")
+    for overlap in report["overlaps"]:
+        if overlap["cut_at_ms"] == overlap["start_ms"]:
+            print(f"  {_format_ms(overlap['start_ms'])}  {overlap['name']} never went on air, covered by later entries")
+        else:
+            print(f"  {_format_ms(overlap['cut_at_ms'])}  {overlap['name']} cut short by {_format_duration(overlap['cut_ms'])}")
+    gaps = [gap for gap in report["gaps"] if gap["gap_ms"] >= min_gap_ms]
+    print(f"\nGaps ({len(gaps)}):")
+    for gap in gaps:
+        print(f"  {_format_ms(gap['from_ms'])}  {_format_duration(gap['gap_ms'])} between {gap['after']} and {gap['before']}")
+    print(f"\nMissing media ({len(report['missing']) + len(report['missing_files'])}):")
+    for entry in report["missing"]:
+        print(f"  {_format_ms(entry['start_ms'])}  {entry['name']}: {entry['reason']}")
+    for name in report["missing_files"]:
+        print(f"  {name}: file not found in the video folder")
+
+
+def _parse_time(value: Optional[str]) -> Optional[int]:
+    if value is None:
+        return None
+    if value == "now":
+        return int(time.time() * 1000)
+    return int(datetime.fromisoformat(value).timestamp() * 1000)
+
+
+def simulate(data_dir: Path, schedule_file: Optional[Path] = None, start: Optional[int] = None,
+             end: Optional[int] = None) -> dict:
+    dp.set_data_root(str(data_dir))
+    video_dir = dp.get_video_dir()
+    with tempfile.TemporaryDirectory(prefix="simulate-") as tmp:
+        if data_dir.exists():
+            _copy_data(data_dir, Path(tmp))
+        dp.set_data_root(tmp)
+        dp.set_auto_scan(False)
+        if schedule_file is not None:
+            dp.write_schedule(json.loads(schedule_file.read_text(encoding="utf-8-sig")))
+        schedule = dp.get_sorted_schedule().entries()
+        items = dp.get_all_items_by_name()
+        preroll_ms = int(float(dp.get_config().get("preroll-sec", 5)) * 1000)
+        # Unknown and zero-length items count with the default length, so
+        # trailing ones fall inside the window and get reported.
+        stops = [e["start_timestamp"] + dp.item_duration_ms(items.get(e["name"])) for e in schedule]
+        if start is None:
+            start = schedule[0]["start_timestamp"] - preroll_ms - 1000 if schedule else dp.current_time_ms()
+        if end is None:
+            end = max(stops, default=start) + 1000
+
+        clock = {"now": start}
+        dp.set_clock(lambda: clock["now"])
+        recorder = RecordingObs(dp.current_time_ms, video_dir if video_dir and video_dir.is_dir() else None)
+        loop = PlaybackLoop(obs=recorder)
+        started = time.perf_counter()
+        try:
+            asyncio.run(_run(loop, clock, end))
+        finally:
+            dp.set_clock(None)
+        elapsed = time.perf_counter() - started
+        dp.flush_writes()
+    report = _analyse(schedule, items, recorder.events, start, end)
+    report.update({
+        "start_ms": start,
+        "end_ms": end,
+        "elapsed_sec": round(elapsed, 3),
+        "events": [event for event in recorder.events if event["action"] != "missing-media"],
+    })
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Fast-forward the playback loop through a schedule.")
+    parser.add_argument("data_dir", nargs="?", default=str(dp.DATA_ROOT), help="scheduler data directory")
+    parser.add_argument("--schedule", help="simulate this schedule JSON instead of the current one")
+    parser.add_argument("--start", help="ISO time to start from, or 'now' (default: before the first entry)")
+    parser.add_argument("--end", help="ISO time to stop at (default: after the last entry)")
+    parser.add_argument("--min-gap-sec", type=float, default=0, help="only list gaps at least this long")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = simulate(
+        Path(args.data_dir),
+        Path(args.schedule) if args.schedule else None,
+        _parse_time(args.start),
+        _parse_time(args.end),
+    )
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report, int(args.min_gap_sec * 1000))
+    return 1 if report["overlaps"] or report["missing"] or report["missing_files"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
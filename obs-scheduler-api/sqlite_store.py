@@ -0,0 +1,202 @@
+import json
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, List
+
+# Optional storage for the schedule and the video/activity catalogs, selected
+# with "storage-backend": "sqlite" in config.json. Rows keep the full JSON of
+# each entry in `data`; uuid, name and start_timestamp are copied into
+# indexed columns. Every write bumps a per-table revision that readers use
+# as their cache key, the way the JSON files use (mtime, size).
+DB_FILE_NAME = "scheduler.db"
+TABLES = ("schedule", "video", "activity")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS schedule (
+    uuid TEXT NOT NULL,
+    name TEXT NOT NULL,
+    start_timestamp INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS schedule_uuid ON schedule (uuid);
+CREATE INDEX IF NOT EXISTS schedule_name ON schedule (name);
+CREATE INDEX IF NOT EXISTS schedule_start ON schedule (start_timestamp);
+CREATE TABLE IF NOT EXISTS items (
+    kind TEXT NOT NULL,
+    uuid TEXT NOT NULL,
+    name TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (kind, uuid)
+);
+CREATE INDEX IF NOT EXISTS items_name ON items (kind, name);
+CREATE TABLE IF NOT EXISTS revisions (
+    tbl TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _dump(entry: dict) -> str:
+    return json.dumps(entry, separators=(",", ":"), sort_keys=True)
+
+
+class SqliteStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _write(self, table: str, apply) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                apply(self._conn)
+                self._conn.execute(
+                    "INSERT INTO revisions (tbl, revision) VALUES (?, 1) "
+                    "ON CONFLICT (tbl) DO UPDATE SET revision = revision + 1",
+                    (table,),
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def revision(self, table: str) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT revision FROM revisions WHERE tbl = ?", (table,)).fetchone()
+        return row[0] if row else 0
+
+    def get_meta(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def load(self, table: str) -> List[dict]:
+        with self._lock:
+            if table == "schedule":
+                rows = self._conn.execute("SELECT data FROM schedule ORDER BY start_timestamp, rowid").fetchall()
+            else:
+                rows = self._conn.execute("SELECT data FROM items WHERE kind = ? ORDER BY rowid", (table,)).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def replace(self, table: str, entries: List[dict]) -> None:
+        # Whole-list writes are diffed by uuid so only rows that changed are
+        # touched; schedules with duplicate uuids are rewritten wholesale.
+        wanted: Dict[str, str] = {e["uuid"]: _dump(e) for e in entries}
+        by_uuid = {e["uuid"]: e for e in entries}
+
+        def apply(conn):
+            if table == "schedule":
+                current = dict(conn.execute("SELECT uuid, data FROM schedule").fetchall())
+                count = conn.execute("SELECT COUNT(*) FROM schedule").fetchone()[0]
+                if len(wanted) != len(entries) or len(current) != count:
+                    conn.execute("DELETE FROM schedule")
+                    conn.executemany(
+                        "INSERT INTO schedule (uuid, name, start_timestamp, data) VALUES (?, ?, ?, ?)",
+                        [(e["uuid"], e["name"], e["start_timestamp"], _dump(e)) for e in entries],
+                    )
+                    return
+                stale = [(uuid,) for uuid, data in current.items() if wanted.get(uuid) != data]
+                conn.executemany("DELETE FROM schedule WHERE uuid = ?", stale)
+                conn.executemany(
+                    "INSERT INTO schedule (uuid, name, start_timestamp, data) VALUES (?, ?, ?, ?)",
+                    [
+                        (uuid, by_uuid[uuid]["name"], by_uuid[uuid]["start_timestamp"], data)
+                        for uuid, data in wanted.items() if current.get(uuid) != data
+                    ],
+                )
+            else:
+                current = dict(conn.execute("SELECT uuid, data FROM items WHERE kind = ?", (table,)).fetchall())
+                conn.executemany(
+                    "DELETE FROM items WHERE kind = ? AND uuid = ?",
+                    [(table, uuid) for uuid in current if uuid not in wanted],
+                )
+                conn.executemany(
+                    "INSERT INTO items (kind, uuid, name, data) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (kind, uuid) DO UPDATE SET name = excluded.name, data = excluded.data",
+                    [
+                        (table, uuid, by_uuid[uuid]["name"], data)
+                        for uuid, data in wanted.items() if current.get(uuid) != data
+                    ],
+                )
+
+        self._write(table, apply)
+
+    def add_schedule_entry(self, entry: dict) -> None:
+        self._write("schedule", lambda conn: conn.execute(
+            "INSERT INTO schedule (uuid, name, start_timestamp, data) VALUES (?, ?, ?, ?)",
+            (entry["uuid"], entry["name"], entry["start_timestamp"], _dump(entry)),
+        ))
+
+    def remove_schedule_entry(self, uuid: str) -> None:
+        self._write("schedule", lambda conn: conn.execute("DELETE FROM schedule WHERE uuid = ?", (uuid,)))
+
+    def reschedule_schedule_entry(self, uuid: str, start: int) -> None:
+        def apply(conn):
+            rows = conn.execute("SELECT rowid, data FROM schedule WHERE uuid = ?", (uuid,)).fetchall()
+            for rowid, data in rows:
+                entry = dict(json.loads(data), start_timestamp=start)
+                conn.execute(
+                    "UPDATE schedule SET start_timestamp = ?, data = ? WHERE rowid = ?",
+                    (start, _dump(entry), rowid),
+                )
+
+        self._write("schedule", apply)
+
+    def rename_schedule_item(self, old: str, new: str) -> None:
+        self._write("schedule", lambda conn: conn.execute(
+            "UPDATE schedule SET name = ?, data = json_set(data, '$.name', ?) WHERE name = ?",
+            (new, new, old),
+        ))
+
+    def shift_schedule(self, delta: int) -> None:
+        self._write("schedule", lambda conn: conn.execute(
+            "UPDATE schedule SET start_timestamp = start_timestamp + ?, "
+            "data = json_set(data, '$.start_timestamp', start_timestamp + ?)",
+            (delta, delta),
+        ))
+
+
+def import_json_layout(store: SqliteStore, data_root: Path) -> Dict[str, int]:
+    # One-shot copy of filelist.txt, alist.txt and schedule.json into the
+    # database. Existing rows in those tables are replaced.
+    data_root = Path(data_root)
+    sources = {
+        "video": data_root / "filelist.txt",
+        "activity": data_root / "alist.txt",
+        "schedule": data_root / "schedule.json",
+    }
+    counts = {}
+    for table, path in sources.items():
+        entries = json.loads(path.read_text(encoding="utf-8-sig")) if path.exists() else []
+        store.replace(table, entries)
+        counts[table] = len(entries)
+    store.set_meta("imported-from", str(data_root))
+    return counts
+
+
+if __name__ == "__main__":
+    root = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).resolve().parent.parent / "data"
+    store = SqliteStore(root / DB_FILE_NAME)
+    counts = import_json_layout(store, root)
+    store.close()
+    print(f"Imported {counts['video']} videos, {counts['activity']} activities and {counts['schedule']} schedule entries into {root / DB_FILE_NAME}")
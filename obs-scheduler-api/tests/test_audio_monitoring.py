@@ -0,0 +1,80 @@
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import obs_gateway
+
+MONITOR_AND_OUTPUT = "OBS_MONITORING_TYPE_MONITOR_AND_OUTPUT"
+MONITOR_ONLY = "OBS_MONITORING_TYPE_MONITOR_ONLY"
+
+
+class StubSession:
+    # Answers request batches; inputs named in failing are rejected.
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.sent = []
+
+    def batch(self, requests):
+        self.sent.extend((data["inputName"], data["monitorType"]) for _, data in requests)
+        return [{"ok": data["inputName"] not in self.failing} for _, data in requests]
+
+
+class MonitorReconcilerTest(unittest.TestCase):
+    def setUp(self):
+        self.settings = {"audio_monitor_mode": "monitor_and_output", "audio_monitor_prefix": "Scheduler:",
+                         "batch_requests": True}
+        self.session = StubSession()
+        self.monitor = obs_gateway._MonitorReconciler()
+        self.logger = mock.Mock()
+        for target, value in (
+            ("_session", self.session),
+            ("_monitor", self.monitor),
+            ("_resolve_settings", lambda: self.settings),
+            ("get_error_logger", lambda: self.logger),
+        ):
+            patcher = mock.patch.object(obs_gateway, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_input_created_is_applied_unless_claimed(self):
+        self.monitor.claim("Scheduler: a [1]")
+        obs_gateway._on_input_created({"inputName": "Scheduler: a [1]"})
+        self.assertEqual(self.session.sent, [])
+
+        self.monitor.release("Scheduler: a [1]")
+        obs_gateway._on_input_created({"inputName": "Scheduler: b [2]"})
+        obs_gateway._on_input_created({"inputName": "Camera"})
+        self.assertEqual(self.session.sent, [("Scheduler: b [2]", MONITOR_AND_OUTPUT)])
+        self.assertEqual(self.monitor.counters, {"applied": 1, "failed": 0, "skipped": 1})
+
+    def test_mode_change_reapplies(self):
+        self.monitor.reset(["Scheduler: a [1]", "Scheduler: b [2]"])
+        self.monitor.reconcile(self.settings)
+        self.monitor.reconcile(self.settings)
+        self.assertEqual(len(self.session.sent), 2)
+
+        self.settings["audio_monitor_mode"] = "monitor_only"
+        result = self.monitor.reconcile(self.settings)
+        self.assertEqual(result["applied"], ["Scheduler: a [1]", "Scheduler: b [2]"])
+        self.assertEqual(self.session.sent[2:], [("Scheduler: a [1]", MONITOR_ONLY), ("Scheduler: b [2]", MONITOR_ONLY)])
+
+    def test_counters(self):
+        self.session.failing.add("Music")
+        self.settings["audio_monitor_sources"] = "Music"
+        self.monitor.reset(["Music", "Scheduler: a [1]"])
+
+        result = self.monitor.reconcile(self.settings)
+        self.assertEqual(result, {"applied": ["Scheduler: a [1]"], "failed": ["Music"], "skipped": 0})
+        # Neither is retried for the same mode: one is done, the other failed.
+        result = self.monitor.reconcile(self.settings)
+        self.assertEqual(result, {"applied": [], "failed": [], "skipped": 2})
+        self.assertEqual(self.monitor.counters, {"applied": 1, "failed": 1, "skipped": 2})
+        self.assertEqual(self.monitor.stats()["failing"], ["Music"])
+        self.assertEqual(self.logger.error.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
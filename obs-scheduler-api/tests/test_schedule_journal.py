@@ -0,0 +1,79 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import data_provider as dp
+
+
+def _entry(name: str, start: int) -> dict:
+    return {"uuid": f"uuid-{name}", "name": name, "start_timestamp": start}
+
+
+class SaveScheduleWithJournalTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        (self.root / "config.json").write_text(json.dumps({"schedule-journal": True, "write-batch-ms": 0}))
+        (self.root / "timestamp").write_text("1000")
+        dp.set_data_root(str(self.root))
+
+    def tearDown(self):
+        dp.flush_writes()
+        self._tmp.cleanup()
+
+    def _write_outside(self, entries) -> None:
+        path = self.root / "schedule.json"
+        before = path.stat().st_mtime_ns if path.exists() else 0
+        path.write_text(json.dumps(entries))
+        # Make the edit visible even on coarse mtime clocks.
+        os.utime(path, ns=(before + 10_000_000, before + 10_000_000))
+
+    def _loaded_names(self, name: str):
+        dp.load_schedule(name)
+        return [entry["name"] for entry in dp.get_schedule()]
+
+    def test_save_on_fresh_data_dir(self):
+        self._write_outside([_entry("a", 2000), _entry("b", 5000)])
+        dp.save_schedule("day")
+        dp.add_schedule_entry(_entry("c", 9000))
+        self.assertEqual(self._loaded_names("day"), ["a", "b"])
+
+    def test_save_after_outside_edit(self):
+        self._write_outside([])
+        dp.add_schedule_entry(_entry("a", 2000))
+        dp.add_schedule_entry(_entry("b", 5000))
+        self._write_outside([_entry("z", 3000)])
+        self.assertEqual([entry["name"] for entry in dp.get_schedule()], ["z"])
+        dp.save_schedule("day")
+        dp.add_schedule_entry(_entry("c", 9000))
+        self.assertEqual(self._loaded_names("day"), ["z"])
+
+    def test_old_segments_are_pruned_unless_saved(self):
+        config = {"schedule-journal": True, "write-batch-ms": 0, "journal-keep-segments": 2}
+        (self.root / "config.json").write_text(json.dumps(config))
+        dp.write_schedule([_entry("a", 2000)])
+        dp.save_schedule("first")
+        for i in range(5):
+            dp.write_schedule([_entry(f"x{i}", 2000)])
+        segments = sorted(p.name for p in (self.root / "journal").glob("*.json"))
+        self.assertEqual(len(segments), 3)
+        self.assertEqual(self._loaded_names("first"), ["a"])
+
+
+class JournalOptInTest(unittest.TestCase):
+    def test_off_by_default(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            dp.set_data_root(tmp)
+            dp.add_schedule_entry(_entry("a", 2000))
+            dp.flush_writes()
+            self.assertFalse((Path(tmp) / "journal").exists())
+            self.assertEqual(json.loads((Path(tmp) / "schedule.json").read_text())[0]["name"], "a")
+
+
+if __name__ == "__main__":
+    unittest.main()
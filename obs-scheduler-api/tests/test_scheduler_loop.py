@@ -0,0 +1,85 @@
+import asyncio
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import data_provider as dp
+from scheduler_loop import PlaybackLoop
+
+
+class SlowStopObs:
+    # Stopping takes stop_ms of virtual time, as a slow OBS would.
+    def __init__(self, clock: dict, stop_ms: int):
+        self.clock = clock
+        self.stop_ms = stop_ms
+        self.on_air = []
+
+    async def set_current_scene_async(self, scene_name):
+        pass
+
+    async def play_async(self, file_path, source_name, layer=None):
+        self.on_air.append((self.clock["now"], source_name))
+        return {"ok": True}
+
+    async def prepare_async(self, file_path, source_name, layer=None):
+        return {"ok": True}
+
+    async def go_live_async(self, source_name):
+        raise KeyError(source_name)
+
+    async def remove_source_async(self, source_name):
+        pass
+
+    async def stop_async(self, source_name, clear=False):
+        self.clock["now"] += self.stop_ms
+        return {"ok": True}
+
+
+class EdgeDuringTickTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        root = Path(self._tmp.name)
+        (root / "config.json").write_text(json.dumps({"preroll-sec": 0}))
+        (root / "filelist.txt").write_text(json.dumps([
+            {"uuid": "v1", "name": "a.mp4", "duration": 1000},
+            {"uuid": "v2", "name": "b.mp4", "duration": 1500},
+        ]))
+        (root / "schedule.json").write_text(json.dumps([
+            {"uuid": "e1", "name": "a.mp4", "start_timestamp": 10_000},
+            {"uuid": "e2", "name": "b.mp4", "start_timestamp": 11_050},
+        ]))
+        dp.set_data_root(str(root))
+        dp.set_auto_scan(False)
+        self.clock = {"now": 9_000}
+        dp.set_clock(lambda: self.clock["now"])
+
+    def tearDown(self):
+        dp.set_clock(None)
+        dp.set_auto_scan(True)
+        self._tmp.cleanup()
+
+    def test_start_passed_during_slow_stop_is_not_dropped(self):
+        obs = SlowStopObs(self.clock, stop_ms=200)
+        loop = PlaybackLoop(obs=obs)
+
+        async def run():
+            for _ in range(20):
+                await loop.tick()
+                edge = loop.next_edge_ms()
+                if edge is None:
+                    return
+                self.clock["now"] = max(self.clock["now"], edge)
+
+        asyncio.run(run())
+        self.assertEqual([source for _, source in obs.on_air],
+                         ["Scheduler: a.mp4 [e1]", "Scheduler: b.mp4 [e2]"])
+        # a stops at 11000 and the stop takes until 11200; b is due at 11050.
+        self.assertEqual(obs.on_air[1][0], 11_200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import simulate
+
+
+class SimulateTest(unittest.TestCase):
+    def test_reports_unknown_entry_after_last_known_one(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "config.json").write_text(json.dumps({"preroll-sec": 0}))
+            (root / "filelist.txt").write_text(json.dumps([{"uuid": "v1", "name": "clip.mp4", "duration": 10000}]))
+            (root / "schedule.json").write_text(json.dumps([
+                {"uuid": "e1", "name": "clip.mp4", "start_timestamp": 1_000_000},
+                {"uuid": "e2", "name": "nope.mp4", "start_timestamp": 1_020_000},
+            ]))
+            report = simulate.simulate(root)
+        self.assertEqual(report["played"], 1)
+        self.assertEqual([entry["name"] for entry in report["missing"]], ["nope.mp4"])
+
+
+if __name__ == "__main__":
+    unittest.main()